@@ -16,7 +16,30 @@ setuptools.setup(
     url="https://github.com/phausman/fce-ipmi",
     packages=setuptools.find_packages("src"),
     package_dir={"": "src"},
-    py_modules=["app", "main", "messages", "utils", "version"],
+    py_modules=[
+        "app",
+        "cluster",
+        "concurrency",
+        "config",
+        "dcmi",
+        "hostlist",
+        "inventory",
+        "journal",
+        "logs",
+        "main",
+        "messages",
+        "progress",
+        "reconcile",
+        "rmcp",
+        "scheduler",
+        "selector",
+        "sol",
+        "summary",
+        "udp",
+        "utils",
+        "version",
+        "watch",
+    ],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -3,17 +3,47 @@
 The class implements core logic of the program.
 """
 
-import fnmatch
-import logging
-import logging.handlers
+import asyncio
+import functools
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
-from typing import Tuple
+from typing import Iterator, List, NamedTuple, Tuple
 
-import colorlog
+import cluster
+
+import concurrency
+
+import dcmi
+
+import hostlist
+
+import inventory
+
+import journal
+
+import logs
+
+import progress
+
+import reconcile
+
+import rmcp
+
+import scheduler
+
+import selector
+
+import sol
+
+import summary
 
 import utils
 
-import yaml
+import watch
 
 CLI_OK = 0
 CLI_ERROR = 1
@@ -30,13 +60,127 @@ class Command(Enum):
     BOOTDEV_DISK = 6
     BOOTDEV_PXE = 7
     CONSOLE = 8
+    BOOTPARAM_GET = 9
+    CONSOLE_CAPTURE = 10
+    PING = 11
+    DCMI_POWER_READING = 12
+
+
+class NodeResult(NamedTuple):
+    """Result of a command executed on a machine."""
+
+    machine: str
+    success: bool
+    output: str
+
+
+class Change(NamedTuple):
+    """Command converging a machine to its desired state."""
+
+    machine: str
+    command: "Command"
+    options: dict
+    description: str
+
+
+class ApplicationError(Exception):
+    """Raised by the library API when a command cannot be executed."""
 
 
 class Application:
-    """Main application class."""
+    """Main application class.
+
+    Besides `run`, used by the command line interface, the class provides
+    a library API for in-process callers. The inventory is loaded on first
+    use and reloaded only when the machine config changes, e.g.:
+
+        application = Application(machine_config="nodes.yaml", parallel=16)
+        for result in application.iter_execute(Command.POWER_STATUS, "compute*"):
+            print(result.machine, result.success, result.output)
+    """
 
     DEFAULT_MACHINE_CONFIG_PATH = "./config/nodes.yaml"
 
+    # Backends executing the commands
+    BACKEND_IPMITOOL = "ipmitool"
+    BACKEND_IPMITOOL_ASYNC = "ipmitool-async"
+    BACKENDS = (BACKEND_IPMITOOL, BACKEND_IPMITOOL_ASYNC)
+
+    # Boot devices set by bootdev commands
+    BOOTDEV_DEVICES = {
+        Command.BOOTDEV_BIOS: "bios",
+        Command.BOOTDEV_DISK: "disk",
+        Command.BOOTDEV_PXE: "pxe",
+    }
+
+    # Utility methods implementing the commands
+    UTILITY_METHODS = {
+        Command.POWER_STATUS: "power_status",
+        Command.POWER_ON: "power_on",
+        Command.POWER_OFF: "power_off",
+        Command.POWER_CYCLE: "power_cycle",
+        Command.BOOTDEV_BIOS: "bootdev_bios",
+        Command.BOOTDEV_DISK: "bootdev_disk",
+        Command.BOOTDEV_PXE: "bootdev_pxe",
+        Command.CONSOLE: "console",
+        Command.BOOTPARAM_GET: "bootparam_get",
+        Command.DCMI_POWER_READING: "dcmi_power_reading",
+    }
+
+    # Machine attribute commands are distributed to the workers by
+    DEFAULT_SHARD_BY = "site"
+
+    # Groups of machines concurrency is limited in, the BMC subnet or
+    # a machine attribute
+    LIMIT_BY_SUBNET = "subnet"
+    DEFAULT_LIMIT_BY = LIMIT_BY_SUBNET
+
+    # Commands and options workers execute on behalf of a coordinator
+    WORKER_COMMANDS = (
+        Command.POWER_STATUS,
+        Command.POWER_ON,
+        Command.POWER_OFF,
+        Command.POWER_CYCLE,
+        Command.BOOTDEV_BIOS,
+        Command.BOOTDEV_DISK,
+        Command.BOOTDEV_PXE,
+        Command.BOOTPARAM_GET,
+        Command.PING,
+        Command.DCMI_POWER_READING,
+    )
+    WORKER_OPTIONS = ("persistent", "efiboot")
+
+    # Commands which only read the state of the machine
+    READ_ONLY_COMMANDS = (
+        Command.POWER_STATUS,
+        Command.BOOTPARAM_GET,
+        Command.DCMI_POWER_READING,
+    )
+
+    # Priority classes of commands executed with the library API by default.
+    # Commands not listed here are mutating.
+    COMMAND_PRIORITIES = {
+        command: scheduler.BACKGROUND for command in READ_ONLY_COMMANDS
+    }
+
+    # How many times the boot device is set again on machines that ignored it
+    BOOTDEV_VERIFY_RETRIES = 2
+
+    # Machine attribute power readings are aggregated by
+    DEFAULT_POWER_GROUP_BY = "zone"
+
+    # Commands converging machines to the desired power state and boot device
+    POWER_COMMANDS = {"on": Command.POWER_ON, "off": Command.POWER_OFF}
+    BOOTDEV_COMMANDS = {device: command for command, device in BOOTDEV_DEVICES.items()}
+
+    # Messages reporting results of console capture
+    CAPTURE_MESSAGES = {
+        sol.CAPTURE_MATCHED: "Pattern found: '{}'",
+        sol.CAPTURE_TIMEOUT: "Timed out after {} seconds",
+        sol.CAPTURE_INTERRUPTED: "Capture interrupted",
+        sol.CAPTURE_CLOSED: "SOL session closed ({})",
+    }
+
     def __init__(
         self,
         debug=False,
@@ -44,6 +188,25 @@ class Application:
         machine_config="",
         no_color=False,
         verbose=False,
+        cache_dir="",
+        backend=BACKEND_IPMITOOL,
+        parallel=1,
+        timeout=utils.DEFAULT_TIMEOUT,
+        journal_path="",
+        resume_path="",
+        log_file="",
+        summary=False,
+        workers=None,
+        shard_by=DEFAULT_SHARD_BY,
+        worker_token="",
+        adaptive=False,
+        limit_by=DEFAULT_LIMIT_BY,
+        timings=False,
+        ping=False,
+        limits=None,
+        ping_timeout=rmcp.DEFAULT_TIMEOUT,
+        ping_retries=rmcp.RETRIES,
+        verify_retries=BOOTDEV_VERIFY_RETRIES,
     ):
         """Set up logger and read node config file."""
         # Read global options
@@ -54,104 +217,108 @@ class Application:
         )
         self.no_color = no_color
         self.verbose = verbose
+        self.cache_dir = cache_dir if cache_dir else inventory.DEFAULT_CACHE_DIR
+        self.backend = backend
+        self.parallel = max(1, parallel)
+        self.timeout = timeout
+        self.resume_path = resume_path
+        # Results of a resumed run are appended to the resumed journal
+        self.journal_path = journal_path if journal_path else resume_path
+        self.summary = summary
+        # Skip machines whose BMC does not answer RMCP ping
+        self.ping = ping
+        self.ping_timeout = ping_timeout
+        self.ping_retries = ping_retries
+        self.verify_retries = verify_retries
+        self.worker_token = worker_token
+        # Commands are distributed to the workers serving the machines' site
+        self.coordinator = (
+            cluster.Coordinator(workers, shard_by, worker_token, timeout)
+            if workers
+            else None
+        )
 
-        # Configure logger
-        self.logger = self._get_logger() if no_color else self._get_colored_logger()
-
-    def _get_logger(self):
-        """Create and return a logger object."""
-        # Create a logger
-        logger = logging.getLogger(__name__)
-
-        if self.debug:
-            logger.setLevel(logging.DEBUG)
-        else:
-            logger.setLevel(logging.INFO)
-
-        # Create console formatter
-        console_format = "%(levelname)s: %(message)s"
-        console_formatter = logging.Formatter(fmt=console_format)
+        # Concurrency limits of groups of machines (ipmitool-async backend)
+        self.adaptive = adaptive
+        self.limit_by = limit_by
+        # Fixed limits of groups, e.g. of congested subnets
+        self.limits = limits if limits else {}
+        self.timings = timings
+        self.controllers = {}
 
-        # Create a console handler: log to console
-        console_handler = logging.StreamHandler()
+        # Scheduler shared by concurrent callers of the library API
+        self.scheduler = scheduler.Scheduler(self.parallel)
+        self.single_flight = scheduler.SingleFlight()
 
-        # Configure and register console handler
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        # Inventory of machines and the signature of the config it was read from
+        self.machines = None
+        self._machines_signature = None
+        # Templates of `ipmitool` commands by machine name
+        self.templates = {}
 
-        return logger
+        # Configure logger
+        self.logger = logs.configure(__name__, debug, no_color, log_file)
 
-    def _get_colored_logger(self):
-        """Create and return a colored logger object."""
-        # Create a logger
-        logger = colorlog.getLogger(__name__)
+    def _read_machines_config(self) -> inventory.Inventory:
+        """Read machines from the machine config.
 
-        if self.debug:
-            logger.setLevel(logging.DEBUG)
-        else:
-            logger.setLevel(logging.INFO)
+        The machine config may be a YAML file, a directory or a glob pattern
+        matching YAML files, a CSV file or an SQLite database.
 
-        # Create console formatter
-        console_format = "%(log_color)s%(message)s"
-        console_formatter = colorlog.ColoredFormatter(fmt=console_format)
+        :return Inventory with machines' details or None if details
+                could not be retrieved.
+        """
+        source = inventory.get_source(self.machine_config, self.cache_dir, self.logger)
 
-        # Create a console handler: log to console
-        console_handler = colorlog.StreamHandler()
+        try:
+            return source.load()
 
-        # Configure and register console handler
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        except inventory.InventoryError as e:
+            self.logger.error(e)
 
-        return logger
+        return None
 
-    def _read_machines_config(self) -> dict:
-        """Read YAML machine config file.
+    def _get_machines_signature(self):
+        """Get the signature of the machine config files.
 
-        :return Dictionary with machines' details or None if details
-                could not be retrieved.
+        :return Tuple of (path, mtime, size) of each file or None if any of
+                the files cannot be accessed.
         """
-        # Python representation of the YAML machine config file
-        machines = None
-
         try:
-            with open(self.machine_config) as file:
-                machines = yaml.load(file, Loader=yaml.FullLoader)
-                self.logger.debug(
-                    f"Read machines from {self.machine_config}: {machines}"
+            return tuple(
+                (path, stat.st_mtime_ns, stat.st_size)
+                for path, stat in (
+                    (path, os.stat(path))
+                    for path in inventory.expand_paths(self.machine_config)
                 )
+            )
 
-        except yaml.YAMLError as e:
-            self.logger.error(f"Error in machines configuration file: {e}")
+        except OSError:
+            return None
 
-        except (FileNotFoundError, PermissionError, NotADirectoryError) as e:
-            self.logger.error(
-                f"Cannot open machines configuration file: '{self.machine_config}'"
-            )
-            self.logger.error(e)
+    def _load_machines(self) -> bool:
+        """Load the inventory unless it is loaded and the config is unchanged.
 
-        # The YAML file with nodes' details may be formatted as dict or list.
-        # We need to convert the type to the dict, so that we have a way for
-        # uniqely identifying machines. For the key, we will use 'name'.
+        :return True if the inventory is available, False otherwise.
+        """
+        signature = self._get_machines_signature()
 
-        machines_dict = {}
-        if type(machines) is list:
-            for machine in machines:
-                # If a machine with the same name is already in the dictinary,
-                # warn the user
-                if machines_dict.get(machine["name"]):
-                    self.logger.warning(
-                        f"Machine with the name {machine['name']} is defined multiple "
-                        "times in the config file ({self.machine_config})! Only one "
-                        "of these machines can be taken into account. Make sure "
-                        "each machine name is unique."
-                    )
+        if (
+            self.machines is not None
+            and signature is not None
+            and signature == self._machines_signature
+        ):
+            return True
+
+        machines = self._read_machines_config()
+        if not machines:
+            return False
 
-                machines_dict[machine["name"]] = machine
-        else:
-            # Assuming that the type is 'dict'
-            machines_dict = machines
+        self.machines = machines
+        self._machines_signature = signature
+        self.templates = {}
 
-        return machines_dict
+        return True
 
     def _is_glob_pattern(self, text: str) -> bool:
         """Check if the string is a glob pattern."""
@@ -173,25 +340,62 @@ class Application:
 
         :param machines: Tuple of machine names. Multiple machine names can
         be provided.
+        :param include: Queries selecting additional machines.
+        :param exclude: Queries selecting machines to leave out.
         """
-        # A set for storing matching machine names. Casted to a list,
-        # this is used as a return value of this function.
-        matching_machines = set()
-
-        # Create a list of machines so that it can be modifed
+        # Create lists of machines and queries so that they can be modifed
         machines = list(machines)
+        include = list(include or [])
+        exclude = list(exclude or [])
 
         # If no machine name was provided, assume all machines should match
-        if len(machines) == 0:
+        if len(machines) == 0 and len(include) == 0:
             self.logger.debug(
                 "No machine name(s) provided, assuming all machines match"
             )
             machines.append("*")
 
-        # Build a list of machine names pulled from the config file
-        config_machine_names = []
-        for k, v in self.machines.items():
-            config_machine_names.append(k)
+        matching_machines = self._match_machine_names(machines)
+        if matching_machines is None:
+            return []
+
+        try:
+            for query in include:
+                matching_machines |= selector.compile_query(query).execute(
+                    self.machines
+                )
+
+            for query in exclude:
+                matching_machines -= selector.compile_query(query).execute(
+                    self.machines
+                )
+
+        except selector.QueryError as e:
+            self.logger.error(e)
+            return []
+
+        # None of the machine names matches, return an empty list
+        if len(matching_machines) == 0:
+            message = (
+                "No machines matching name '{}' found. "
+                "Available machines:\n  {}".format(
+                    "' or '".join(machines + include),
+                    "\n  ".join(hostlist.compress(self.machines)),
+                )
+            )
+            self.logger.warning(message)
+            return []
+
+        # Return a sorted list of matching machines
+        return sorted(matching_machines)
+
+    def _match_machine_names(self, machines: list):
+        """Find machines matching the machine names.
+
+        :return Set of matching machine names or None if a name is ambiguous.
+        """
+        # A set for storing matching machine names
+        matching_machines = set()
 
         # Iteratively build a set of maching machine names
         for machine in machines:
@@ -206,7 +410,11 @@ class Application:
                 pattern = "*{}*".format(pattern)
 
             # Find matching machine names
-            matches = fnmatch.filter(config_machine_names, pattern)
+            try:
+                matches = self._match_pattern(pattern)
+            except hostlist.HostlistError as e:
+                self.logger.error(f"Invalid machine name pattern '{machine}': {e}")
+                return None
 
             for match in matches:
                 matching_machines.add(match)
@@ -234,82 +442,703 @@ class Application:
                 )
 
                 self.logger.warning(message)
-                return []
+                return None
 
-        # None of the machine names matches, return an empty list
-        if len(matching_machines) == 0:
-            message = (
-                "No machines matching name '{}' found. "
-                "Available machines:\n  {}".format(
-                    "' or '".join(machines), "\n  ".join(self.machines)
-                )
+        return matching_machines
+
+    def _match_pattern(self, pattern: str) -> list:
+        """Find machines matching the glob pattern or the hostlist expression.
+
+        :return Sorted list of matching machine names.
+        """
+        if hostlist.has_ranges(pattern):
+            return sorted(selector.match_name(self.machines, pattern))
+
+        return self.machines.match(pattern)
+
+    def _get_template(self, machine: str) -> utils.Template:
+        """Return the `ipmitool` template of the machine.
+
+        The credentials are resolved, e.g. read from the files they refer
+        to, the first time the template is needed and kept until the
+        inventory is read again.
+        """
+        template = self.templates.get(machine)
+
+        if template is None:
+            template = self.templates[machine] = utils.Template.build(
+                self._get_config_value(self.machines[machine], "bmc_user"),
+                self._get_config_value(self.machines[machine], "bmc_password"),
+                self._get_config_value(self.machines[machine], "bmc_address"),
+                self.dry_run,
             )
-            self.logger.warning(message)
-            return []
 
-        # Return a sorted list of matching machines
-        matching_machines = list(matching_machines)
-        matching_machines.sort()
+        return template
 
-        return matching_machines
+    def _get_utility(self, machine: str, utility_class=utils.Ipmitool, **kwargs):
+        """Create the utility wrapper for the machine.
+
+        Commands of the utility time out after `timeout` seconds unless
+        another timeout is given.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return utility_class(self._get_template(machine), **kwargs)
+
+    def _dispatch(self, command: Command, utility, options: dict = None):
+        """Call the utility method implementing the command.
+
+        :param options: Keyword arguments of the utility method, e.g.
+        `persistent` or `efiboot` for bootdev commands.
+        :return The result of the method, i.e. a tuple of command result code
+                and command output or, for asynchronous utilities, a coroutine
+                returning such a tuple.
+        """
+        options = options if options else {}
+        method = self.UTILITY_METHODS.get(command)
+
+        if method is None:
+            return None
+
+        # Only bootdev methods take options
+        if command in self.BOOTDEV_DEVICES:
+            return getattr(utility, method)(**options)
+
+        return getattr(utility, method)()
+
+    def _execute_wrapper(
+        self, command: Command, machine: str, options: dict = None, on_start=None
+    ) -> Tuple[bool, str]:
+        """Execute the command on the machine.
+
+        :param on_start: Called with the machine name before the command starts.
+        """
+        if on_start is not None:
+            on_start(machine)
+
+        return self._dispatch(command, self._get_utility(machine), options)
 
-    def _execute_wrapper(self, command: Command, machine: str) -> Tuple[bool, str]:
+    def _execute_shared(
+        self, command: Command, machine: str, options: dict = None
+    ) -> Tuple[bool, str]:
+        """Execute the command, sharing BMC queries with concurrent callers.
 
-        utility = utils.Ipmitool(
-            self._get_config_value(self.machines[machine], "bmc_user"),
-            self._get_config_value(self.machines[machine], "bmc_password"),
-            self._get_config_value(self.machines[machine], "bmc_address"),
-            self.dry_run,
+        Concurrent read-only commands on the same BMC share a single query
+        and its result. Other commands are barriers, so that a read never
+        shares the result of a query started before a change of the state.
+        """
+        bmc_address = self.machines[machine].get("bmc_address")
+        execute = functools.partial(self._execute_wrapper, command, machine, options)
+
+        if bmc_address is None:
+            return execute()
+
+        if command in self.READ_ONLY_COMMANDS:
+            key = (command, tuple(sorted((options or {}).items())))
+            return self.single_flight.do(bmc_address, key, execute)
+
+        return self.single_flight.barrier(bmc_address, execute)
+
+    async def _execute_async(
+        self,
+        command: Command,
+        machines: list,
+        on_result,
+        options: dict = None,
+        on_start=None,
+    ):
+        """Execute the command on the machines with asynchronous utility.
+
+        At most `self.parallel` utility processes run at the same time.
+        `on_result` is called with (machine, success, output) as soon as
+        the command completes on a machine, `on_start`, if given, with
+        the machine name when the command starts.
+        """
+        semaphore = asyncio.BoundedSemaphore(self.parallel)
+        gates = {}
+
+        async def execute(machine, utility):
+            async with self._get_slot(machine, gates) as slot, semaphore:
+                if on_start is not None:
+                    on_start(machine)
+                slot.begin()
+                success, output = await self._dispatch(command, utility, options)
+                slot.success = success
+            on_result((machine, success, output))
+
+        # Resolve machines' credentials up front, so that errors are reported
+        # before any command is executed
+        utilities = [
+            self._get_utility(machine, utils.AsyncIpmitool) for machine in machines
+        ]
+
+        await asyncio.gather(
+            *[
+                execute(machine, utility)
+                for machine, utility in zip(machines, utilities)
+            ]
         )
 
-        # Execute the command
+    def _get_limit_group(self, machine: str) -> str:
+        """Return the group of machines the concurrency is limited in."""
+        if self.limit_by == self.LIMIT_BY_SUBNET:
+            return concurrency.subnet(
+                str(self.machines[machine].get("bmc_address", ""))
+            )
 
-        if command == Command.POWER_STATUS:
-            return utility.power_status()
+        return f"{self.limit_by}={self.machines[machine].get(self.limit_by)}"
 
-        if command == Command.POWER_ON:
-            return utility.power_on()
+    def _get_slot(self, machine: str, gates: dict):
+        """Return the slot limiting the concurrency of the machine's group.
 
-        if command == Command.POWER_OFF:
-            return utility.power_off()
+        :param gates: Gates of the groups in the running event loop.
+        :return Slot or NullSlot if groups are neither limited nor timed.
+        """
+        if not self.adaptive and not self.timings and not self.limits:
+            return concurrency.NullSlot()
 
-        if command == Command.POWER_CYCLE:
-            return utility.power_cycle()
+        group = self._get_limit_group(machine)
 
-        if command == Command.BOOTDEV_BIOS:
-            return utility.bootdev_bios()
+        if group not in gates:
+            if group not in self.controllers:
+                self.controllers[group] = concurrency.Controller(
+                    min(self.parallel, self.limits.get(group, self.parallel)),
+                    self.adaptive,
+                )
+            gates[group] = concurrency.Gate(self.controllers[group])
 
-        if command == Command.BOOTDEV_DISK:
-            return utility.bootdev_disk()
+        return gates[group].slot()
 
-        if command == Command.BOOTDEV_PXE:
-            return utility.bootdev_pxe()
+    def _report_timings(self):
+        """Print the concurrency limit and latencies of each group."""
+        if not self.timings:
+            return
 
-        if command == Command.CONSOLE:
-            return utility.console()
+        for group, controller in sorted(self.controllers.items()):
+            self.logger.info(f"Timings of {group}: {controller.describe()}")
+
+    def _execute_many_async(
+        self, command: Command, machines: list, options: dict = None, on_start=None
+    ) -> Iterator:
+        """Execute the command with asynchronous utility, yielding results.
+
+        The event loop runs in a separate thread. If the caller stops
+        iterating, the pending commands are cancelled.
+        """
+        results = queue.Queue()
+        done = object()
+        state = {}
+
+        def run():
+            loop = asyncio.new_event_loop()
+            task = loop.create_task(
+                self._execute_async(command, machines, results.put, options, on_start)
+            )
+            state["loop"], state["task"] = loop, task
+            try:
+                loop.run_until_complete(task)
+            except BaseException as e:
+                results.put(e)
+            finally:
+                loop.close()
+                results.put(done)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                result = results.get()
+                if result is done:
+                    break
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+
+        finally:
+            if thread.is_alive() and "task" in state:
+                state["loop"].call_soon_threadsafe(state["task"].cancel)
+            thread.join()
+
+    def _execute_many(
+        self,
+        command: Command,
+        machines: list,
+        options: dict = None,
+        on_start=None,
+        on_drained=None,
+    ) -> Iterator:
+        """Execute the command on the machines.
+
+        :param on_start: Called with the machine name before the command
+                         starts on the machine.
+        :param on_drained: Called with the machine name, success and output
+                           of each command which was running when the caller
+                           stopped iterating and completed afterwards.
+
+        :return Iterator of (machine, success, output) tuples. For parallel
+                execution, results are yielded in order of completion.
+        """
+        if self.coordinator is not None and command in self.WORKER_COMMANDS:
+            yield from self.coordinator.execute(
+                command.name, machines, self.machines, options, on_start, self.dry_run
+            )
+            return
+
+        if command == Command.PING:
+            yield from self._ping_many(machines)
+            return
+
+        if self.ping and command != Command.CONSOLE:
+            machines = yield from self._skip_unreachable(machines)
+
+        yield from self._execute_local(command, machines, options, on_start, on_drained)
+
+    def _execute_local(
+        self,
+        command: Command,
+        machines: list,
+        options: dict = None,
+        on_start=None,
+        on_drained=None,
+    ) -> Iterator:
+        """Execute the command on the machines with the configured backend.
+
+        See `_execute_many` for the arguments.
+        """
+        if command == Command.CONSOLE or (
+            self.parallel == 1 and self.backend != self.BACKEND_IPMITOOL_ASYNC
+        ):
+            for machine in machines:
+                yield (machine,) + tuple(
+                    self._execute_wrapper(command, machine, options, on_start)
+                )
+            return
+
+        if self.backend == self.BACKEND_IPMITOOL_ASYNC:
+            yield from self._execute_many_async(command, machines, options, on_start)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.parallel)
+        futures = {
+            executor.submit(
+                self._execute_wrapper, command, machine, options, on_start
+            ): machine
+            for machine in machines
+        }
+
+        try:
+            for future in as_completed(futures):
+                machine = futures.pop(future)
+                yield (machine,) + tuple(future.result())
+
+        # Commands not started yet are cancelled if the caller stops
+        # iterating, e.g. on Ctrl-C, the running ones are drained
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._report_drained(futures, on_drained)
+
+    @staticmethod
+    def _report_drained(futures: dict, on_drained):
+        """Pass the results of the completed, not yielded futures to `on_drained`."""
+        if on_drained is None:
+            return
+
+        for future, machine in futures.items():
+            if not future.cancelled() and future.exception() is None:
+                on_drained(machine, *future.result())
+
+    def _ping_many(self, machines: list) -> Iterator:
+        """Ping BMCs of the machines with RMCP presence pings in one batch.
+
+        :return Iterator of (machine, reachable, output) tuples.
+        """
+        # Addresses are resolved as for `ipmitool`, e.g. read from the files
+        # `include-rel://` values refer to
+        addresses = {
+            machine: (
+                self._get_config_value(self.machines[machine], "bmc_address")
+                if self.machines[machine].get("bmc_address")
+                else None
+            )
+            for machine in machines
+        }
+
+        if self.dry_run:
+            for machine in machines:
+                yield machine, True, f"RMCP ping {addresses[machine]}"
+            return
+
+        rtts = rmcp.ping(
+            (address for address in addresses.values() if address),
+            timeout=self.ping_timeout,
+            retries=self.ping_retries,
+        )
+
+        for machine in machines:
+            address = addresses[machine]
+            if address in rtts:
+                yield (
+                    machine,
+                    True,
+                    f"RMCP pong from {address} in {rtts[address] * 1000:.1f} ms",
+                )
+            else:
+                yield machine, False, f"No response to RMCP ping from {address}"
+
+    def _skip_unreachable(self, machines: list):
+        """Yield failures of machines whose BMC does not answer RMCP ping.
+
+        Nothing is sent in dry run mode.
+
+        :return List of machines whose BMC answered.
+        """
+        if self.dry_run:
+            return machines
+
+        reachable = []
 
-    def _run_command(self, command: Command, machines: list):
+        for machine, success, output in self._ping_many(machines):
+            if success:
+                reachable.append(machine)
+            else:
+                yield machine, False, f"BMC unreachable: {output}"
+
+        self.logger.debug(f"{len(reachable)} of {len(machines)} BMCs answered ping")
+
+        return reachable
+
+    def _run_command(self, command: Command, machines: list, options: dict = None):
         """Run command on all machines.
 
         :return: CLI_OK if all commands were successful, CLI_ERROR otherwise
         """
-        self.logger.debug(f"Running command {command} on machines: {machines}")
+        self.logger.debug(
+            f"Running command {command} on machines: {hostlist.format_names(machines)}"
+        )
 
         return_code = CLI_OK
+        results_summary = self._create_summary()
+        command_progress = self._create_progress(command, len(machines))
+
+        with self._open_journal(command, options) as results_journal, command_progress:
+            # Commands completing after an interruption are journaled too, so
+            # that a resumed run does not repeat them
+            results = self._execute_many(
+                command,
+                machines,
+                options,
+                command_progress.start,
+                results_journal.record,
+            )
 
-        # For each machine in the list
-        for machine in machines:
+            try:
+                # Execute the command on each machine and print the result
+                for machine, success, output in results:
+                    command_progress.finish(machine, success)
+                    results_journal.record(machine, success, output)
+                    self._report_result(machine, success, output, results_summary)
+
+                    if not success:
+                        return_code = CLI_ERROR
+
+            finally:
+                results.close()
+
+        self._report_summary(results_summary)
+        self._report_timings()
 
-            # Execute the command...
-            success, output = self._execute_wrapper(command, machine)
+        return return_code
+
+    def _create_progress(self, command: Command, total: int):
+        """Create the live progress display of the command.
 
-            # And print the result
+        :return Progress or NullProgress if the progress is not displayed,
+                e.g. when the output is not a terminal.
+        """
+        if command == Command.CONSOLE:
+            return progress.NullProgress()
+
+        return progress.create(total, self.no_color)
+
+    def _create_summary(self):
+        """Create the summary of results if requested.
+
+        :return ResultSummary or None if results are printed per machine.
+        """
+        return summary.ResultSummary() if self.summary else None
+
+    def _report_result(self, machine: str, success: bool, output: str, results_summary):
+        """Print the result of the command or add it to the summary."""
+        if results_summary is None:
             if success:
                 if output:
                     self.logger.info("{}: {}".format(machine, output))
             else:
-                return_code = CLI_ERROR
                 self.logger.error("{}: {}".format(machine, output))
+            return
+
+        results_summary.add(machine, success, output)
+
+        if results_summary.progress_due():
+            self.logger.info(f"Progress: {results_summary.counts()}")
+
+    def _report_summary(self, results_summary):
+        """Print the summary of results, if any."""
+        if results_summary is None:
+            return
+
+        for success, line in results_summary.lines():
+            if success:
+                self.logger.info(line)
+            else:
+                self.logger.error(line)
+
+        self.logger.info(results_summary.counts())
+
+    def _open_journal(self, command: Command, options: dict = None):
+        """Open the journal of command results.
+
+        :return Journal or NullJournal if journal is not requested.
+        :raise ApplicationError: if the journal cannot be opened.
+        """
+        if not self.journal_path or command == Command.CONSOLE:
+            return journal.NullJournal()
+
+        try:
+            return journal.Journal(self.journal_path, command.name, options)
+
+        except OSError as e:
+            raise ApplicationError(f"Cannot open journal '{self.journal_path}': {e}")
+
+    def _skip_succeeded(self, command: Command, machines: list, options: dict):
+        """Remove machines the command already succeeded on in a resumed run.
+
+        :return List of remaining machines or None if the journal cannot be
+                used to resume the command.
+        """
+        try:
+            succeeded = journal.read_succeeded(self.resume_path, command.name, options)
+
+        except journal.JournalError as e:
+            self.logger.error(e)
+            return None
+
+        remaining = [machine for machine in machines if machine not in succeeded]
+
+        if len(remaining) < len(machines):
+            self.logger.info(
+                f"Skipping {len(machines) - len(remaining)} machine(s) the command "
+                f"already succeeded on according to '{self.resume_path}'"
+            )
+
+        return remaining
+
+    def _boot_flags_mismatch(self, flags: dict, command: Command, options: dict):
+        """Compare boot flags read back from the BMC with the requested ones.
+
+        :return Description of the mismatch or None if the flags match.
+        """
+        device = self.BOOTDEV_DEVICES[command]
+
+        if flags is None:
+            return "cannot parse boot parameters"
+
+        if not flags["valid"] or flags["device"] != device:
+            found = flags["device"] if flags["valid"] else "no override"
+            return f"expected {device}, found {found}"
+
+        persistent = options.get("persistent", False)
+        if flags["persistent"] != persistent:
+            return "expected {}, found {}".format(
+                "persistent" if persistent else "next boot only",
+                "persistent" if flags["persistent"] else "next boot only",
+            )
+
+        # EFI boot is verified only if requested explicitly or by default
+        efiboot = options.get("efiboot", command == Command.BOOTDEV_BIOS)
+        if efiboot and not flags["efiboot"]:
+            return "expected EFI boot, found legacy boot"
+        if options.get("efiboot") is False and flags["efiboot"]:
+            return "expected legacy boot, found EFI boot"
+
+        return None
+
+    def _verify_bootdev(self, command: Command, machines: list, options: dict):
+        """Read back boot flags of the machines and compare them to the request.
+
+        :return Tuple of a dictionary of machine names and (success, output)
+                tuples and a list of machines that did not take the setting.
+        """
+        results = {}
+        mismatched = []
+
+        for machine, success, output in self._execute_many(
+            Command.BOOTPARAM_GET, machines
+        ):
+            if not success:
+                results[machine] = (False, f"Cannot verify boot device: {output}")
+                continue
+
+            # Nothing to verify, print the command as it would be executed
+            if self.dry_run:
+                results[machine] = (True, output)
+                continue
+
+            mismatch = self._boot_flags_mismatch(
+                utils.parse_boot_flags(output), command, options
+            )
+
+            if mismatch is None:
+                results[machine] = (
+                    True,
+                    f"Boot device set to {self.BOOTDEV_DEVICES[command]} (verified)",
+                )
+            else:
+                results[machine] = (False, f"Boot device not set: {mismatch}")
+                mismatched.append(machine)
+
+        return results, mismatched
+
+    def _run_bootdev_verified(
+        self, command: Command, machines: list, options: dict = None
+    ):
+        """Set the boot device, verify it and retry machines that ignored it.
+
+        :return: CLI_OK if the boot device was set and verified on all
+                 machines, CLI_ERROR otherwise
+        """
+        options = options if options else {}
+        results = {}
+        pending = machines
+
+        with self._open_journal(command, options) as results_journal:
+            for attempt in range(1 + self.verify_retries):
+                if attempt > 0:
+                    self.logger.warning(
+                        f"Retrying {len(pending)} machine(s) that did not take "
+                        f"the boot device setting: {hostlist.format_names(pending)}"
+                    )
+
+                # Set the boot device, journaling the outcome right away...
+                applied = {}
+                for machine, success, output in self._execute_many(
+                    command, pending, options, on_drained=results_journal.record
+                ):
+                    results_journal.record(machine, success, output)
+                    if success:
+                        applied[machine] = output
+                    else:
+                        results[machine] = (False, output)
+
+                # ...and verify it on the machines that accepted the request
+                verified, pending = self._verify_bootdev(
+                    command, list(applied), options
+                )
+                for machine, (success, output) in verified.items():
+                    results_journal.record(machine, success, output)
+                    results[machine] = (
+                        success,
+                        "\n".join(part for part in (applied[machine], output) if part),
+                    )
+
+                if len(pending) == 0:
+                    break
+
+        return_code = CLI_OK
+        results_summary = self._create_summary()
+
+        for machine in machines:
+            success, output = results[machine]
+            self._report_result(machine, success, output, results_summary)
+
+            if not success:
+                return_code = CLI_ERROR
+
+        self._report_summary(results_summary)
+        self._report_timings()
+
+        return return_code
+
+    def _run_console_multi(self, machines: list, log_dir: str = None):
+        """Open SOL consoles with all machines and multiplex their output.
+
+        :return: CLI_OK if all consoles were closed successfully or
+                 interrupted by the user, CLI_ERROR otherwise
+        """
+        multiplexer = sol.SolMultiplexer(sys.stdout.fileno(), log_dir)
+
+        try:
+            for machine in machines:
+                utility = self._get_utility(machine)
+                multiplexer.add(
+                    machine, utility.console_command(), utility.environment()
+                )
+
+        except OSError as e:
+            multiplexer.close()
+            self.logger.error(f"Failed to open SOL console: {e}")
+            return CLI_ERROR
+
+        self.logger.info(
+            f"Opened SOL consoles with {len(machines)} machine(s). "
+            "Press Ctrl-C to close them."
+        )
+
+        try:
+            returncodes = multiplexer.run()
+
+        except KeyboardInterrupt:
+            return CLI_OK
+
+        if any(returncodes.values()):
+            return CLI_ERROR
+
+        return CLI_OK
+
+    def _run_console_capture(self, machines: list, options: dict):
+        """Capture SOL consoles of the machines to files.
+
+        :return: CLI_OK if the capture of all consoles succeeded, i.e. the
+                 trigger pattern was found or, without the pattern, the
+                 consoles were captured until the timeout, CLI_ERROR otherwise
+        """
+        capture = sol.SolCapture(**options)
+        expected = sol.CAPTURE_MATCHED if capture.until else sol.CAPTURE_TIMEOUT
+
+        try:
+            for machine in machines:
+                utility = self._get_utility(machine)
+                capture.add(machine, utility.console_command(), utility.environment())
+
+        except OSError as e:
+            capture.close()
+            self.logger.error(f"Failed to open SOL console: {e}")
+            return CLI_ERROR
+
+        self.logger.info(
+            f"Capturing SOL consoles of {len(machines)} machine(s) "
+            f"to {capture.output_dir}"
+        )
+
+        try:
+            results = capture.run()
+        except KeyboardInterrupt:
+            results = capture.results
+
+        return_code = CLI_OK
+
+        with self._open_journal(Command.CONSOLE_CAPTURE) as results_journal:
+            for machine in machines:
+                result, detail = results[machine]
+                success = result == expected
+                output = self.CAPTURE_MESSAGES[result].format(detail)
+                results_journal.record(machine, success, output)
+
+                if success:
+                    self.logger.info("{}: {}".format(machine, output))
+                else:
+                    return_code = CLI_ERROR
+                    self.logger.error("{}: {}".format(machine, output))
 
         return return_code
 
@@ -331,19 +1160,602 @@ class Application:
                     value = file.read().strip()
 
             except (FileNotFoundError, PermissionError) as e:
-                self.logger.error(
-                    f"Cannot open '{file_path}' file referred in the '{key}' value"
+                raise ApplicationError(
+                    f"Cannot open '{file_path}' file referred in the '{key}' "
+                    f"value: {e}"
                 )
-                self.logger.error(e)
-                exit(1)
 
         return value
 
-    def run(self, command: Command, machines, include, exclude):
+    def select(self, selector) -> List[str]:
+        """Find machines matching the selector.
+
+        :param selector: Machine name pattern or a list of such patterns.
+                         Patterns are matched as by the command line interface.
+        :return Sorted list of machine names.
+        :raise ApplicationError: if the inventory cannot be read or no
+                                 machines match the selector.
+        """
+        if not self._load_machines():
+            raise ApplicationError(
+                f"Could not read machines from '{self.machine_config}'"
+            )
+
+        patterns = [selector] if isinstance(selector, str) else list(selector)
+
+        try:
+            machines = self._get_matching_machines(patterns, None, None)
+        finally:
+            logs.flush()
+
+        if not machines:
+            raise ApplicationError(f"No machines matching {patterns} found")
+
+        return machines
+
+    def iter_execute(
+        self,
+        command: Command,
+        selector,
+        options: dict = None,
+        priority: int = None,
+        deadline: float = None,
+    ) -> Iterator[NodeResult]:
+        """Execute the command on the selected machines, yielding results.
+
+        Commands of concurrent callers are run by a shared scheduler, at most
+        `parallel` at a time, see `scheduler.Scheduler`. Results are yielded
+        as the commands complete. Breaking out of the iteration cancels
+        commands which have not been started yet.
+
+        Machines whose BMC does not answer ping fail without a command if
+        `ping` is set. Pings, commands of workers and commands with the
+        `ipmitool-async` backend are run as by the command line, with the
+        backend's concurrency limits, regardless of priority and deadline.
+
+        :param options: Keyword arguments of the command, e.g. `persistent`
+                        or `efiboot` for bootdev commands.
+        :param priority: Priority class of the request, e.g.
+                         `scheduler.INTERACTIVE` for operator actions.
+                         Status queries are background polling and other
+                         commands are mutating by default.
+        :param deadline: Number of seconds after which the command is not
+                         started on the remaining machines, which fail.
+        :raise ApplicationError: if the machines cannot be selected or their
+                                 credentials cannot be read.
+        """
+        if command in (Command.CONSOLE, Command.CONSOLE_CAPTURE):
+            raise ApplicationError(f"Command {command.name} is not supported")
+
+        machines = self.select(selector)
+
+        # Workers and the asynchronous backend schedule the commands themselves
+        if (
+            self.coordinator is not None
+            or command == Command.PING
+            or self.backend == self.BACKEND_IPMITOOL_ASYNC
+        ):
+            yield from self._node_results(
+                self._execute_many(command, machines, options)
+            )
+            return
+
+        # Resolve machines' credentials up front, as the asynchronous backend
+        # does, so that errors are raised before any command is executed
+        for machine in machines:
+            self._get_template(machine)
+
+        if self.ping:
+            machines = yield from self._node_results(self._skip_unreachable(machines))
+
+        if priority is None:
+            priority = self.COMMAND_PRIORITIES.get(command, scheduler.MUTATING)
+
+        request = self.scheduler.submit(
+            command.name,
+            machines,
+            lambda machine: self._execute_shared(command, machine, options),
+            priority,
+            deadline,
+            options,
+        )
+
+        try:
+            yield from self._node_results(iter(request))
+
+        finally:
+            request.cancel()
+
+    @staticmethod
+    def _node_results(results: Iterator):
+        """Yield NodeResults of (machine, success, output) tuples.
+
+        :return The value returned by the results' generator.
+        """
+        while True:
+            try:
+                machine, success, output = next(results)
+            except StopIteration as stop:
+                return stop.value
+            yield NodeResult(machine, bool(success), output)
+
+    def execute(
+        self,
+        command: Command,
+        selector,
+        options: dict = None,
+        priority: int = None,
+        deadline: float = None,
+    ) -> List[NodeResult]:
+        """Execute the command on the selected machines.
+
+        See `iter_execute` for the arguments.
+
+        :return List of results sorted by machine name.
+        :raise ApplicationError: if the machines cannot be selected or their
+                                 credentials cannot be read.
+        """
+        return sorted(self.iter_execute(command, selector, options, priority, deadline))
+
+    async def execute_async(
+        self,
+        command: Command,
+        selector,
+        options: dict = None,
+        priority: int = None,
+        deadline: float = None,
+    ) -> List[NodeResult]:
+        """Execute the command on the selected machines in the running loop.
+
+        The commands are run by the shared scheduler, the loop only awaits
+        the results. See `iter_execute` for the arguments.
+
+        :return List of results sorted by machine name.
+        :raise ApplicationError: if the machines cannot be selected or their
+                                 credentials cannot be read.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                self.execute, command, selector, options, priority, deadline
+            ),
+        )
+
+    def run(self, command: Command, machines, include, exclude, options=None):
+        """Build a list of applicable machines and execute an action upon them.
+
+        All log messages of the command are written before this method returns.
+
+        :return: CLI_OK if successful, CLI_ERROR on error.
+        """
+        try:
+            return self._run(command, machines, include, exclude, options)
+
+        except ApplicationError as e:
+            self.logger.error(e)
+            return CLI_ERROR
+
+        finally:
+            logs.flush()
+
+    def run_select(self, queries, exclude, explain=False, compress=False):
+        """Print machines selected by the queries.
+
+        :param explain: Print the plan of each query and its cost.
+        :param compress: Print names compressed into hostlist expressions.
+        :return: CLI_OK if any machine was selected, CLI_ERROR otherwise.
+        """
+        try:
+            return self._run_select(queries, exclude, explain, compress)
+
+        finally:
+            logs.flush()
+
+    def _run_select(self, queries, exclude, explain, compress):
+        """Print machines selected by the queries."""
+        if not self._load_machines():
+            self.logger.error("Could not read machines from machines config file")
+            return CLI_ERROR
+
+        plans = [(True, query) for query in (list(queries) or ["*"])]
+        plans += [(False, query) for query in exclude]
+        selected = set()
+        total_cost = 0
+
+        try:
+            for included, query in plans:
+                names, costs = selector.compile_query(query).run(self.machines)
+                total_cost += sum(cost for _, cost in costs)
+
+                if included:
+                    selected |= names
+                else:
+                    selected -= names
+
+                if explain:
+                    self._explain_plan(query, included, names, costs)
+
+        except selector.QueryError as e:
+            self.logger.error(e)
+            return CLI_ERROR
+
+        for name in hostlist.compress(selected) if compress else sorted(selected):
+            self.logger.info(name)
+
+        if explain:
+            self.logger.info(
+                f"Selected {len(selected)} of {len(self.machines)} machines, "
+                f"cost: {total_cost} names examined"
+            )
+
+        return CLI_OK if selected else CLI_ERROR
+
+    def _explain_plan(self, query: str, included: bool, names: set, costs: list):
+        """Print the plan of the query."""
+        self.logger.info("{} '{}':".format("Include" if included else "Exclude", query))
+
+        for description, cost in costs:
+            self.logger.info(f"  {description}: {cost} names examined")
+
+        self.logger.info(f"  matched {len(names)} machines")
+
+    def run_watch(self, machines, include, exclude, options=None):
+        """Watch the power state of the machines and print its changes.
+
+        :param options: Keyword arguments of `watch.Watcher`, e.g.
+                        `min_interval`, and `duration` of the watch.
+        :return: CLI_OK when the watch ends, CLI_ERROR on error.
+        """
+        try:
+            return self._run_watch(machines, include, exclude, options)
+
+        except ApplicationError as e:
+            self.logger.error(e)
+            return CLI_ERROR
+
+        finally:
+            logs.flush()
+
+    def _run_watch(self, machines, include, exclude, options=None):
+        """Watch the power state of the machines and print its changes."""
+        options = dict(options) if options else {}
+        duration = options.pop("duration", None)
+
+        if not self._load_machines():
+            self.logger.error("Could not read machines from machines config file")
+            return CLI_ERROR
+
+        matching_machines = self._get_matching_machines(machines, include, exclude)
+        if len(matching_machines) == 0:
+            return CLI_ERROR
+
+        # Print the commands the machines would be polled with
+        if self.dry_run:
+            return self._run_command(Command.POWER_STATUS, matching_machines)
+
+        self.logger.debug(
+            f"Watching power state of {hostlist.format_names(matching_machines)}"
+        )
+
+        try:
+            watch.watch(
+                watch.Watcher(matching_machines, **options),
+                lambda due: self._execute_many(Command.POWER_STATUS, due),
+                lambda line: print(line, flush=True),
+                duration,
+            )
+
+        except KeyboardInterrupt:
+            pass
+
+        return CLI_OK
+
+    def run_dcmi_power(self, machines, include, exclude, options=None):
+        """Sample the power readings of the machines and print the aggregates.
+
+        :param options: Keyword arguments of `dcmi.sample`, i.e. `count` and
+                        `interval`, and `group_by`, the machine attribute the
+                        readings are aggregated by.
+        :return: CLI_OK when the sampling ends, CLI_ERROR on error.
+        """
+        try:
+            return self._run_dcmi_power(machines, include, exclude, options)
+
+        except ApplicationError as e:
+            self.logger.error(e)
+            return CLI_ERROR
+
+        finally:
+            logs.flush()
+
+    def _run_dcmi_power(self, machines, include, exclude, options=None):
+        """Sample the power readings of the machines and print the aggregates."""
+        options = dict(options) if options else {}
+        group_by = options.pop("group_by", self.DEFAULT_POWER_GROUP_BY)
+
+        if not self._load_machines():
+            self.logger.error("Could not read machines from machines config file")
+            return CLI_ERROR
+
+        matching_machines = self._get_matching_machines(machines, include, exclude)
+        if len(matching_machines) == 0:
+            return CLI_ERROR
+
+        # Print the commands the machines would be sampled with
+        if self.dry_run:
+            return self._run_command(Command.DCMI_POWER_READING, matching_machines)
+
+        sampler = dcmi.Sampler(
+            {
+                machine: dcmi.get_groups(self.machines[machine], group_by)
+                for machine in matching_machines
+            }
+        )
+
+        dcmi.sample(
+            sampler,
+            lambda: self._execute_many(Command.DCMI_POWER_READING, matching_machines),
+            lambda line: print(line, flush=True),
+            **options,
+        )
+
+        return CLI_OK
+
+    def run_apply(self, state_path: str):
+        """Converge the machines to the desired state read from the state file.
+
+        :return: CLI_OK if all machines are in the desired state or were
+                 converged to it, CLI_ERROR otherwise.
+        """
+        try:
+            return self._run_apply(state_path)
+
+        except ApplicationError as e:
+            self.logger.error(e)
+            return CLI_ERROR
+
+        finally:
+            logs.flush()
+
+    def _run_apply(self, state_path: str):
+        """Converge the machines to the desired state read from the state file."""
+        try:
+            entries = reconcile.load(state_path)
+        except reconcile.StateError as e:
+            self.logger.error(e)
+            return CLI_ERROR
+
+        if not self._load_machines():
+            self.logger.error("Could not read machines from machines config file")
+            return CLI_ERROR
+
+        selected = [
+            (query, self._get_matching_machines([], [query], []))
+            for query, _ in entries
+        ]
+        if not all(machines for _, machines in selected):
+            return CLI_ERROR
+
+        desired = reconcile.merge(entries, dict(selected).get)
+        power, flags, errors = self._read_current_state(desired)
+        plan = self._plan_changes(desired, power, flags, errors)
+        self._report_plan(plan, len(desired), errors)
+
+        return self._apply_plan(plan, errors)
+
+    def _read_current_state(self, desired: dict):
+        """Read the power state and the boot flags of the machines.
+
+        :return Tuple of dictionaries of power states, of boot flags and of
+                errors of the reads by machine name.
+        """
+        power = {}
+        flags = {}
+        errors = {}
+        reads = (
+            (Command.POWER_STATUS, "power", power, watch.parse_power_state),
+            (Command.BOOTPARAM_GET, "bootdev", flags, utils.parse_boot_flags),
+        )
+
+        for command, key, states, parse in reads:
+            machines = [machine for machine, state in desired.items() if key in state]
+
+            for machine, success, output in self._execute_many(command, machines):
+                if success:
+                    states[machine] = parse(output)
+                else:
+                    errors[machine] = f"Cannot read current state: {output}"
+
+        return power, flags, errors
+
+    def _plan_changes(self, desired: dict, power: dict, flags: dict, errors: dict):
+        """Compute the commands converging the machines to the desired state.
+
+        Boot devices are set before the power state changes, so that machines
+        powered on boot from the desired device. Machines whose current state
+        could not be read are left out. In dry run mode the current state is
+        unknown and all commands are planned.
+
+        :return List of changes.
+        """
+        bootdev_changes = []
+        power_changes = []
+
+        for machine, state in sorted(desired.items()):
+            if machine in errors:
+                continue
+
+            if "bootdev" in state:
+                command = self.BOOTDEV_COMMANDS[state["bootdev"]]
+                options = {
+                    option: state[option]
+                    for option in reconcile.BOOT_OPTIONS
+                    if option in state
+                }
+                mismatch = self._boot_flags_mismatch(
+                    flags.get(machine), command, options
+                )
+                if mismatch is not None:
+                    bootdev_changes.append(
+                        Change(
+                            machine,
+                            command,
+                            options,
+                            f"bootdev {state['bootdev']} ({mismatch})",
+                        )
+                    )
+
+            current = power.get(machine)
+            if "power" in state and current != state["power"]:
+                power_changes.append(
+                    Change(
+                        machine,
+                        self.POWER_COMMANDS[state["power"]],
+                        {},
+                        f"power {current or 'unknown'} -> {state['power']}",
+                    )
+                )
+
+        return bootdev_changes + power_changes
+
+    def _report_plan(self, plan: list, total: int, errors: dict):
+        """Print the planned changes."""
+        changed = len({change.machine for change in plan})
+        self.logger.info(
+            f"Plan: {len(plan)} change(s) on {changed} machine(s), "
+            f"{total - changed - len(errors)} of {total} machine(s) "
+            "in desired state"
+        )
+
+        for change in plan:
+            self.logger.info(f"{change.machine}: {change.description}")
+
+    def _apply_plan(self, plan: list, errors: dict):
+        """Execute the planned changes, grouped by command and options.
+
+        :return: CLI_OK if all the states were read and all the changes
+                 succeeded, CLI_ERROR otherwise.
+        """
+        return_code = CLI_OK if not errors else CLI_ERROR
+        results_summary = self._create_summary()
+
+        for machine, output in sorted(errors.items()):
+            self._report_result(machine, False, output, results_summary)
+
+        groups = {}
+        for change in plan:
+            key = (change.command, tuple(sorted(change.options.items())))
+            groups.setdefault(key, []).append(change.machine)
+
+        for (command, options), machines in groups.items():
+            for machine, success, output in self._execute_many(
+                command, machines, dict(options)
+            ):
+                self._report_result(machine, success, output, results_summary)
+
+                if not success:
+                    return_code = CLI_ERROR
+
+        self._report_summary(results_summary)
+        self._report_timings()
+
+        return return_code
+
+    def run_worker(self, host: str, port: int):
+        """Execute commands requested by coordinators until interrupted.
+
+        :return: CLI_ERROR if the worker cannot be started.
+        """
+        try:
+            return self._run_worker(host, port)
+
+        finally:
+            logs.flush()
+
+    def _run_worker(self, host: str, port: int):
+        """Execute commands requested by coordinators until interrupted."""
+        if self.coordinator is not None:
+            self.logger.error("A worker cannot distribute commands to other workers")
+            return CLI_ERROR
+
+        # Anyone who can reach the worker could run commands on the machines
+        if not self.worker_token and not cluster.is_loopback(host):
+            self.logger.error(
+                "A worker token is required to listen on a non-loopback address"
+            )
+            return CLI_ERROR
+
+        if not self._load_machines():
+            self.logger.error("Could not read machines from machines config file")
+            return CLI_ERROR
+
+        try:
+            server = self.create_worker(host, port)
+        except OSError as e:
+            self.logger.error(f"Could not listen on {host}:{port}: {e}")
+            return CLI_ERROR
+
+        with server:
+            host, port = server.server_address[:2]
+            self.logger.info(f"Worker listening on {host}:{port}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+        return CLI_OK
+
+    def create_worker(self, host: str, port: int) -> cluster.WorkerServer:
+        """Create the worker executing commands requested by coordinators.
+
+        The caller runs the worker with `serve_forever` and stops it with
+        `shutdown`. Port 0 binds the worker to a free port.
+
+        :raise OSError: if the worker cannot listen on the address.
+        """
+        return cluster.WorkerServer(
+            (host, port),
+            self._execute_shard,
+            [command.name for command in self.WORKER_COMMANDS],
+            self.WORKER_OPTIONS,
+            self.worker_token,
+            self.logger,
+        )
+
+    def _execute_shard(self, command_name: str, machines: list, options: dict):
+        """Execute the command requested by a coordinator on the machines.
+
+        Machine names are resolved in the worker's own machine config.
+
+        :return Iterator of (machine, success, output) tuples.
+        """
+        self.logger.info(f"Running {command_name} on {len(machines)} machine(s)")
+
+        if not self._load_machines():
+            for machine in machines:
+                yield machine, False, "Could not read machines config file on worker"
+            return
+
+        known = [machine for machine in machines if machine in self.machines]
+        for machine in machines:
+            if machine not in self.machines:
+                yield machine, False, "Machine not found in worker's machine config"
+
+        yield from self._execute_many(Command[command_name], known, options)
+
+    def _run(self, command: Command, machines, include, exclude, options=None):
         """Build a list of applicable machines and execute an action upon them.
 
+        :param options: Dictionary of command options. For bootdev commands
+        these are `persistent`, `efiboot` and `verify`, for console command
+        `multi` and `log_dir`, for console capture command the arguments of
+        `sol.SolCapture`.
         :return: CLI_OK if successful, CLI_ERROR on error.
         """
+        options = dict(options) if options else {}
+        verify = options.pop("verify", False)
+        multi = options.pop("multi", False)
+
         self.logger.debug(
             "Running command {} with parameters: "
             "machines={}, include={}, exclude={}".format(
@@ -352,17 +1764,18 @@ class Application:
         )
 
         # Read YAML file containing BMC details of machines
-        machines_from_config = self._read_machines_config()
-        if machines_from_config:
-            self.machines = machines_from_config
-        else:
+        if not self._load_machines():
             # Could not read machines from config file
             self.logger.error("Could not read machines from machines config file")
             return CLI_ERROR
 
         # Exit early if glob pattern is provided for the command that
         # does not support it
-        if (command is Command.CONSOLE) and self._is_glob_pattern(machines[0]):
+        if (
+            (command is Command.CONSOLE)
+            and not multi
+            and self._is_glob_pattern(machines[0])
+        ):
             self.logger.warning(
                 "Glob patterns for MACHINE-NAME are not supported for this command"
             )
@@ -375,5 +1788,27 @@ class Application:
         if len(matching_machines) == 0:
             return CLI_ERROR
 
+        # Skip machines already actioned in the resumed run
+        if self.resume_path:
+            matching_machines = self._skip_succeeded(
+                command, matching_machines, options
+            )
+
+            if matching_machines is None:
+                return CLI_ERROR
+
+            if len(matching_machines) == 0:
+                self.logger.info("Nothing to do, the command succeeded on all machines")
+                return CLI_OK
+
         # Execute an action on the machines
-        return self._run_command(command, matching_machines)
+        if multi and command is Command.CONSOLE:
+            return self._run_console_multi(matching_machines, options.get("log_dir"))
+
+        if command is Command.CONSOLE_CAPTURE:
+            return self._run_console_capture(matching_machines, options)
+
+        if verify and command in self.BOOTDEV_DEVICES:
+            return self._run_bootdev_verified(command, matching_machines, options)
+
+        return self._run_command(command, matching_machines, options)
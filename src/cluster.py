@@ -0,0 +1,347 @@
+"""This module implements distributed execution of commands.
+
+A coordinator splits the machines by the value of a machine attribute, e.g.
+`site` or `zone`, and sends each shard to the worker serving that value.
+Workers execute the command on their machines and stream the results back,
+which the coordinator merges as they arrive.
+
+Workers and the coordinator talk over TCP, with one JSON document per line.
+The coordinator sends a single request:
+
+    {"version":1,"token":"...","command":"POWER_STATUS","options":{},
+     "machines":["compute-1","compute-2"]}
+
+and the worker replies with a line per machine, followed by the end marker:
+
+    {"m":"compute-1","ok":1,"out":"Chassis Power is on"}
+    {"m":"compute-2","ok":0,"out":"Error: Unable to establish session"}
+    {"done":1}
+
+or with `{"error":"..."}` if the request is refused. The machine names are
+resolved in the worker's own machine config, so BMC credentials never leave
+the worker.
+"""
+
+import hmac
+import ipaddress
+import json
+import queue
+import socket
+import socketserver
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+import utils
+
+PROTOCOL_VERSION = 1
+
+DEFAULT_PORT = 8623
+
+# Timeout (in seconds) of connecting to a worker
+CONNECT_TIMEOUT = 10
+
+# Seconds a worker may stay silent on top of the command timeout before the
+# coordinator gives up on it
+READ_TIMEOUT_MARGIN = 30
+
+# Attribute value of the worker serving machines of all other values
+ANY_VALUE = "*"
+
+
+class ClusterError(Exception):
+    """Raised when the workers are misconfigured."""
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Parse `HOST:PORT`, `[IPV6]:PORT` or `HOST` into a (host, port) tuple."""
+    host, port = address, DEFAULT_PORT
+
+    if address.startswith("["):
+        host, _, rest = address[1:].partition("]")
+        if rest:
+            port = rest.lstrip(":")
+    elif address.count(":") == 1:
+        host, port = address.split(":")
+
+    try:
+        port = int(port)
+    except ValueError:
+        raise ClusterError(f"Invalid port in worker address '{address}'")
+
+    if not host or not 0 < port < 65536:
+        raise ClusterError(f"Invalid worker address '{address}'")
+
+    return host, port
+
+
+def parse_workers(workers) -> Dict[str, Tuple[str, int]]:
+    """Parse `VALUE=HOST:PORT` worker definitions.
+
+    :return Dictionary of attribute values and worker addresses.
+    """
+    parsed = {}
+
+    for worker in workers:
+        value, separator, address = worker.partition("=")
+        if not separator or not value:
+            raise ClusterError(f"Invalid worker '{worker}', expected VALUE=HOST:PORT")
+        parsed[value] = parse_address(address)
+
+    return parsed
+
+
+def is_loopback(host: str) -> bool:
+    """Check if the host is a loopback address."""
+    if host == "localhost":
+        return True
+
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _send(stream, message: dict):
+    stream.write((json.dumps(message, separators=(",", ":")) + "\n").encode())
+    stream.flush()
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """Handler of a single request of the coordinator."""
+
+    def handle(self):
+        """Execute the requested command and stream the results back."""
+        try:
+            request = json.loads(self.rfile.readline())
+            error = self.server.check_request(request)
+        except ValueError:
+            error = "Invalid request"
+
+        if error:
+            host, port = self.client_address[:2]
+            self.server.logger.warning(f"Refused request from {host}:{port}: {error}")
+            _send(self.wfile, {"error": error})
+            return
+
+        for machine, success, output in self.server.execute(
+            request["command"], request["machines"], request.get("options")
+        ):
+            _send(self.wfile, {"m": machine, "ok": int(bool(success)), "out": output})
+
+        _send(self.wfile, {"done": 1})
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """Worker executing commands requested by coordinators.
+
+    :param execute: Callable executing the command on the machines, with
+    (command name, machine names, options) arguments, returning an iterator
+    of (machine, success, output) tuples.
+    :param commands: Names of the commands the worker executes.
+    :param options: Names of the boolean command options the worker accepts.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, execute, commands, options, token, logger):
+        """Bind the worker to the address."""
+        super().__init__(address, WorkerHandler)
+        self.execute = execute
+        self.commands = commands
+        self.options = options
+        self.token = token
+        self.logger = logger
+
+    def check_request(self, request: dict) -> str:
+        """Check the request.
+
+        :return Description of the error or an empty string if the request
+                is valid.
+        """
+        if not isinstance(request, dict):
+            return "Invalid request"
+
+        if request.get("version") != PROTOCOL_VERSION:
+            return f"Unsupported protocol version {request.get('version')}"
+
+        if not hmac.compare_digest(
+            str(request.get("token", "")).encode(), self.token.encode()
+        ):
+            return "Invalid token"
+
+        if request.get("command") not in self.commands:
+            return f"Unsupported command {request.get('command')}"
+
+        machines = request.get("machines")
+        if not isinstance(machines, list) or not all(
+            isinstance(machine, str) for machine in machines
+        ):
+            return "Invalid machines"
+
+        options = request.get("options", {})
+        if not isinstance(options, dict) or not all(
+            key in self.options and isinstance(value, bool)
+            for key, value in options.items()
+        ):
+            return "Invalid options"
+
+        return ""
+
+
+class Coordinator:
+    """Coordinator distributing commands to the workers.
+
+    :param workers: Dictionary of attribute values and worker addresses.
+    :param shard_by: Machine attribute the machines are split by.
+    :param command_timeout: Timeout of a single command, which bounds the
+                            time between two results sent by a worker.
+    """
+
+    def __init__(
+        self,
+        workers: dict,
+        shard_by: str,
+        token: str = "",
+        command_timeout: float = utils.DEFAULT_TIMEOUT,
+    ):
+        """Set up the coordinator."""
+        self.workers = workers
+        self.shard_by = shard_by
+        self.token = token
+        self.read_timeout = command_timeout + READ_TIMEOUT_MARGIN
+
+    def shard(self, machines: List[str], inventory) -> tuple:
+        """Split the machines between the workers.
+
+        :return Tuple of a dictionary of worker addresses and lists of
+                machines, and a list of machines no worker serves.
+        """
+        shards = {}
+        unassigned = []
+
+        for machine in machines:
+            value = inventory[machine].get(self.shard_by)
+            address = self.workers.get(
+                str(value) if value is not None else None,
+                self.workers.get(ANY_VALUE),
+            )
+
+            if address is None:
+                unassigned.append(machine)
+            else:
+                shards.setdefault(address, []).append(machine)
+
+        return shards, unassigned
+
+    def _request(self, address, command: str, machines: list, options: dict):
+        """Send the request to the worker, yielding the results.
+
+        :raise OSError, ValueError: if the worker cannot be reached or replies
+                                    with an invalid message.
+        """
+        with socket.create_connection(address, timeout=CONNECT_TIMEOUT) as sock:
+            sock.settimeout(self.read_timeout)
+            stream = sock.makefile("rwb")
+            _send(
+                stream,
+                {
+                    "version": PROTOCOL_VERSION,
+                    "token": self.token,
+                    "command": command,
+                    "options": options or {},
+                    "machines": machines,
+                },
+            )
+
+            for line in stream:
+                message = json.loads(line)
+
+                if "error" in message:
+                    raise ValueError(message["error"])
+
+                if "done" in message:
+                    return
+
+                yield message["m"], bool(message["ok"]), message.get("out", "")
+
+            raise ValueError("Connection closed by the worker")
+
+    def _run_shard(self, address, command, machines, options, results):
+        """Run the shard on the worker, putting the results in the queue.
+
+        Exactly one result is put for each machine of the shard. Machines the
+        worker sent no result for are reported as failed.
+        """
+        host, port = address
+        remaining = set(machines)
+        error = "sent no result"
+
+        try:
+            for machine, success, output in self._request(
+                address, command, machines, options
+            ):
+                # Ignore results of machines not requested or already reported
+                if machine in remaining:
+                    remaining.discard(machine)
+                    results.put((machine, success, output))
+
+        except (OSError, ValueError, KeyError) as e:
+            error = f"failed: {e}"
+
+        for machine in sorted(remaining):
+            results.put((machine, False, f"Worker {host}:{port} {error}"))
+
+    def execute(
+        self,
+        command: str,
+        machines: list,
+        inventory,
+        options=None,
+        on_start=None,
+        dry_run=False,
+    ) -> Iterator:
+        """Execute the command on the machines with the workers.
+
+        :param dry_run: Report the worker each machine would be sent to
+                        instead of contacting the workers.
+        :return Iterator of (machine, success, output) tuples in the order
+                the results arrive.
+        """
+        shards, unassigned = self.shard(machines, inventory)
+
+        for machine in unassigned:
+            yield (
+                machine,
+                False,
+                f"No worker serves machines with {self.shard_by}="
+                f"{inventory[machine].get(self.shard_by)}",
+            )
+
+        if dry_run:
+            for (host, port), shard in shards.items():
+                for machine in shard:
+                    yield machine, True, f"Send {command} to worker {host}:{port}"
+            return
+
+        results = queue.Queue()
+        threads = []
+
+        for address, shard in shards.items():
+            if on_start is not None:
+                for machine in shard:
+                    on_start(machine)
+
+            thread = threading.Thread(
+                target=self._run_shard,
+                args=(address, command, shard, options, results),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        for _ in range(sum(len(shard) for shard in shards.values())):
+            yield results.get()
+
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,223 @@
+"""This module implements adaptive concurrency limits of groups of machines.
+
+A fixed number of concurrent commands is either too conservative for healthy
+networks or too aggressive for congested ones. The commands are instead
+limited per group of machines, e.g. per BMC subnet or per zone, by a controller
+which adapts the limit to the latency observed in the group:
+
+- While the commands succeed and their latency stays close to the lowest
+  latency observed in the group, the limit is raised additively, by one
+  for each window of `limit` completed commands.
+- On a failed command, e.g. a timeout, or on a latency spike the limit is
+  cut in half, at most once per window, so that a burst of slow commands
+  started under the previous limit does not cut it repeatedly.
+
+The limit never exceeds the maximum, i.e. `--parallel`. The latencies of
+commands are kept to describe the timings of each group.
+"""
+
+import asyncio
+import ipaddress
+import time
+from typing import Dict, Iterable, List
+
+# Limit of a group before any command completes
+INITIAL_LIMIT = 4
+
+MIN_LIMIT = 1
+
+# Latency above the lowest latency times the tolerance is a spike
+LATENCY_TOLERANCE = 2.0
+
+# Factor the limit is multiplied by on failures and latency spikes
+BACKOFF = 0.5
+
+# Prefix length of the subnet machines are grouped by
+IPV4_SUBNET_PREFIX = 24
+IPV6_SUBNET_PREFIX = 64
+
+
+def subnet(address: str) -> str:
+    """Return the subnet of the IP address, e.g. `192.168.200.0/24`.
+
+    :return The subnet or the address itself if it is a host name.
+    """
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return address
+
+    prefix = IPV4_SUBNET_PREFIX if ip.version == 4 else IPV6_SUBNET_PREFIX
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def parse_limits(limits: Iterable[str]) -> Dict[str, int]:
+    """Parse `GROUP=N` concurrency limits of groups of machines.
+
+    :return Dictionary of groups, e.g. `10.1.0.0/24` or `zone=a`, and limits.
+    :raise ValueError: if a limit is invalid.
+    """
+    parsed = {}
+
+    for limit in limits:
+        group, separator, value = limit.rpartition("=")
+        if not separator or not group or not value.isdigit() or int(value) < 1:
+            raise ValueError(f"Invalid limit '{limit}', expected GROUP=N")
+        parsed[group] = int(value)
+
+    return parsed
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the percentile of the sorted values, e.g. 0.95 for p95."""
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class Controller:
+    """Controller of the concurrency limit of a group of machines.
+
+    :param adaptive: Whether the limit adapts to the observed latency.
+                     Otherwise it stays at the maximum and the controller
+                     only collects the timings.
+    """
+
+    def __init__(self, max_limit: int, adaptive=True, initial_limit=INITIAL_LIMIT):
+        """Set up the controller."""
+        self.max_limit = max_limit
+        self.adaptive = adaptive
+        self.limit = min(initial_limit, max_limit) if adaptive else max_limit
+        self.peak_limit = self.limit
+        self.baseline = None
+        # Commands completed without congestion since the limit was raised
+        # and commands completed since the limit was cut
+        self.since_increase = 0
+        self.since_backoff = 0
+        self.latencies = []
+        self.failed = 0
+
+    @property
+    def current(self) -> int:
+        """Return the number of commands which may run at once."""
+        return self.limit
+
+    def record(self, latency: float, success: bool):
+        """Record the completed command and adapt the limit."""
+        self.latencies.append(latency)
+
+        if not success:
+            self.failed += 1
+        elif self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+
+        if not self.adaptive:
+            return
+
+        self.since_backoff += 1
+        spike = self.baseline is not None and (
+            latency > self.baseline * LATENCY_TOLERANCE
+        )
+
+        if success and not spike:
+            self.since_increase += 1
+            if self.since_increase >= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.peak_limit = max(self.peak_limit, self.limit)
+                self.since_increase = 0
+        elif self.since_backoff >= self.limit:
+            self.limit = max(MIN_LIMIT, int(self.limit * BACKOFF))
+            self.since_increase = self.since_backoff = 0
+
+    def describe(self) -> str:
+        """Describe the limit and the latencies of the completed commands."""
+        line = f"limit {self.current}"
+        if self.adaptive:
+            line += f" (peak {self.peak_limit}, max {self.max_limit})"
+
+        line += f", {len(self.latencies)} completed, {self.failed} failed"
+
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            line += (
+                f", latency min {latencies[0]:.2f}s, "
+                f"median {percentile(latencies, 0.5):.2f}s, "
+                f"p95 {percentile(latencies, 0.95):.2f}s, "
+                f"max {latencies[-1]:.2f}s"
+            )
+
+        return line
+
+
+class Slot:
+    """Slot of a single command of the group, an asynchronous context manager.
+
+    The caller calls `begin` when the command starts, e.g. after waiting for
+    other limits, and sets `success` once the command completes.
+    """
+
+    def __init__(self, gate, clock=time.monotonic):
+        """Set up the slot of the gate of the group."""
+        self.gate = gate
+        self.clock = clock
+        self.started = None
+        self.success = None
+
+    async def __aenter__(self):
+        """Wait until the limit of the group allows another command."""
+        await self.gate.acquire()
+        return self
+
+    def begin(self):
+        """Record the start of the command."""
+        self.started = self.clock()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Release the slot, recording the completed command."""
+        latency = self.clock() - self.started if self.started is not None else 0.0
+        await self.gate.release(latency, self.success)
+
+
+class Gate:
+    """Gate letting at most the controller's limit of commands run at once."""
+
+    def __init__(self, controller: Controller):
+        """Set up the gate of the group. Call from the running event loop."""
+        self.controller = controller
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        """Wait until another command may run."""
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.in_flight < self.controller.current
+            )
+            self.in_flight += 1
+
+    async def release(self, latency: float, success):
+        """Release the command, recording it unless it was cancelled."""
+        async with self.condition:
+            self.in_flight -= 1
+            if success is not None:
+                self.controller.record(latency, success)
+            self.condition.notify_all()
+
+    def slot(self) -> Slot:
+        """Return the slot of a command."""
+        return Slot(self)
+
+
+class NullSlot:
+    """Slot of a command which is not limited by a group."""
+
+    success = None
+
+    async def __aenter__(self):
+        """Return the slot."""
+        return self
+
+    def begin(self):
+        """Do nothing."""
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Do nothing."""
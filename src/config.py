@@ -0,0 +1,174 @@
+"""This module reads the user config file holding defaults of the options.
+
+The config file, `~/.local/share/fce-ipmi/config` by default, is a YAML mapping
+of global options to their default values, e.g.:
+
+    machine-config-path: /etc/fce-ipmi/nodes.yaml
+    backend: ipmitool-async
+    parallel: 64
+    timeout: 30
+    limits:
+      10.1.0.0/24: 16
+    profiles:
+      dc1:
+        parallel: 256
+        workers:
+          dc1: mgmt-dc1:8623
+
+Values of mappings, e.g. `limits` or `workers`, are the `KEY=VALUE` values of
+the options given multiple times. A profile, e.g. of a site, overrides the
+top-level values. Options given on the command line or in the environment,
+e.g. `FCE_IPMI_PARALLEL`, take precedence over the config file.
+
+The parsed config file is cached next to the inventory cache and is parsed
+again only when the file changes.
+"""
+
+import os
+
+import inventory
+
+import yaml
+
+DEFAULT_PATH = os.path.join(
+    os.path.expanduser("~"), ".local", "share", "fce-ipmi", "config"
+)
+
+CACHE_DIR = os.path.join(os.path.dirname(inventory.DEFAULT_CACHE_DIR), "config")
+
+# Options whose defaults the config file sets, by the key of the config file
+OPTIONS = {
+    "adaptive": "adaptive",
+    "backend": "backend",
+    "cache-dir": "cache_dir",
+    "limit-by": "limit_by",
+    "limits": "limits",
+    "log-file": "log_file",
+    "machine-config": "machine_config",
+    "machine-config-path": "machine_config",
+    "no-color": "no_color",
+    "parallel": "parallel",
+    "ping": "ping",
+    "ping-retries": "ping_retries",
+    "ping-timeout": "ping_timeout",
+    "shard-by": "shard_by",
+    "summary": "summary",
+    "timeout": "timeout",
+    "timings": "timings",
+    "verify-retries": "verify_retries",
+    "workers": "workers",
+}
+
+# Options holding paths, in which `~` is expanded
+PATH_OPTIONS = ("cache_dir", "log_file", "machine_config")
+
+PROFILES_KEY = "profiles"
+
+# Prefix of the environment variables setting the options, e.g. `FCE_IPMI_PARALLEL`
+ENVVAR_PREFIX = "FCE_IPMI"
+
+
+class ConfigError(Exception):
+    """Raised when the config file cannot be read or is invalid."""
+
+
+def envvar(option: str) -> str:
+    """Return the environment variable setting the option, e.g. `--parallel`."""
+    return f"{ENVVAR_PREFIX}_{option.lstrip('-').replace('-', '_').upper()}"
+
+
+def _option_value(option: str, value):
+    """Convert the value of the config file to the value of the option."""
+    if isinstance(value, dict):
+        return [f"{key}={item}" for key, item in value.items()]
+
+    if option in PATH_OPTIONS and isinstance(value, str):
+        return os.path.expanduser(value)
+
+    return value
+
+
+def _parse_section(section, name: str) -> dict:
+    """Parse the top level or a profile of the config file.
+
+    :return Dictionary of option names and their default values.
+    """
+    if not isinstance(section, dict):
+        raise ConfigError(f"{name} must be a mapping")
+
+    unknown = sorted(str(key) for key in section if key not in OPTIONS)
+    if unknown:
+        raise ConfigError(f"Unknown key(s) in {name}: {', '.join(unknown)}")
+
+    return {
+        OPTIONS[key]: _option_value(OPTIONS[key], value)
+        for key, value in section.items()
+    }
+
+
+def parse(path: str) -> dict:
+    """Parse the config file.
+
+    :return Dictionary with the option defaults of the top level under
+            `defaults` and of each profile under `profiles`.
+    :raise ConfigError: if the file cannot be read or is invalid.
+    """
+    try:
+        with open(path) as file:
+            data = yaml.safe_load(file)
+
+    except (OSError, yaml.YAMLError) as e:
+        raise ConfigError(f"Cannot read config file '{path}': {e}")
+
+    if data is None:
+        data = {}
+
+    if not isinstance(data, dict):
+        raise ConfigError(f"'{path}' must be a mapping")
+
+    data = dict(data)
+    profiles = data.pop(PROFILES_KEY, None) or {}
+
+    if not isinstance(profiles, dict):
+        raise ConfigError(f"'{PROFILES_KEY}' of '{path}' must be a mapping")
+
+    return {
+        "defaults": _parse_section(data, f"'{path}'"),
+        "profiles": {
+            str(name): _parse_section(profile, f"profile '{name}' of '{path}'")
+            for name, profile in profiles.items()
+        },
+    }
+
+
+def load(
+    path: str = DEFAULT_PATH,
+    profile: str = None,
+    required=False,
+    cache_dir: str = CACHE_DIR,
+) -> dict:
+    """Return the option defaults set by the config file and the profile.
+
+    :param required: Whether a missing config file is an error. Otherwise it
+                     sets no defaults.
+    :return Dictionary of option names and their default values.
+    :raise ConfigError: if the config file or the profile cannot be read.
+    """
+    if not os.path.exists(path) and not required and not profile:
+        return {}
+
+    cache = inventory.ParseCache(cache_dir)
+    config = cache.get(path)
+
+    if config is None:
+        config = parse(path)
+        cache.put(path, config)
+
+    defaults = dict(config["defaults"])
+
+    if profile:
+        if profile not in config["profiles"]:
+            raise ConfigError(f"Profile '{profile}' not found in '{path}'")
+        defaults.update(config["profiles"][profile])
+
+    return defaults
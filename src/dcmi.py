@@ -0,0 +1,267 @@
+"""This module samples the power consumption of machines over DCMI.
+
+`ipmitool dcmi power reading` reports the instantaneous power reading of a
+single machine. The readings of the machines are sampled in rounds and
+aggregated, as they arrive, by group of machines, e.g. by `zone` or by each of
+the `tags`, and across all machines (the group `all`). Each round is reported
+as one JSON document per group, e.g.:
+
+    {"time":1700000000.0,"round":1,"group":"zone=AZ1","machines":120,
+     "failed":2,"sum":26400,"max":310,"p95":280}
+
+`sum` is the power (in Watts) drawn by the machines of the group which
+answered, `max` and `p95` are the highest reading and the 95th percentile of
+the readings of single machines. After more than one round, the totals of each
+group are reported, e.g.:
+
+    {"group":"zone=AZ1","rounds":60,"readings":7198,"failed":2,
+     "sum_mean":26380.5,"sum_max":27010,"max":340,"p95":285}
+
+`sum_mean` and `sum_max` are the mean and the peak of the power drawn by the
+group in a round. Only running aggregates are kept in memory: the counts of
+readings by Watt are bounded by the range of the readings, not by the number of
+machines or rounds, so that long sampling of large fleets stays cheap.
+"""
+
+import json
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Seconds between the starts of rounds of sampling
+DEFAULT_INTERVAL = 10.0
+
+# Group of all machines
+ALL = "all"
+
+# Percentile of the readings of single machines reported with the sum
+PERCENTILE = 0.95
+
+
+def parse_power_reading(output: str) -> int:
+    """Parse the output of 'ipmitool dcmi power reading'.
+
+    :return The instantaneous power reading in Watts or None if the output
+            does not contain the reading.
+    """
+    match = re.search(r"Instantaneous power reading:\s*(\d+)\s*Watts", output or "")
+    return int(match.group(1)) if match else None
+
+
+def get_groups(machine: dict, key: str) -> List[str]:
+    """Return the groups of the machine, e.g. `zone=AZ1`.
+
+    A machine belongs to the group of each value of a list attribute, e.g.
+    `tags`, and to no group if it lacks the attribute.
+    """
+    value = machine.get(key)
+
+    if value is None:
+        return []
+
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return [f"{key}={item}" for item in values]
+
+
+class Aggregate:
+    """Running aggregates of the power readings of a group of machines."""
+
+    __slots__ = ("readings", "failed", "total", "max", "counts")
+
+    def __init__(self):
+        """Set up the aggregates of no readings."""
+        self.readings = 0
+        self.failed = 0
+        self.total = 0
+        self.max = None
+        # Number of readings by Watt
+        self.counts = {}
+
+    def add(self, watts: int):
+        """Add the power reading of a machine."""
+        self.readings += 1
+        self.total += watts
+        self.max = watts if self.max is None else max(self.max, watts)
+        self.counts[watts] = self.counts.get(watts, 0) + 1
+
+    def merge(self, other: "Aggregate"):
+        """Add the readings and failures of the other aggregates."""
+        self.readings += other.readings
+        self.failed += other.failed
+        self.total += other.total
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        for watts, count in other.counts.items():
+            self.counts[watts] = self.counts.get(watts, 0) + count
+
+    def percentile(self, fraction: float) -> int:
+        """Return the percentile of the readings, e.g. 0.95 for p95.
+
+        :return The reading or None if there are no readings.
+        """
+        if not self.readings:
+            return None
+
+        rank = int(round(fraction * (self.readings - 1)))
+        seen = 0
+
+        for watts in sorted(self.counts):
+            seen += self.counts[watts]
+            if seen > rank:
+                return watts
+
+
+class Totals:
+    """Aggregates of a group of machines across all rounds."""
+
+    __slots__ = ("rounds", "sum_total", "sum_max", "aggregate")
+
+    def __init__(self):
+        """Set up the totals of no rounds."""
+        self.rounds = 0
+        self.sum_total = 0
+        self.sum_max = None
+        self.aggregate = Aggregate()
+
+    def update(self, aggregate: Aggregate):
+        """Add the aggregates of a round."""
+        self.rounds += 1
+        self.sum_total += aggregate.total
+        self.sum_max = (
+            aggregate.total
+            if self.sum_max is None
+            else max(self.sum_max, aggregate.total)
+        )
+        self.aggregate.merge(aggregate)
+
+
+class Sampler:
+    """Aggregates of the power readings of the current round and of all rounds.
+
+    :param groups: Dictionary of machine names and the groups they belong to.
+    :param wall_clock: Clock of the time of the reported rounds.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]], wall_clock=time.time):
+        """Set up the groups of the machines."""
+        self.groups = {
+            machine: [ALL] + list(names) for machine, names in groups.items()
+        }
+        self.wall_clock = wall_clock
+        # Number of completed rounds
+        self.rounds = 0
+        self.started = None
+        self.current = {}
+        self.totals = {}
+
+        for names in self.groups.values():
+            for name in names:
+                self.totals.setdefault(name, Totals())
+
+    def start_round(self):
+        """Start aggregating the readings of a new round."""
+        self.started = self.wall_clock()
+        self.current = {name: Aggregate() for name in self.totals}
+
+    def add(self, machine: str, success: bool, output: str):
+        """Add the result of reading the power of the machine."""
+        watts = parse_power_reading(output) if success else None
+
+        for name in self.groups[machine]:
+            if watts is None:
+                self.current[name].failed += 1
+            else:
+                self.current[name].add(watts)
+
+    def end_round(self) -> List[dict]:
+        """Add the round to the totals.
+
+        :return Records of the round, one per group.
+        """
+        self.rounds += 1
+        records = []
+
+        for name, aggregate in sorted(self.current.items()):
+            self.totals[name].update(aggregate)
+            records.append(
+                {
+                    "time": round(self.started, 3),
+                    "round": self.rounds,
+                    "group": name,
+                    "machines": aggregate.readings,
+                    "failed": aggregate.failed,
+                    "sum": aggregate.total,
+                    "max": aggregate.max,
+                    "p95": aggregate.percentile(PERCENTILE),
+                }
+            )
+
+        return records
+
+    def describe_totals(self) -> List[dict]:
+        """Return records of the totals of all rounds, one per group."""
+        return [
+            {
+                "group": name,
+                "rounds": totals.rounds,
+                "readings": totals.aggregate.readings,
+                "failed": totals.aggregate.failed,
+                "sum_mean": (
+                    round(totals.sum_total / totals.rounds, 1)
+                    if totals.rounds
+                    else None
+                ),
+                "sum_max": totals.sum_max,
+                "max": totals.aggregate.max,
+                "p95": totals.aggregate.percentile(PERCENTILE),
+            }
+            for name, totals in sorted(self.totals.items())
+        ]
+
+
+def sample(
+    sampler: Sampler,
+    poll: Callable[[], Iterator[Tuple[str, bool, str]]],
+    emit: Callable[[str], None],
+    count: int = 1,
+    interval: float = DEFAULT_INTERVAL,
+    clock=time.monotonic,
+    sleep=time.sleep,
+):
+    """Sample the power readings of the machines in rounds and emit aggregates.
+
+    The totals are emitted after more than one round, also when the sampling
+    is interrupted, e.g. with Ctrl-C.
+
+    :param poll: Callable reading the power of all machines, yielding
+                 (machine, success, output) tuples.
+    :param emit: Callable writing a line of the JSON document of a record.
+    :param count: Number of rounds or None to sample until interrupted.
+    :param interval: Seconds between the starts of the rounds.
+    """
+    next_round = clock()
+
+    try:
+        while count is None or sampler.rounds < count:
+            if sampler.rounds:
+                sleep(max(0.0, next_round - clock()))
+
+            next_round = clock() + interval
+            sampler.start_round()
+
+            for machine, success, output in poll():
+                sampler.add(machine, success, output)
+
+            _emit_all(emit, sampler.end_round())
+
+    except KeyboardInterrupt:
+        # The incomplete round is dropped
+        pass
+
+    if sampler.rounds > 1:
+        _emit_all(emit, sampler.describe_totals())
+
+
+def _emit_all(emit: Callable[[str], None], records: Iterable[dict]):
+    for record in records:
+        emit(json.dumps(record, separators=(",", ":")))
@@ -0,0 +1,301 @@
+"""This module implements hostlist expressions of machine names.
+
+A hostlist expression is a glob pattern whose brackets may hold numeric
+ranges, e.g. `compute-[1-500]`, `rack[01-20]-node[1-40]` or
+`node[1-10,15]`. Zero-padded bounds match zero-padded numbers of the same
+width only.
+
+Lists of names can be compressed back into such expressions, e.g.
+`compute-1`, `compute-2`, `compute-3` and `compute-5` into
+`compute-[1-3,5]`, so that messages about many machines stay short.
+"""
+
+import itertools
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+# Contents of brackets holding numeric ranges, e.g. `1-64` or `01-20,25`
+NUMERIC_RANGES = re.compile(r"\d+(-\d+)?(,\d+(-\d+)?)*")
+
+# Name split at its last number, e.g. `rack01-node` `7` `.example.com`
+LAST_NUMBER = re.compile(r"^(.*?)(\d+)(\D*)$", re.DOTALL)
+
+
+class HostlistError(Exception):
+    """Raised when the hostlist expression is invalid."""
+
+
+def is_numeric_ranges(text: str) -> bool:
+    """Check if the contents of brackets are numeric ranges.
+
+    Digits alone, e.g. `[12]`, are a character class as in glob patterns.
+    """
+    return bool(NUMERIC_RANGES.fullmatch(text)) and any(c in text for c in "-,")
+
+
+def is_digit_class(text: str) -> bool:
+    """Check if the contents of brackets are a glob class of single digits.
+
+    E.g. `[0-9]` or `[1-3]`, as opposed to ranges of numbers, e.g. `[1-64]`
+    or `[1,3]`. A bound of more than one digit makes a range: `[1-35]` is
+    the range 1 to 35, not the glob class of 1 to 3 and 5.
+    """
+    return (
+        bool(NUMERIC_RANGES.fullmatch(text))
+        and "," not in text
+        and all(len(bound) == 1 for bound in text.split("-"))
+    )
+
+
+def parse_ranges(text: str) -> List[Tuple[int, int, int]]:
+    """Parse numeric ranges, e.g. `1-64` or `01-20,25`.
+
+    :return List of (start, end, width) tuples. Width is the number of digits
+            of zero-padded numbers or 0 if numbers are not padded.
+    :raise HostlistError: if a range is invalid.
+    """
+    ranges = []
+
+    for item in text.split(","):
+        start, _, end = item.partition("-")
+        end = end or start
+        width = len(start) if len(start) > 1 and start.startswith("0") else 0
+
+        if int(start) > int(end):
+            raise HostlistError(f"Invalid range '{item}'")
+
+        ranges.append((int(start), int(end), width))
+
+    return ranges
+
+
+def in_ranges(number: str, ranges: List[Tuple[int, int, int]]) -> bool:
+    """Check if the number is in any of the ranges."""
+    value = int(number)
+
+    for start, end, width in ranges:
+        if width:
+            if len(number) != width:
+                continue
+        elif number != str(value):
+            continue
+
+        if start <= value <= end:
+            return True
+
+    return False
+
+
+def _format_number(value: int, width: int) -> str:
+    return str(value).zfill(width) if width else str(value)
+
+
+def _find_closing_bracket(pattern: str, index: int) -> int:
+    """Find the bracket closing the one at the index as `fnmatch` does."""
+    end = index + 1
+    if end < len(pattern) and pattern[end] == "!":
+        end += 1
+    if end < len(pattern) and pattern[end] == "]":
+        end += 1
+
+    return pattern.find("]", end)
+
+
+class NamePattern:
+    """Hostlist expression matched against machine names.
+
+    An expression without glob wildcards and character classes, e.g.
+    `compute-[1-64]`, is expandable: it can be resolved by looking up each
+    of the names it expands to.
+    """
+
+    def __init__(self, pattern: str):
+        """Compile the pattern.
+
+        :raise HostlistError: if a numeric range is invalid.
+        """
+        self.pattern = pattern
+        self.ranges = []
+        self.expandable = True
+
+        # Literal strings and lists of numeric ranges, used for expansion
+        self.segments = []
+        parts = []
+        index = 0
+        # In glob patterns, classes of single digits keep their glob meaning,
+        # e.g. `node[0-9]*` matches `node12`
+        glob = any(char in "*?" for char in pattern)
+
+        while index < len(pattern):
+            char = pattern[index]
+            end = _find_closing_bracket(pattern, index) if char == "[" else -1
+            start = index + 1
+            contents = pattern[start:end] if end != -1 else ""
+
+            if char in "*?":
+                parts.append(".*" if char == "*" else ".")
+                self.expandable = False
+            elif end == -1:
+                parts.append(re.escape(char))
+                self._add_literal(char)
+            elif is_numeric_ranges(contents) and not (
+                glob and is_digit_class(contents)
+            ):
+                parts.append(r"(\d+)")
+                self.ranges.append(parse_ranges(contents))
+                self.segments.append(self.ranges[-1])
+                index = end
+            else:
+                parts.append(self._translate_class(contents))
+                self.expandable = False
+                index = end
+
+            index += 1
+
+        self.regex = re.compile("".join(parts), re.DOTALL)
+        self.prefix = self._literal_prefix(pattern)
+
+    def _add_literal(self, char: str):
+        if self.segments and isinstance(self.segments[-1], str):
+            self.segments[-1] += char
+        else:
+            self.segments.append(char)
+
+    @staticmethod
+    def _literal_prefix(pattern: str) -> str:
+        """Return the part of the pattern preceding the first wildcard."""
+        for index, char in enumerate(pattern):
+            if char in "*?[":
+                return pattern[:index]
+
+        return pattern
+
+    @staticmethod
+    def _translate_class(text: str) -> str:
+        """Translate the glob character class into a regular expression."""
+        text = text.replace("\\", "\\\\")
+
+        if text.startswith("!"):
+            text = "^" + text[1:]
+        elif text.startswith("^"):
+            text = "\\" + text
+
+        return f"[{text}]"
+
+    def match(self, name: str) -> bool:
+        """Check if the name matches the pattern."""
+        match = self.regex.fullmatch(name)
+
+        if match is None:
+            return False
+
+        return all(
+            in_ranges(number, ranges)
+            for number, ranges in zip(match.groups(), self.ranges)
+        )
+
+    def size(self) -> int:
+        """Return the number of names an expandable pattern expands to."""
+        size = 1
+        for ranges in self.ranges:
+            size *= sum(end - start + 1 for start, end, _ in ranges)
+
+        return size
+
+    def expand(self) -> Iterator[str]:
+        """Generate the names an expandable pattern expands to."""
+        if not self.expandable:
+            raise HostlistError(f"Pattern '{self.pattern}' cannot be expanded")
+
+        choices = [
+            (
+                [segment]
+                if isinstance(segment, str)
+                else [
+                    _format_number(value, width)
+                    for start, end, width in segment
+                    for value in range(start, end + 1)
+                ]
+            )
+            for segment in self.segments
+        ]
+
+        for parts in itertools.product(*choices):
+            yield "".join(parts)
+
+
+def has_ranges(pattern: str) -> bool:
+    """Check if the pattern holds numeric ranges.
+
+    :raise HostlistError: if a numeric range is invalid.
+    """
+    return bool(NamePattern(pattern).ranges)
+
+
+def _format_ranges(numbers: List[str], width: int) -> str:
+    """Format sorted numbers as ranges, e.g. `1-3,5`."""
+    ranges = []
+
+    for number in numbers:
+        value = int(number)
+        if ranges and value == ranges[-1][1] + 1:
+            ranges[-1][1] = value
+        else:
+            ranges.append([value, value])
+
+    return ",".join(
+        (
+            _format_number(start, width)
+            if start == end
+            else f"{_format_number(start, width)}-{_format_number(end, width)}"
+        )
+        for start, end in ranges
+    )
+
+
+def compress(names: Iterable[str]) -> List[str]:
+    """Compress names into hostlist expressions.
+
+    Names differing only in their last number are compressed into a single
+    expression, e.g. `compute-[1-37,40-500].example.com`.
+
+    :return Sorted list of expressions.
+    """
+    groups = {}
+    expressions = []
+
+    for name in set(names):
+        match = LAST_NUMBER.match(name)
+        if match is None:
+            expressions.append(name)
+            continue
+
+        prefix, number, suffix = match.groups()
+        # Zero-padded numbers are grouped by their width
+        width = len(number) if number.startswith("0") and len(number) > 1 else 0
+        groups.setdefault((prefix, suffix, width), []).append(number)
+
+    # Numbers of a zero-padded width, e.g. `10` for `[01-20]`, join the group
+    # of zero-padded numbers
+    for prefix, suffix, width in [key for key in groups if key[2]]:
+        unpadded = groups.get((prefix, suffix, 0), [])
+        groups[(prefix, suffix, width)] += [n for n in unpadded if len(n) == width]
+        unpadded[:] = [n for n in unpadded if len(n) != width]
+
+    for (prefix, suffix, width), numbers in groups.items():
+        if len(numbers) == 0:
+            continue
+
+        if len(numbers) == 1:
+            expressions.append(prefix + numbers[0] + suffix)
+            continue
+
+        numbers.sort(key=int)
+        expressions.append(f"{prefix}[{_format_ranges(numbers, width)}]{suffix}")
+
+    return sorted(expressions)
+
+
+def format_names(names: Iterable[str]) -> str:
+    """Format names as a comma-separated list of hostlist expressions."""
+    return ",".join(compress(names))
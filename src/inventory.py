@@ -0,0 +1,799 @@
+"""This module reads machines' inventory.
+
+The inventory is read by an inventory source. The source is selected by the
+extension of the machine config path:
+
+- YAML (default): a single YAML file, a directory (e.g. one file per rack
+  or per site) or a glob pattern matching multiple files. Files are parsed
+  in parallel and each parsed file is cached, so that only files which
+  changed since the last run are parsed again.
+- CSV (`.csv`): a header row followed by one row per machine.
+- SQLite (`.db`, `.sqlite`, `.sqlite3`): a database with `machines` table
+  holding one row per machine.
+
+CSV and SQLite exports are imported into a local, indexed SQLite cache, so
+that selecting machines by name or attribute is done with SQL queries instead
+of loading every machine into memory.
+
+Machines read from YAML files are held in memory as compact `MachineRecord`
+objects rather than the dictionaries produced by the YAML parser.
+"""
+
+import bisect
+import csv
+import fnmatch
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Set, Tuple
+
+import yaml
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "fce-ipmi", "inventory"
+)
+
+# Extensions of the files picked up when a directory is given as an inventory
+YAML_EXTENSIONS = (".yaml", ".yml")
+
+# Do not spawn worker processes for fewer files than this
+MIN_FILES_FOR_PROCESS_POOL = 4
+
+# Fields holding a list of values. In CSV and SQLite exports the values
+# are separated with LIST_SEPARATOR.
+LIST_FIELDS = ("tags",)
+LIST_SEPARATOR = ";"
+
+# Character sorting after any character of machine names
+MAX_CHARACTER = chr(0x10FFFF)
+
+# Version of the SQLite cache schema. Bump it when the schema changes.
+SQLITE_CACHE_VERSION = 1
+
+
+class InventoryError(Exception):
+    """Raised when machines' inventory cannot be read."""
+
+
+def is_glob_pattern(text: str) -> bool:
+    """Check if the string is a glob pattern."""
+    return any((char in set("*?[")) for char in text)
+
+
+def expand_paths(path: str) -> List[str]:
+    """Expand the inventory path into a sorted list of YAML files.
+
+    :param path: Path to a file, a directory or a glob pattern.
+    :return List of file paths. A path which is neither a directory nor a glob
+            pattern is returned as is, even if it does not exist, so that
+            the caller can report the error.
+    """
+    if os.path.isdir(path):
+        files = []
+        for root, _, names in os.walk(path):
+            for name in names:
+                if name.endswith(YAML_EXTENSIONS):
+                    files.append(os.path.join(root, name))
+        return sorted(files)
+
+    if is_glob_pattern(path):
+        return sorted(
+            file for file in glob.glob(path, recursive=True) if os.path.isfile(file)
+        )
+
+    return [path]
+
+
+def normalize(machines) -> List[Tuple[str, dict]]:
+    """Convert parsed YAML document into a list of (name, machine) pairs.
+
+    The YAML file with machines' details may be formatted as dict or list.
+    For the list, the 'name' key uniquely identifies a machine.
+    """
+    if machines is None:
+        return []
+
+    if type(machines) is list:
+        return [(machine["name"], machine) for machine in machines]
+
+    # Assuming that the type is 'dict'
+    return list(machines.items())
+
+
+def parse_file(path: str) -> List[Tuple[str, dict]]:
+    """Parse a single YAML inventory file.
+
+    :return List of (name, machine) pairs in the order of the file.
+    """
+    with open(path) as file:
+        return normalize(yaml.load(file, Loader=yaml.FullLoader))
+
+
+# Marks a field missing from machine's details
+_MISSING = object()
+
+
+def _intern(value):
+    """Intern the value if it is a string."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class MachineRecord(Mapping):
+    """Compact, read-only record of machine's details.
+
+    Fields used by the commands and by selecting machines are kept in slots,
+    with repeated values (users, zones, sites, tags) interned so that machines share
+    a single copy of each. The remaining fields are kept serialized and are
+    decoded only when accessed.
+    """
+
+    # Fields kept in slots, the order matches the order of `__slots__`
+    FIELDS = ("bmc_address", "bmc_user", "bmc_password", "zone", "site", "tags")
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, machine: dict):
+        """Convert the dictionary of machine's details into the record."""
+        for field in self.FIELDS:
+            value = machine.get(field, _MISSING)
+            if field == "tags" and isinstance(value, list):
+                value = tuple(_intern(item) for item in value)
+            elif field != "bmc_address":
+                value = _intern(value)
+            object.__setattr__(self, field, value)
+
+        extra = {key: value for key, value in machine.items() if key not in self.FIELDS}
+        object.__setattr__(
+            self,
+            "_extra",
+            pickle.dumps(extra, pickle.HIGHEST_PROTOCOL) if extra else None,
+        )
+
+    def __setattr__(self, name, value):
+        """Refuse to modify the record."""
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def _extra_fields(self) -> dict:
+        return pickle.loads(self._extra) if self._extra else {}
+
+    def __getitem__(self, key):
+        """Return value of the field."""
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return list(value) if isinstance(value, tuple) else value
+
+        return self._extra_fields()[key]
+
+    def __iter__(self):
+        """Iterate over names of the fields."""
+        for field in self.FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+
+        yield from self._extra_fields()
+
+    def __len__(self):
+        """Return the number of fields."""
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        """Return representation of the record."""
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __getstate__(self):
+        """Return the state for pickling."""
+        return dict(self)
+
+    def __setstate__(self, state):
+        """Restore the record from the pickled state."""
+        self.__init__(state)
+
+
+class ParseCache:
+    """Per-file cache of parsed inventory files.
+
+    A cache entry is keyed by the absolute path of the file and is valid
+    as long as the file modification time and size do not change.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        """Set up the cache in the given directory."""
+        self.directory = directory
+
+    def _entry_path(self, path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".pickle")
+
+    @staticmethod
+    def _signature(path: str) -> tuple:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path: str):
+        """Return cached machines of the file or None on cache miss."""
+        try:
+            signature = self._signature(path)
+            with open(self._entry_path(path), "rb") as file:
+                cached_signature, machines = pickle.load(file)
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            return None
+
+        if cached_signature != signature:
+            return None
+
+        return machines
+
+    def put(self, path: str, machines: list):
+        """Store parsed machines of the file in the cache.
+
+        The cache is best effort: a failure to write it is silently ignored.
+        """
+        try:
+            signature = self._signature(path)
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump((signature, machines), file)
+            os.replace(temp_path, self._entry_path(path))
+        except OSError:
+            pass
+
+
+def _parse_file_safe(path: str) -> tuple:
+    """Parse a single YAML inventory file, returning errors as values.
+
+    The machines are converted into records as soon as the file is parsed,
+    so that the dictionaries of a single file are alive at a time.
+    """
+    try:
+        return (
+            [(name, MachineRecord(machine)) for name, machine in parse_file(path)],
+            None,
+        )
+    except (yaml.YAMLError, OSError) as e:
+        return (None, e)
+
+
+def _parse_files(paths: List[str]) -> Iterator[tuple]:
+    """Parse inventory files, in parallel if there are enough of them.
+
+    :return Iterator of (machines, error) tuples in the order of `paths`.
+    """
+    if len(paths) < MIN_FILES_FOR_PROCESS_POOL:
+        yield from (_parse_file_safe(path) for path in paths)
+        return
+
+    # Forked workers would inherit the locks held by the threads of the
+    # parent, e.g. of the scheduler or of the logging handlers, and deadlock
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(mp_context=context) as executor:
+        yield from executor.map(_parse_file_safe, paths)
+
+
+def load_files(paths: List[str], cache: ParseCache = None) -> Iterator[tuple]:
+    """Parse inventory files, using the cache for unchanged files.
+
+    Files not found in the cache are parsed in parallel with a process pool.
+    Results are yielded as the files are parsed, so that the caller can
+    merge them without keeping the machines of all files around twice.
+
+    :return Iterator of (path, machines, error) tuples in the order of
+            `paths`. `machines` is a list of (name, `MachineRecord`) pairs,
+            `error` is an exception raised while reading the file or None.
+    """
+    cached = {}
+    stale = []
+
+    for path in paths:
+        machines = cache.get(path) if cache else None
+        if machines is None:
+            stale.append(path)
+        else:
+            cached[path] = machines
+
+    parsed = _parse_files(stale)
+
+    for path in paths:
+        if path in cached:
+            yield path, cached.pop(path), None
+            continue
+
+        machines, error = next(parsed)
+        if cache and error is None:
+            cache.put(path, machines)
+
+        yield path, machines, error
+
+
+def _attribute_values(value) -> List[str]:
+    """Return the attribute value(s) as a list of strings."""
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+
+    return [str(value)]
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Return the part of the glob pattern preceding the first wildcard."""
+    for index, char in enumerate(pattern):
+        if char in "*?[":
+            return pattern[:index]
+
+    return pattern
+
+
+class Inventory(Mapping):
+    """Read-only mapping of machine names to machines' details.
+
+    Besides the mapping interface, the inventory implements selecting
+    machines by name and attributes. Subclasses may override `match()` to
+    select machines more efficiently, but must return the same results.
+    """
+
+    def match(self, pattern: str = "*", attributes: dict = None) -> List[str]:
+        """Return sorted names of machines matching the criteria.
+
+        :param pattern: Glob pattern matched against the machine name.
+        :param attributes: Dictionary of attribute names and values. A machine
+        matches if, for each attribute, the value is equal to the attribute
+        value or, for list attributes, is one of the list items.
+        """
+        names = fnmatch.filter(list(self), pattern)
+
+        for key, value in (attributes or {}).items():
+            names = [
+                name
+                for name in names
+                if key in self[name]
+                and str(value) in _attribute_values(self[name][key])
+            ]
+
+        return sorted(names)
+
+    def names_with_prefix(self, prefix: str) -> List[str]:
+        """Return sorted names of machines starting with the prefix."""
+        return sorted(name for name in self if name.startswith(prefix))
+
+    def names_with_attribute(self, key: str, value) -> Set[str]:
+        """Return names of machines having the attribute value.
+
+        For list attributes, the value must be one of the list items.
+        """
+        return {
+            name
+            for name, machine in self.items()
+            if key in machine and str(value) in _attribute_values(machine[key])
+        }
+
+
+class DictInventory(Inventory):
+    """Inventory held in memory as a dictionary.
+
+    The sorted list of names and the indexes of attributes are built on
+    first use.
+    """
+
+    def __init__(self, machines: dict):
+        """Wrap the dictionary of machines."""
+        self._machines = machines
+        self._sorted_names = None
+        self._indexes = {}
+
+    def __getitem__(self, name):
+        """Return details of the machine."""
+        return self._machines[name]
+
+    def __iter__(self):
+        """Iterate over machine names."""
+        return iter(self._machines)
+
+    def __len__(self):
+        """Return the number of machines."""
+        return len(self._machines)
+
+    def names_with_prefix(self, prefix: str) -> List[str]:
+        """Return sorted names of machines starting with the prefix."""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._machines)
+
+        start = bisect.bisect_left(self._sorted_names, prefix)
+        end = bisect.bisect_left(self._sorted_names, prefix + MAX_CHARACTER)
+        return self._sorted_names[start:end]
+
+    def names_with_attribute(self, key: str, value) -> Set[str]:
+        """Return names of machines having the attribute value."""
+        index = self._indexes.get(key)
+
+        if index is None:
+            index = {}
+            for name, machine in self._machines.items():
+                if key in machine:
+                    for item in _attribute_values(machine[key]):
+                        index.setdefault(item, set()).add(name)
+
+            index = {item: frozenset(names) for item, names in index.items()}
+            self._indexes[key] = index
+
+        return index.get(str(value), frozenset())
+
+
+class SqliteInventory(Inventory):
+    """Inventory held in the indexed SQLite cache database.
+
+    Machines' details are loaded from the database only when accessed.
+    Each thread, e.g. of the thread pool of the `ipmitool` backend, opens its
+    own connection to the database.
+    """
+
+    def __init__(self, path: str):
+        """Set up the cache database."""
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+
+        return connection
+
+    def __getitem__(self, name):
+        """Return details of the machine."""
+        row = self._connection.execute(
+            "SELECT data FROM machines WHERE name = ?", (name,)
+        ).fetchone()
+
+        if row is None:
+            raise KeyError(name)
+
+        return json.loads(row[0])
+
+    def __contains__(self, name):
+        """Check if the machine is in the inventory."""
+        return (
+            self._connection.execute(
+                "SELECT 1 FROM machines WHERE name = ?", (name,)
+            ).fetchone()
+            is not None
+        )
+
+    def __iter__(self):
+        """Iterate over machine names."""
+        cursor = self._connection.execute("SELECT name FROM machines ORDER BY name")
+        return (name for (name,) in cursor)
+
+    def __len__(self):
+        """Return the number of machines."""
+        return self._connection.execute("SELECT COUNT(*) FROM machines").fetchone()[0]
+
+    def match(self, pattern: str = "*", attributes: dict = None) -> List[str]:
+        """Return sorted names of machines matching the criteria.
+
+        Name prefix and attributes are matched with indexed SQL queries.
+        The candidates are then matched against the full glob pattern with
+        `fnmatch`, so that the results are identical to `Inventory.match()`.
+        """
+        query = "SELECT m.name FROM machines m WHERE 1"
+        parameters = []
+
+        prefix = _literal_prefix(pattern)
+        if prefix:
+            query += " AND m.name >= ? AND m.name < ?"
+            parameters.extend([prefix, prefix + MAX_CHARACTER])
+
+        for key, value in (attributes or {}).items():
+            query += (
+                " AND EXISTS (SELECT 1 FROM attributes a WHERE a.name = m.name"
+                " AND a.key = ? AND a.value = ?)"
+            )
+            parameters.extend([key, str(value)])
+
+        cursor = self._connection.execute(query + " ORDER BY m.name", parameters)
+        return [name for (name,) in cursor if fnmatch.fnmatch(name, pattern)]
+
+    def names_with_prefix(self, prefix: str) -> List[str]:
+        """Return sorted names of machines starting with the prefix."""
+        cursor = self._connection.execute(
+            "SELECT name FROM machines WHERE name >= ? AND name < ? ORDER BY name",
+            (prefix, prefix + MAX_CHARACTER),
+        )
+        return [name for (name,) in cursor]
+
+    def names_with_attribute(self, key: str, value) -> Set[str]:
+        """Return names of machines having the attribute value."""
+        cursor = self._connection.execute(
+            "SELECT name FROM attributes WHERE key = ? AND value = ?",
+            (key, str(value)),
+        )
+        return {name for (name,) in cursor}
+
+
+def build_sqlite_cache(path: str, signature: str, machines: Iterable[tuple]):
+    """Create the indexed SQLite cache database from (name, machine) pairs.
+
+    The database is built in a temporary file and atomically moved into place.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory)
+    os.close(fd)
+
+    try:
+        connection = sqlite3.connect(temp_path)
+        with connection:
+            connection.executescript("""
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE machines (name TEXT PRIMARY KEY, data TEXT);
+                CREATE TABLE attributes (name TEXT, key TEXT, value TEXT);
+                """)
+            for name, machine in machines:
+                # The last definition of a duplicate machine wins
+                if connection.execute(
+                    "DELETE FROM machines WHERE name = ?", (name,)
+                ).rowcount:
+                    connection.execute("DELETE FROM attributes WHERE name = ?", (name,))
+
+                connection.execute(
+                    "INSERT INTO machines VALUES (?, ?)", (name, json.dumps(machine))
+                )
+                connection.executemany(
+                    "INSERT INTO attributes VALUES (?, ?, ?)",
+                    [
+                        (name, key, value)
+                        for key, values in machine.items()
+                        for value in _attribute_values(values)
+                    ],
+                )
+            connection.execute(
+                "CREATE INDEX attributes_key_value ON attributes (key, value, name)"
+            )
+            connection.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("version", str(SQLITE_CACHE_VERSION)), ("signature", signature)],
+            )
+        connection.close()
+        os.replace(temp_path, path)
+
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _read_only_uri(path: str) -> str:
+    """Return the URI opening the SQLite database read-only.
+
+    The path is percent-encoded, so that e.g. `?` or `#` in it are not taken
+    for the query or the fragment of the URI.
+    """
+    return pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+
+
+def _read_sqlite_cache_signature(path: str):
+    """Return signature of the source stored in the cache or None."""
+    try:
+        connection = sqlite3.connect(_read_only_uri(path), uri=True)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+
+    if meta.get("version") != str(SQLITE_CACHE_VERSION):
+        return None
+
+    return meta.get("signature")
+
+
+def row_to_machine(row: dict) -> dict:
+    """Convert a CSV or SQLite row into machine's details.
+
+    Empty columns are skipped and list fields are split into lists.
+    """
+    machine = {}
+
+    for key, value in row.items():
+        if value is None or value == "":
+            continue
+
+        if key in LIST_FIELDS:
+            value = [item.strip() for item in str(value).split(LIST_SEPARATOR)]
+
+        machine[key] = value
+
+    return machine
+
+
+class InventorySource:
+    """Base class of inventory sources.
+
+    An inventory source reads machines from the machine config path and
+    returns them as an `Inventory`. To add a new source, subclass this class,
+    implement `load()` and register the class with `register_source()`.
+    """
+
+    def __init__(self, path: str, cache_dir: str = DEFAULT_CACHE_DIR, logger=None):
+        """Set up the source."""
+        self.path = path
+        self.cache_dir = cache_dir
+        self.logger = logger if logger else logging.getLogger(__name__)
+
+    def load(self) -> Inventory:
+        """Read machines from the source.
+
+        :raise InventoryError: if the machines cannot be read.
+        """
+        raise NotImplementedError
+
+
+class YamlSource(InventorySource):
+    """Read machines from YAML file(s)."""
+
+    def load(self) -> Inventory:
+        """Read machines from a YAML file, a directory or a glob pattern."""
+        paths = expand_paths(self.path)
+
+        if len(paths) == 0:
+            raise InventoryError(
+                f"No machines configuration files found in '{self.path}'"
+            )
+
+        # A single file is not worth caching
+        cache = None
+        if len(paths) > 1 or paths[0] != self.path:
+            cache = ParseCache(self.cache_dir)
+
+        machines_dict = {}
+
+        for path, machines, error in load_files(paths, cache):
+            if isinstance(error, yaml.YAMLError):
+                raise InventoryError(f"Error in machines configuration file: {error}")
+
+            if error is not None:
+                raise InventoryError(
+                    f"Cannot open machines configuration file: '{path}'\n{error}"
+                )
+
+            self.logger.debug(f"Read machines from {path}: {machines}")
+            self._merge(machines_dict, machines, path)
+
+        return DictInventory(machines_dict)
+
+    def _merge(self, machines_dict: dict, machines: list, path: str):
+        """Merge (name, machine) pairs into the dictionary of machines."""
+        for name, machine in machines:
+            # If a machine with the same name is already in the dictinary,
+            # warn the user
+            if name in machines_dict:
+                self.logger.warning(
+                    f"Machine with the name {name} is defined multiple "
+                    f"times in the config file ({path})! Only one "
+                    "of these machines can be taken into account. Make sure "
+                    "each machine name is unique."
+                )
+
+            # Entries of caches written by older versions hold dictionaries
+            if not isinstance(machine, MachineRecord):
+                machine = MachineRecord(machine)
+            machines_dict[name] = machine
+
+
+class CachedSource(InventorySource):
+    """Base class of sources imported into the indexed SQLite cache.
+
+    The cache is rebuilt only when the source file changes.
+    """
+
+    def _rows(self) -> Iterable[dict]:
+        """Yield rows of the source as dictionaries."""
+        raise NotImplementedError
+
+    def _machines(self) -> Iterable[tuple]:
+        """Yield (name, machine) pairs, warning about duplicate names."""
+        seen = set()
+
+        for row in self._rows():
+            machine = row_to_machine(row)
+            name = machine.get("name")
+
+            if name is None:
+                raise InventoryError(
+                    f"Machine without a name in the config file ({self.path})"
+                )
+
+            if name in seen:
+                self.logger.warning(
+                    f"Machine with the name {name} is defined multiple "
+                    f"times in the config file ({self.path})! Only one "
+                    "of these machines can be taken into account. Make sure "
+                    "each machine name is unique."
+                )
+            seen.add(name)
+
+            yield name, machine
+
+    def load(self) -> Inventory:
+        """Import the source into the cache if needed and open the cache."""
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            raise InventoryError(
+                f"Cannot open machines configuration file: '{self.path}'\n{e}"
+            )
+
+        absolute_path = os.path.abspath(self.path)
+        signature = f"{absolute_path}:{stat.st_mtime_ns}:{stat.st_size}"
+        digest = hashlib.sha1(absolute_path.encode("utf-8")).hexdigest()
+        cache_path = os.path.join(self.cache_dir, digest + ".sqlite")
+
+        if _read_sqlite_cache_signature(cache_path) != signature:
+            self.logger.debug(f"Importing machines from {self.path} to {cache_path}")
+            try:
+                build_sqlite_cache(cache_path, signature, self._machines())
+            except (OSError, csv.Error, sqlite3.Error, UnicodeDecodeError) as e:
+                raise InventoryError(f"Error in machines configuration file: {e}")
+
+        return SqliteInventory(cache_path)
+
+
+class CsvSource(CachedSource):
+    """Read machines from a CSV file with a header row."""
+
+    def _rows(self) -> Iterable[dict]:
+        with open(self.path, newline="") as file:
+            yield from csv.DictReader(file)
+
+
+class SqliteSource(CachedSource):
+    """Read machines from `machines` table of an SQLite database."""
+
+    def _rows(self) -> Iterable[dict]:
+        connection = sqlite3.connect(_read_only_uri(self.path), uri=True)
+        connection.row_factory = sqlite3.Row
+        try:
+            for row in connection.execute("SELECT * FROM machines"):
+                yield dict(row)
+        finally:
+            connection.close()
+
+
+# Inventory sources keyed by the machine config file extension
+SOURCES = {}
+
+
+def register_source(extensions: Tuple[str, ...], source_class: type):
+    """Register an inventory source for the machine config file extensions."""
+    for extension in extensions:
+        SOURCES[extension] = source_class
+
+
+def get_source(path: str, cache_dir: str = DEFAULT_CACHE_DIR, logger=None):
+    """Return the inventory source for the machine config path.
+
+    YAML source is used for paths with unregistered extensions.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    source_class = SOURCES.get(extension, YamlSource)
+    return source_class(path, cache_dir, logger)
+
+
+register_source(YAML_EXTENSIONS, YamlSource)
+register_source((".csv",), CsvSource)
+register_source((".db", ".sqlite", ".sqlite3"), SqliteSource)
@@ -0,0 +1,157 @@
+"""This module implements the journal of command results.
+
+The journal is an append-only file with one JSON document per line. The first
+line of each run is a header describing the command, the following lines hold
+the outcome of the command on each machine, e.g.:
+
+    {"command":"POWER_CYCLE","options":{},"time":1700000000}
+    {"m":"compute-1","ok":1}
+    {"m":"compute-2","ok":0,"out":"Error: Unable to establish session"}
+
+Records are written as the results arrive and are fsync'd in batches, so that
+an interrupted run loses at most a single batch. Such a journal can be used to
+resume the run, skipping the machines the command already succeeded on.
+"""
+
+import json
+import os
+import time
+from typing import Iterator
+
+# Number of records written before the journal is fsync'd
+FSYNC_BATCH_SIZE = 256
+
+# Maximum time (in seconds) records may wait before the journal is fsync'd
+FSYNC_INTERVAL = 1.0
+
+# Maximum length of the command output stored with a failed record
+MAX_OUTPUT_LENGTH = 200
+
+
+class JournalError(Exception):
+    """Raised when the journal cannot be used to resume the command."""
+
+
+class Journal:
+    """Append-only journal of command results."""
+
+    def __init__(self, path: str, command: str, options: dict = None):
+        """Open the journal and write the header of the run."""
+        self.path = path
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.file = open(path, "a")
+
+        self._write(
+            {"command": command, "options": options or {}, "time": int(time.time())}
+        )
+        self.sync()
+
+    def _write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def record(self, machine: str, success: bool, output: str = None):
+        """Append the outcome of the command on the machine."""
+        record = {"m": machine, "ok": int(success)}
+        if not success and output:
+            record["out"] = output[:MAX_OUTPUT_LENGTH]
+
+        self._write(record)
+        self.pending += 1
+
+        if (
+            self.pending >= FSYNC_BATCH_SIZE
+            or time.monotonic() - self.last_sync >= FSYNC_INTERVAL
+        ):
+            self.sync()
+
+    def sync(self):
+        """Flush pending records to the disk."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        """Flush pending records and close the journal."""
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self):
+        """Return the journal."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the journal."""
+        self.close()
+
+
+class NullJournal:
+    """Journal which does not record anything."""
+
+    def record(self, machine: str, success: bool, output: str = None):
+        """Do not record anything."""
+
+    def close(self):
+        """Do nothing."""
+
+    def __enter__(self):
+        """Return the journal."""
+        return self
+
+    def __exit__(self, *args):
+        """Do nothing."""
+
+
+def _read_records(file) -> Iterator[dict]:
+    """Read the records of the journal, skipping lines which are not records."""
+    for line in file:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+
+        if isinstance(record, dict):
+            yield record
+
+
+def read_succeeded(path: str, command: str, options: dict = None) -> set:
+    """Read names of machines the command succeeded on from the journal.
+
+    The journal is read line by line. The last outcome recorded for
+    a machine wins. A truncated last line, left by an interrupted run,
+    and records which are not outcomes of a machine are ignored.
+
+    :raise JournalError: if the journal cannot be read or was recorded
+                         for a different command.
+    """
+    succeeded = set()
+
+    try:
+        with open(path) as file:
+            for record in _read_records(file):
+                if "command" in record:
+                    if record["command"] != command or record.get("options", {}) != (
+                        options or {}
+                    ):
+                        raise JournalError(
+                            f"Journal '{path}' was recorded for command "
+                            f"{record['command']} with options "
+                            f"{record.get('options', {})}, cannot resume "
+                            f"command {command} with options {options or {}}"
+                        )
+                    continue
+
+                if not isinstance(record.get("m"), str):
+                    continue
+
+                if record.get("ok"):
+                    succeeded.add(record["m"])
+                else:
+                    succeeded.discard(record["m"])
+
+    except OSError as e:
+        raise JournalError(f"Cannot open journal '{path}': {e}")
+
+    return succeeded
@@ -0,0 +1,237 @@
+"""This module configures logging of the application.
+
+Log records are put on a queue by the logger and written to the console
+(and optionally to a compressed log file) by a listener thread, so that
+threads executing the commands never wait for the terminal or the disk.
+
+The listener and its handlers are shared by the process: configuring the
+logger again replaces the handlers installed previously, including the log
+file, so creating many `Application` objects in a single process does not
+duplicate the output. Only the last configured log file is written to.
+
+The colored console handler keeps a status line, e.g. the progress of the
+command, below the log messages.
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+import colorlog
+
+# Listener writing queued log records to the handlers
+_listener = None
+
+# Serializes flushes of concurrent callers, e.g. of the library API, with
+# replacing the listener
+_listener_lock = threading.RLock()
+
+# Maximum time (in seconds) records may wait in the buffer of the log file
+FLUSH_INTERVAL = 5.0
+
+# Status line of the console handler
+_status_line = None
+
+
+class StatusLine:
+    """Line displayed on the terminal below the log messages."""
+
+    # Move to the beginning of the line and erase it
+    ERASE = "\r\x1b[K"
+
+    def __init__(self, stream):
+        """Set up an empty status line on the stream."""
+        self.stream = stream
+        self.text = ""
+        self.lock = threading.RLock()
+
+    def update(self, text: str):
+        """Replace the text of the status line."""
+        with self.lock:
+            self.text = text
+            self.stream.write(self.ERASE + text)
+            self.stream.flush()
+
+    def clear(self):
+        """Remove the status line."""
+        with self.lock:
+            if self.text:
+                self.text = ""
+                self.stream.write(self.ERASE)
+                self.stream.flush()
+
+    def write_above(self, write):
+        """Call `write` with the status line removed, then draw it again."""
+        with self.lock:
+            if self.text:
+                self.stream.write(self.ERASE)
+            write()
+            if self.text:
+                self.stream.write(self.text)
+                self.stream.flush()
+
+
+class ConsoleHandler(colorlog.StreamHandler):
+    """Colored console handler printing log messages above the status line."""
+
+    def __init__(self):
+        """Set up the handler writing to the standard error."""
+        super().__init__()
+        self.status_line = StatusLine(self.stream)
+
+    def emit(self, record):
+        """Print the log message above the status line."""
+        self.status_line.write_above(lambda: super(ConsoleHandler, self).emit(record))
+
+
+class GzipFileHandler(logging.Handler):
+    """Handler writing log records to a gzip-compressed file.
+
+    Each run appends a new gzip member to the file, so the file can be read
+    with `zcat` as a whole. Records are buffered and compressed together,
+    the file is flushed at most every `FLUSH_INTERVAL` seconds and on close.
+    """
+
+    def __init__(self, path: str, clock=time.monotonic):
+        """Open the log file for appending."""
+        super().__init__()
+        self.path = path
+        self.clock = clock
+        self.stream = gzip.open(path, "at", encoding="utf-8")
+        self.last_flush = clock()
+
+    def emit(self, record):
+        """Write the log record, flushing the file if the interval passed."""
+        try:
+            self.stream.write(self.format(record) + "\n")
+            if self.clock() - self.last_flush >= FLUSH_INTERVAL:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        self.acquire()
+        try:
+            if not self.stream.closed:
+                self.stream.flush()
+            self.last_flush = self.clock()
+        finally:
+            self.release()
+
+    def close(self):
+        """Close the log file."""
+        self.acquire()
+        try:
+            try:
+                if not self.stream.closed:
+                    self.stream.close()
+            finally:
+                super().close()
+        finally:
+            self.release()
+
+
+class _FlushRequest:
+    """Queued marker the listener sets once the records before it are written."""
+
+    def __init__(self):
+        """Set up the request, not done yet."""
+        self.done = threading.Event()
+
+
+class _Listener(logging.handlers.QueueListener):
+    """Queue listener which also acknowledges flush requests."""
+
+    def handle(self, record):
+        """Write the log record or acknowledge the flush request."""
+        if isinstance(record, _FlushRequest):
+            record.done.set()
+        else:
+            super().handle(record)
+
+
+def _get_console_handler(no_color: bool) -> logging.Handler:
+    """Create the console handler."""
+    if no_color:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(fmt="%(levelname)s: %(message)s"))
+    else:
+        handler = ConsoleHandler()
+        handler.setFormatter(colorlog.ColoredFormatter(fmt="%(log_color)s%(message)s"))
+
+    return handler
+
+
+def configure(name: str, debug=False, no_color=False, log_file=None):
+    """Configure the logger, replacing handlers installed by previous calls.
+
+    :param log_file: Path to the gzip-compressed file the log is appended to.
+    :return Configured logger.
+    """
+    with _listener_lock:
+        shutdown()
+        return _configure(name, debug, no_color, log_file)
+
+
+def _configure(name: str, debug: bool, no_color: bool, log_file: str):
+    """Install the handlers and start the listener, see `configure`."""
+    global _listener, _status_line
+
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG if debug else logging.INFO)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    handlers = [_get_console_handler(no_color)]
+    _status_line = getattr(handlers[0], "status_line", None)
+
+    if log_file:
+        file_handler = GzipFileHandler(log_file)
+        file_handler.setFormatter(
+            logging.Formatter(fmt="%(asctime)s %(levelname)s: %(message)s")
+        )
+        handlers.append(file_handler)
+
+    records = queue.Queue()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+
+    _listener = _Listener(records, *handlers)
+    _listener.start()
+
+    return logger
+
+
+def get_status_line():
+    """Return the status line of the console or None if there is none."""
+    return _status_line
+
+
+def flush():
+    """Wait until all log records queued before the call are written."""
+    with _listener_lock:
+        if _listener is not None:
+            request = _FlushRequest()
+            _listener.queue.put(request)
+            request.done.wait()
+
+
+def shutdown():
+    """Write all queued log records and close the handlers."""
+    global _listener
+
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+atexit.register(shutdown)
@@ -5,21 +5,117 @@ Implements the entry point to the application and defines all
 command line actions.
 """
 
+import re
+
 from app import Application
 from app import Command
 
 import click
 
+import cluster
+
+import concurrency
+
+import config
+
+import dcmi
+
 import messages
 
+import rmcp
+
+import utils
+
 import version
 
+import watch
+
 
 VERSION = version.VERSION
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
+def store_meta(ctx, param, value):
+    """Store the value of the option read before the other options."""
+    ctx.meta[param.name] = value
+
+
+def get_config(ctx) -> dict:
+    """Return the option defaults of the config file, read once per run."""
+    if "config" not in ctx.meta:
+        path = ctx.meta.get("config_path") or config.DEFAULT_PATH
+        try:
+            ctx.meta["config"] = config.load(
+                path, ctx.meta.get("profile"), required=path != config.DEFAULT_PATH
+            )
+        except config.ConfigError as e:
+            raise click.BadParameter(str(e), param_hint="'--config'")
+
+    return ctx.meta["config"]
+
+
+class ConfigOption(click.Option):
+    """Option whose default may be set by the config file.
+
+    The value given on the command line or in the environment takes
+    precedence over the config file, which takes precedence over the
+    built-in default.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Set up the option, e.g. `--parallel`, read from `FCE_IPMI_PARALLEL`."""
+        super().__init__(*args, **kwargs)
+        if self.envvar is None:
+            self.envvar = config.envvar(max(self.opts, key=len))
+        self.show_envvar = True
+
+    def get_default(self, ctx, call=True):
+        """Return the default of the config file or the built-in default."""
+        defaults = get_config(ctx)
+        if self.name in defaults:
+            return defaults[self.name]
+
+        return super().get_default(ctx, call=call)
+
+
+def parse_workers(ctx, param, value):
+    """Parse the `VALUE=HOST:PORT` worker definitions."""
+    try:
+        return cluster.parse_workers(value)
+    except cluster.ClusterError as e:
+        raise click.BadParameter(str(e))
+
+
+def parse_limits(ctx, param, value):
+    """Parse the `GROUP=N` concurrency limits."""
+    try:
+        return concurrency.parse_limits(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def check_async_options(backend, adaptive, timings, limits):
+    """Reject the options only the ipmitool-async backend implements."""
+    if backend == Application.BACKEND_IPMITOOL_ASYNC:
+        return
+
+    options = [
+        option
+        for option, value in (
+            ("--adaptive", adaptive),
+            ("--timings", timings),
+            ("--limit", limits),
+        )
+        if value
+    ]
+    if options:
+        raise click.UsageError(
+            f"{', '.join(options)} require(s) --backend "
+            f"{Application.BACKEND_IPMITOOL_ASYNC}"
+        )
+
+
 def print_version(ctx, param, value):
     """Print version of the application."""
     if not value or ctx.resilient_parsing:
@@ -29,6 +125,40 @@ def print_version(ctx, param, value):
 
 
 @click.group(help=messages.MAIN_HELP, context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--adaptive",
+    cls=ConfigOption,
+    is_flag=True,
+    default=False,
+    help="Adapt the number of concurrent commands of each group of machines to "
+    "the observed latency, up to --parallel (ipmitool-async backend only).",
+)
+@click.option(
+    "--backend",
+    cls=ConfigOption,
+    type=click.Choice(Application.BACKENDS),
+    default=Application.BACKEND_IPMITOOL,
+    show_default=True,
+    help="Backend executing the commands.",
+)
+@click.option(
+    "--cache-dir",
+    cls=ConfigOption,
+    metavar="PATH",
+    help="Directory of the cache of parsed machine configs.",
+)
+@click.option(
+    "--config",
+    "config_path",
+    envvar=config.envvar("--config"),
+    show_envvar=True,
+    metavar="PATH",
+    callback=store_meta,
+    expose_value=False,
+    is_eager=True,
+    help="Path to the config file setting defaults of the options.  [default: "
+    "~/.local/share/fce-ipmi/config]",
+)
 @click.option(
     "--debug",
     "-d",
@@ -43,18 +173,133 @@ def print_version(ctx, param, value):
     default=False,
     help="Simulate running the command.",
 )
+@click.option(
+    "--journal",
+    "journal_path",
+    metavar="PATH",
+    help="Append per-machine results of the command to the journal file.",
+)
+@click.option(
+    "--limit",
+    "limits",
+    cls=ConfigOption,
+    metavar="GROUP=N",
+    multiple=True,
+    callback=parse_limits,
+    help=messages.LIMIT_OPTION_HELP,
+)
+@click.option(
+    "--limit-by",
+    cls=ConfigOption,
+    metavar="KEY",
+    default=Application.DEFAULT_LIMIT_BY,
+    show_default=True,
+    help="Group of machines concurrency is limited in: `subnet` of the BMC "
+    "address or a machine attribute, e.g. `zone`.",
+)
+@click.option(
+    "--log-file",
+    cls=ConfigOption,
+    metavar="PATH",
+    help="Append the log to the gzip-compressed file.",
+)
 @click.option(
     "-f",
     "--machine-config",
+    cls=ConfigOption,
     default="./config/nodes.yaml",
-    help="Path to the YAML file with machines' configuration.",
+    help="Path to the YAML file, directory or glob pattern, CSV file or SQLite "
+    "database with machines' configuration.",
 )
 @click.option(
     "--no-color",
+    cls=ConfigOption,
     is_flag=True,
     default=False,
     help="Disable colored output.",
 )
+@click.option(
+    "--parallel",
+    "-p",
+    cls=ConfigOption,
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Maximum number of machines the command is executed on concurrently.",
+)
+@click.option(
+    "--ping",
+    cls=ConfigOption,
+    is_flag=True,
+    default=False,
+    help="Ping BMCs before executing the command and execute it only on the "
+    "machines whose BMC answered.",
+)
+@click.option(
+    "--ping-retries",
+    cls=ConfigOption,
+    type=click.IntRange(min=0),
+    default=rmcp.RETRIES,
+    show_default=True,
+    help="Number of times a BMC which did not answer is pinged again.",
+)
+@click.option(
+    "--ping-timeout",
+    cls=ConfigOption,
+    type=click.FloatRange(min=0, min_open=True),
+    default=rmcp.DEFAULT_TIMEOUT,
+    show_default=True,
+    help="Seconds to wait for the answers of BMCs to each round of pings.",
+)
+@click.option(
+    "--profile",
+    envvar=config.envvar("--profile"),
+    show_envvar=True,
+    metavar="NAME",
+    callback=store_meta,
+    expose_value=False,
+    is_eager=True,
+    help="Profile of the config file, e.g. of a site, overriding its defaults.",
+)
+@click.option(
+    "--resume",
+    "resume_path",
+    metavar="JOURNAL",
+    help="Resume the command recorded in the journal file, skipping machines "
+    "the command already succeeded on.",
+)
+@click.option(
+    "--shard-by",
+    cls=ConfigOption,
+    metavar="KEY",
+    default=Application.DEFAULT_SHARD_BY,
+    show_default=True,
+    help="Machine attribute commands are distributed to the workers by.",
+)
+@click.option(
+    "--summary",
+    cls=ConfigOption,
+    is_flag=True,
+    default=False,
+    help="Print results grouped by the output of the command instead of a "
+    "line per machine.",
+)
+@click.option(
+    "--timeout",
+    cls=ConfigOption,
+    type=click.IntRange(min=1),
+    default=utils.DEFAULT_TIMEOUT,
+    show_default=True,
+    help="Timeout in seconds of a single ipmitool process (not of the console).",
+)
+@click.option(
+    "--timings",
+    cls=ConfigOption,
+    is_flag=True,
+    default=False,
+    help="Print the concurrency limit and the latencies of commands of each "
+    "group of machines (ipmitool-async backend only).",
+)
 @click.option(
     "--verbose",
     "-v",
@@ -62,6 +307,31 @@ def print_version(ctx, param, value):
     default=False,
     help="Be more verbose. [NOT IMPLEMENTED]",
 )
+@click.option(
+    "--verify-retries",
+    cls=ConfigOption,
+    type=click.IntRange(min=0),
+    default=Application.BOOTDEV_VERIFY_RETRIES,
+    show_default=True,
+    help="Number of times the boot device is set again on machines which did "
+    "not take it (bootdev --verify only).",
+)
+@click.option(
+    "--worker",
+    "workers",
+    cls=ConfigOption,
+    metavar="VALUE=HOST:PORT",
+    multiple=True,
+    callback=parse_workers,
+    help=messages.WORKER_OPTION_HELP,
+)
+@click.option(
+    "--worker-token",
+    envvar="FCE_IPMI_WORKER_TOKEN",
+    default="",
+    help="Token shared by the coordinator and the workers.  [env var: "
+    "FCE_IPMI_WORKER_TOKEN]",
+)
 @click.option(
     "--version",
     "-V",
@@ -72,8 +342,36 @@ def print_version(ctx, param, value):
     help="Print program version.",
 )
 @click.pass_context
-def cli(ctx, debug, dry_run, machine_config, no_color, verbose):
+def cli(
+    ctx,
+    adaptive,
+    backend,
+    cache_dir,
+    debug,
+    dry_run,
+    journal_path,
+    limits,
+    limit_by,
+    log_file,
+    machine_config,
+    no_color,
+    parallel,
+    ping,
+    ping_retries,
+    ping_timeout,
+    resume_path,
+    shard_by,
+    summary,
+    timeout,
+    timings,
+    verbose,
+    verify_retries,
+    workers,
+    worker_token,
+):
     """Define root of all commands."""
+    check_async_options(backend, adaptive, timings, limits)
+
     # Ensure that ctx.obj exists and is a dict (in case `cli()` is called
     # by means other than the `if __name__ == "__main__"` block)
     ctx.ensure_object(dict)
@@ -89,6 +387,25 @@ def cli(ctx, debug, dry_run, machine_config, no_color, verbose):
         dry_run=dry_run,
         no_color=no_color,
         verbose=verbose,
+        cache_dir=cache_dir,
+        backend=backend,
+        parallel=parallel,
+        timeout=timeout,
+        journal_path=journal_path,
+        resume_path=resume_path,
+        log_file=log_file,
+        summary=summary,
+        workers=workers,
+        shard_by=shard_by,
+        worker_token=worker_token,
+        adaptive=adaptive,
+        limit_by=limit_by,
+        timings=timings,
+        ping=ping,
+        limits=limits,
+        ping_timeout=ping_timeout,
+        ping_retries=ping_retries,
+        verify_retries=verify_retries,
     )
     ctx.obj["app"] = application
 
@@ -207,11 +524,73 @@ def power_status(ctx, machine, include, exclude):
     ctx.exit(application.run(Command.POWER_STATUS, machine, include, exclude))
 
 
+@power.command("watch", help=messages.POWER_WATCH_ACTION_LONG_HELP)
+@click.argument("machine", nargs=-1, metavar="[MACHINE-NAME ...]")
+@click.option(
+    "-i",
+    "--include",
+    type=str,
+    metavar="PATTERN",
+    help=messages.INCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.option(
+    "-x",
+    "--exclude",
+    type=str,
+    metavar="PATTERN",
+    help=messages.EXCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.option(
+    "--min-interval",
+    type=click.FloatRange(min=0.1),
+    metavar="SECONDS",
+    default=watch.MIN_INTERVAL,
+    show_default=True,
+    help=messages.MIN_INTERVAL_OPTION_HELP,
+)
+@click.option(
+    "--max-interval",
+    type=click.FloatRange(min=0.1),
+    metavar="SECONDS",
+    default=watch.MAX_INTERVAL,
+    show_default=True,
+    help=messages.MAX_INTERVAL_OPTION_HELP,
+)
+@click.option(
+    "--duration",
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    help=messages.DURATION_OPTION_HELP,
+)
+@click.pass_context
+def power_watch(ctx, machine, include, exclude, min_interval, max_interval, duration):
+    """Handle `fce-ipmi power watch` command."""
+    application = ctx.obj["app"]
+    options = {
+        "min_interval": min_interval,
+        "max_interval": max_interval,
+        "duration": duration,
+    }
+    ctx.exit(application.run_watch(machine, include, exclude, options))
+
+
 #
 # bootdev (bios|disk|pxe)
 #
 
 
+def bootdev_options(persistent, efiboot, verify) -> dict:
+    """Build options of bootdev commands, skipping options not provided."""
+    options = {"persistent": persistent, "verify": verify}
+
+    if efiboot is not None:
+        options["efiboot"] = efiboot
+
+    return options
+
+
 @cli.group("bootdev", help=messages.BOOTDEV_LONG_HELP)
 @click.pass_context
 def bootdev(ctx):
@@ -237,11 +616,29 @@ def bootdev(ctx):
     help=messages.EXCLUDE_OPTION_HELP,
     multiple=True,
 )
+@click.option(
+    "--persistent",
+    is_flag=True,
+    default=False,
+    help=messages.PERSISTENT_OPTION_HELP,
+)
+@click.option(
+    "--efiboot/--no-efiboot",
+    default=None,
+    help=messages.EFIBOOT_OPTION_HELP,
+)
+@click.option(
+    "--verify",
+    is_flag=True,
+    default=False,
+    help=messages.VERIFY_OPTION_HELP,
+)
 @click.pass_context
-def bootdev_disk(ctx, machine, include, exclude):
+def bootdev_disk(ctx, machine, include, exclude, persistent, efiboot, verify):
     """Handle `fce-ipmi bootdev disk` command."""
     application = ctx.obj["app"]
-    ctx.exit(application.run(Command.BOOTDEV_DISK, machine, include, exclude))
+    options = bootdev_options(persistent, efiboot, verify)
+    ctx.exit(application.run(Command.BOOTDEV_DISK, machine, include, exclude, options))
 
 
 @bootdev.command("bios", help=messages.BOOTDEV_BIOS_ACTION_LONG_HELP)
@@ -262,11 +659,29 @@ def bootdev_disk(ctx, machine, include, exclude):
     help=messages.EXCLUDE_OPTION_HELP,
     multiple=True,
 )
+@click.option(
+    "--persistent",
+    is_flag=True,
+    default=False,
+    help=messages.PERSISTENT_OPTION_HELP,
+)
+@click.option(
+    "--efiboot/--no-efiboot",
+    default=None,
+    help=messages.EFIBOOT_OPTION_HELP,
+)
+@click.option(
+    "--verify",
+    is_flag=True,
+    default=False,
+    help=messages.VERIFY_OPTION_HELP,
+)
 @click.pass_context
-def bootdev_bios(ctx, machine, include, exclude):
+def bootdev_bios(ctx, machine, include, exclude, persistent, efiboot, verify):
     """Handle `fce-ipmi bootdev bios` command."""
     application = ctx.obj["app"]
-    ctx.exit(application.run(Command.BOOTDEV_BIOS, machine, include, exclude))
+    options = bootdev_options(persistent, efiboot, verify)
+    ctx.exit(application.run(Command.BOOTDEV_BIOS, machine, include, exclude, options))
 
 
 @bootdev.command("pxe", help=messages.BOOTDEV_PXE_ACTION_LONG_HELP)
@@ -287,11 +702,78 @@ def bootdev_bios(ctx, machine, include, exclude):
     help=messages.EXCLUDE_OPTION_HELP,
     multiple=True,
 )
+@click.option(
+    "--persistent",
+    is_flag=True,
+    default=False,
+    help=messages.PERSISTENT_OPTION_HELP,
+)
+@click.option(
+    "--efiboot/--no-efiboot",
+    default=None,
+    help=messages.EFIBOOT_OPTION_HELP,
+)
+@click.option(
+    "--verify",
+    is_flag=True,
+    default=False,
+    help=messages.VERIFY_OPTION_HELP,
+)
 @click.pass_context
-def bootdev_pxe(ctx, machine, include, exclude):
+def bootdev_pxe(ctx, machine, include, exclude, persistent, efiboot, verify):
     """Handle `fce-ipmi bootdev pxe` command."""
     application = ctx.obj["app"]
-    ctx.exit(application.run(Command.BOOTDEV_PXE, machine, include, exclude))
+    options = bootdev_options(persistent, efiboot, verify)
+    ctx.exit(application.run(Command.BOOTDEV_PXE, machine, include, exclude, options))
+
+
+#
+# select
+#
+
+
+@cli.command("select", help=messages.SELECT_LONG_HELP)
+@click.argument("query", nargs=-1, metavar="[QUERY ...]")
+@click.option(
+    "-x",
+    "--exclude",
+    type=str,
+    metavar="QUERY",
+    help=messages.EXCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.option(
+    "--explain",
+    is_flag=True,
+    default=False,
+    help=messages.EXPLAIN_OPTION_HELP,
+)
+@click.option(
+    "-c",
+    "--compress",
+    is_flag=True,
+    default=False,
+    help=messages.COMPRESS_OPTION_HELP,
+)
+@click.pass_context
+def select(ctx, query, exclude, explain, compress):
+    """Handle `fce-ipmi select` command."""
+    application = ctx.obj["app"]
+    ctx.exit(application.run_select(query, exclude, explain, compress))
+
+
+#
+# apply
+#
+
+
+@cli.command("apply", help=messages.APPLY_LONG_HELP)
+@click.argument("state_file", metavar="STATE-FILE")
+@click.pass_context
+def apply(ctx, state_file):
+    """Handle `fce-ipmi apply` command."""
+    application = ctx.obj["app"]
+    ctx.exit(application.run_apply(state_file))
 
 
 #
@@ -299,17 +781,245 @@ def bootdev_pxe(ctx, machine, include, exclude):
 #
 
 
-@cli.command("console", help=messages.CONSOLE_LONG_HELP)
+class DefaultCommandGroup(click.Group):
+    """Command group invoking the default command if no command is given.
+
+    The arguments not starting with a command name are passed to the default
+    command, e.g. `console MACHINE-NAME` is `console activate MACHINE-NAME`.
+    """
+
+    def __init__(self, *args, default_command=None, **kwargs):
+        """Set up the group with the name of the default command."""
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        """Prepend the default command name to the arguments if needed."""
+        if (
+            args
+            and args[0] not in self.commands
+            and args[0] not in ctx.help_option_names
+        ):
+            args.insert(0, self.default_command)
+
+        return super().parse_args(ctx, args)
+
+
+@cli.group(
+    "console",
+    cls=DefaultCommandGroup,
+    default_command="activate",
+    help=messages.CONSOLE_LONG_HELP,
+)
+@click.pass_context
+def console(ctx):
+    """Define the command group for `fce-ipmi console ...` commands."""
+    pass
+
+
+@console.command("activate", help=messages.CONSOLE_ACTIVATE_LONG_HELP)
 @click.argument("machine", metavar="MACHINE-NAME")
+@click.option(
+    "--multi",
+    is_flag=True,
+    default=False,
+    help=messages.MULTI_OPTION_HELP,
+)
+@click.option(
+    "--log-dir",
+    type=click.Path(file_okay=False),
+    help=messages.LOG_DIR_OPTION_HELP,
+)
 @click.pass_context
-def console(ctx, machine):
-    """Handle `fce-ipmi console` command."""
+def console_activate(ctx, machine, multi, log_dir):
+    """Handle `fce-ipmi console [activate]` command."""
     # Application.run() operates on the list of machines
     machines = []
     machines.append(machine)
 
+    options = {"multi": multi, "log_dir": log_dir}
+
+    application = ctx.obj["app"]
+    ctx.exit(application.run(Command.CONSOLE, machines, None, None, options))
+
+
+@console.command("capture", help=messages.CONSOLE_CAPTURE_LONG_HELP)
+@click.argument("machine", nargs=-1, required=True, metavar="PATTERN...")
+@click.option(
+    "--until",
+    metavar="REGEX",
+    help=messages.UNTIL_OPTION_HELP,
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=600,
+    show_default=True,
+    metavar="SECONDS",
+    help=messages.CAPTURE_TIMEOUT_OPTION_HELP,
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False),
+    default="./sol-capture",
+    show_default=True,
+    help=messages.OUTPUT_DIR_OPTION_HELP,
+)
+@click.option(
+    "--rotate-size",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    metavar="MIB",
+    help=messages.ROTATE_SIZE_OPTION_HELP,
+)
+@click.option(
+    "--rotate-count",
+    type=click.IntRange(min=0),
+    default=5,
+    show_default=True,
+    help=messages.ROTATE_COUNT_OPTION_HELP,
+)
+@click.pass_context
+def console_capture(
+    ctx, machine, until, timeout, output_dir, rotate_size, rotate_count
+):
+    """Handle `fce-ipmi console capture` command."""
+    if until:
+        try:
+            re.compile(until)
+        except re.error as e:
+            raise click.BadParameter(str(e), param_hint="'--until'")
+
+    options = {
+        "output_dir": output_dir,
+        "until": until,
+        "timeout": timeout,
+        "rotate_size": rotate_size * 1024 * 1024,
+        "rotate_count": rotate_count,
+    }
+
+    application = ctx.obj["app"]
+    ctx.exit(application.run(Command.CONSOLE_CAPTURE, machine, None, None, options))
+
+
+#
+# ping
+#
+
+
+@cli.command("ping", help=messages.PING_LONG_HELP)
+@click.argument("machine", nargs=-1, metavar="[MACHINE-NAME ...]")
+@click.option(
+    "-i",
+    "--include",
+    type=str,
+    metavar="PATTERN",
+    help=messages.INCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.option(
+    "-x",
+    "--exclude",
+    type=str,
+    metavar="PATTERN",
+    help=messages.EXCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.pass_context
+def ping(ctx, machine, include, exclude):
+    """Handle `fce-ipmi ping` command."""
+    application = ctx.obj["app"]
+    ctx.exit(application.run(Command.PING, machine, include, exclude))
+
+
+#
+# dcmi power
+#
+
+
+@cli.group("dcmi", help=messages.DCMI_LONG_HELP)
+@click.pass_context
+def dcmi_group(ctx):
+    """Define the command group for `fce-ipmi dcmi ...` commands."""
+    pass
+
+
+@dcmi_group.command("power", help=messages.DCMI_POWER_LONG_HELP)
+@click.argument("machine", nargs=-1, metavar="[MACHINE-NAME ...]")
+@click.option(
+    "-i",
+    "--include",
+    type=str,
+    metavar="PATTERN",
+    help=messages.INCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.option(
+    "-x",
+    "--exclude",
+    type=str,
+    metavar="PATTERN",
+    help=messages.EXCLUDE_OPTION_HELP,
+    multiple=True,
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    default=dcmi.DEFAULT_INTERVAL,
+    show_default=True,
+    help=messages.INTERVAL_OPTION_HELP,
+)
+@click.option(
+    "--count",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help=messages.COUNT_OPTION_HELP,
+)
+@click.option(
+    "--group-by",
+    metavar="KEY",
+    default=Application.DEFAULT_POWER_GROUP_BY,
+    show_default=True,
+    help=messages.GROUP_BY_OPTION_HELP,
+)
+@click.pass_context
+def dcmi_power(ctx, machine, include, exclude, interval, count, group_by):
+    """Handle `fce-ipmi dcmi power` command."""
+    application = ctx.obj["app"]
+    options = {
+        "interval": interval,
+        "count": count if count else None,
+        "group_by": group_by,
+    }
+    ctx.exit(application.run_dcmi_power(machine, include, exclude, options))
+
+
+#
+# worker
+#
+
+
+@cli.command("worker", help=messages.WORKER_LONG_HELP)
+@click.option(
+    "--listen",
+    metavar="HOST:PORT",
+    default=f"127.0.0.1:{cluster.DEFAULT_PORT}",
+    show_default=True,
+    help="Address the worker listens on.",
+)
+@click.pass_context
+def worker(ctx, listen):
+    """Handle `fce-ipmi worker` command."""
+    try:
+        host, port = cluster.parse_address(listen)
+    except cluster.ClusterError as e:
+        raise click.BadParameter(str(e), param_hint="'--listen'")
+
     application = ctx.obj["app"]
-    ctx.exit(application.run(Command.CONSOLE, machines, None, None))
+    ctx.exit(application.run_worker(host, port))
 
 
 def init():
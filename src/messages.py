@@ -7,7 +7,23 @@ hostname / IP address, username and password from the YAML file. By default
 
 Alternatively, the file specified as an option `-f, --machine-config` or in
 the configuration (`~/.local/share/fce-ipmi/config`) under the key
-`machine-config-path` will be used. [NOT IMPLEMENTED]
+`machine-config-path` will be used.
+
+The configuration, a YAML mapping of global options to their default values,
+sets the defaults of the options per site, e.g.:
+
+    machine-config-path: /etc/fce-ipmi/nodes.yaml
+    backend: ipmitool-async
+    parallel: 64
+    limits:
+      10.1.0.0/24: 16
+    profiles:
+      dc1:
+        parallel: 256
+
+A profile selected by `--profile` overrides the top-level defaults. Options
+given on the command line take precedence over the environment variables,
+e.g. `FCE_IPMI_PARALLEL=32`, which take precedence over the configuration.
 
 This tool supports bash completion. Press `tab` key twice to display
 available commands, parameters, machine names etc. [NOT IMPLEMENTED]
@@ -57,7 +73,7 @@ EXCLUDE_OPTION_HELP = "Pattern to match machines to be excluded from this comman
 
 POWER_COMMANDS_OPTIONS = """COMMAND OPTIONS
 
--i, --include PATTERN [NOT IMPLEMENTED]
+-i, --include PATTERN
 
 The machines specified in the PATTERN will be included in the list of
 machines selected for executing the command upon them.
@@ -73,7 +89,7 @@ You can also specify multiple `--include` options. In such a case the
 resulting list of machines will be the outcome of a logical 'OR' operation
 between all `--include` options.
 
--x, --exclude PATTERN [NOT IMPLEMENTED]
+-x, --exclude PATTERN
 
 This option excludes machines specified in the PATTERN from running the
 action upon them.
@@ -83,7 +99,11 @@ specifying `--exclude name=MACHINE-NAME`. You can specify other machine
 properties, e.g. tags, zone, etc.
 
 Similarly to `--include` option, this option also supports multiple
-instances (joined as logical 'OR') and comma-separated properties."""
+instances (joined as logical 'OR') and comma-separated properties.
+
+Name patterns may hold numeric ranges, e.g. `compute-[1-64]` or
+`rack[01-20]-node[1-40]`. A property is negated with `!`, e.g.
+`compute-*,!tags=gpu` or `compute-*,zone!=AZ1`."""
 
 POWER_ON_ACTION_LONG_HELP = (
     """Power on one or more machines.
@@ -169,6 +189,35 @@ its full name. For example, if the machine's full name is
     + POWER_COMMANDS_OPTIONS
 )
 
+POWER_WATCH_ACTION_LONG_HELP = (
+    """Watch the power state of one or more machines and print its changes.
+
+The power state of the machines is polled until interrupted with Ctrl-C or
+until --duration SECONDS passes. Each change of the state of a machine is
+printed as a JSON document on a single line, e.g.:
+
+{"time":1700000420.5,"machine":"compute-1","state":"off","previous":"on"}
+
+The first state of each machine is printed with "previous" set to null.
+A machine whose BMC does not answer is in the "unknown" state and the
+output of the failed poll is printed as "error".
+
+A machine is polled every --min-interval seconds after its state changes.
+The interval doubles with each poll which finds the state unchanged, up to
+--max-interval seconds.
+
+If MACHINE-NAME is not specified, all machines are watched.
+
+"""
+    + POWER_COMMANDS_OPTIONS
+)
+
+MIN_INTERVAL_OPTION_HELP = "Interval of polls of a machine after its state changed"
+
+MAX_INTERVAL_OPTION_HELP = "Interval of polls of a machine whose state is stable"
+
+DURATION_OPTION_HELP = "Stop watching after SECONDS [default: until interrupted]"
+
 #
 # bootdev
 #
@@ -194,7 +243,35 @@ Set boot to disk for all machines in availability zones `AZ1` and `AZ2`
     fce-ipmi bootdev --include zone=AZ1 --include zone=AZ2
 """
 
-BOOTDEV_COMMANDS_OPTIONS = POWER_COMMANDS_OPTIONS
+PERSISTENT_OPTION_HELP = "Apply the boot device to all future boots"
+
+EFIBOOT_OPTION_HELP = "Request EFI boot (default for bios) or legacy boot"
+
+VERIFY_OPTION_HELP = "Read back the boot device and retry machines that ignored it"
+
+BOOTDEV_COMMANDS_OPTIONS = (
+    POWER_COMMANDS_OPTIONS
+    + """
+
+--persistent
+
+By default, the boot device applies to the next boot only. With this option
+the boot device applies to all future boots.
+
+--efiboot / --no-efiboot
+
+Request EFI boot or legacy (PC compatible) boot. By default, EFI boot is
+requested for `bios` and no boot type is requested for `disk` and `pxe`.
+
+--verify
+
+Some BMCs silently ignore the request to set the boot device. With this
+option, the boot flags are read back from each machine with `ipmitool
+chassis bootparam get 5` and compared with the request. The request is
+repeated up to --verify-retries times (default 2) only on the machines that
+did not take the setting.
+The result of the verification is reported for each machine."""
+)
 
 BOOTDEV_DISK_ACTION_LONG_HELP = (
     """Force boot from default hard drive.
@@ -214,7 +291,7 @@ its full name. For example, if the machine's full name is
 `compute-1`.
 
 """
-    + POWER_COMMANDS_OPTIONS
+    + BOOTDEV_COMMANDS_OPTIONS
 )
 
 BOOTDEV_BIOS_ACTION_LONG_HELP = (
@@ -235,7 +312,7 @@ its full name. For example, if the machine's full name is
 `compute-1`.
 
 """
-    + POWER_COMMANDS_OPTIONS
+    + BOOTDEV_COMMANDS_OPTIONS
 )
 
 BOOTDEV_PXE_ACTION_LONG_HELP = (
@@ -256,23 +333,243 @@ its full name. For example, if the machine's full name is
 `compute-1`.
 
 """
-    + POWER_COMMANDS_OPTIONS
+    + BOOTDEV_COMMANDS_OPTIONS
 )
 
 #
 # console
 #
 
-CONSOLE_LONG_HELP = """Open a Serial-over-LAN console with a specified machine.
+CONSOLE_LONG_HELP = """Open a Serial-over-LAN console with one or more machines.
+
+If no command is specified, the `activate` command is executed, i.e.
+`fce-ipmi console compute-1` is an equivalent of
+`fce-ipmi console activate compute-1`.
+
+EXAMPLES
+
+Open the console with `compute-1` machine:
+
+    fce-ipmi console compute-1
+
+Capture the consoles of all compute nodes until the login prompt appears:
+
+    fce-ipmi console capture --until 'login:' 'compute-*'
+"""
+
+CONSOLE_ACTIVATE_LONG_HELP = """Open a Serial-over-LAN console with a specified machine.
 
 You can exit the console by typing '&.' sequence.
 
 This command is a wrapper for `ipmitool sol activate`. The wrapper
 executes `ipmitool` with relevant options such as a username and password.
 
-EXAMPLE
+With `--multi` option, MACHINE-NAME is a PATTERN matching multiple
+machines. The consoles with all matching machines are opened at once and
+their output is printed, each line prefixed with the machine name. Use
+`--log-dir` to also write the output of each console to
+`<machine name>.log` file in the directory. Press Ctrl-C to close the
+consoles.
+
+EXAMPLES
 
 Open the console with `compute-1` machine:
 
     fce-ipmi console compute-1
+
+Watch the consoles of all compute nodes, logging each one to a file:
+
+    fce-ipmi console --multi --log-dir ./sol-logs 'compute-*'
     """
+
+MULTI_OPTION_HELP = "Open consoles with all machines matching the PATTERN"
+
+LOG_DIR_OPTION_HELP = "Write output of each console to a file in the directory"
+
+CONSOLE_CAPTURE_LONG_HELP = """Capture Serial-over-LAN consoles of machines to files.
+
+The consoles of all machines matching the PATTERNs are captured at once,
+without printing their output. The output of each console is written to
+`<machine name>.log.gz` file in the output directory. When the file grows
+over `--rotate-size`, it is rotated to `<machine name>.log.1.gz` and so on.
+
+The capture of a console stops when its output matches the `--until`
+regular expression or after `--timeout` seconds. The expression is matched
+against the last 4 KiB of the output, so the captured output is never kept
+in memory.
+
+The command succeeds if the expression was found in the output of all
+consoles or, without `--until`, if all consoles were captured until the
+timeout.
+
+EXAMPLES
+
+Capture the boot of all compute nodes until the login prompt or a kernel
+panic appears, for at most 30 minutes:
+
+    fce-ipmi console capture --until 'login:|Kernel panic' --timeout 1800 \\
+        'compute-*'
+"""
+
+UNTIL_OPTION_HELP = "Stop the capture when the output matches the REGEX"
+
+CAPTURE_TIMEOUT_OPTION_HELP = "Stop the capture after the number of seconds"
+
+OUTPUT_DIR_OPTION_HELP = "Directory the captured output is written to"
+
+ROTATE_SIZE_OPTION_HELP = "Rotate captured output files after this many MiB"
+
+ROTATE_COUNT_OPTION_HELP = "Number of rotated captured output files to keep"
+
+APPLY_LONG_HELP = """Converge machines to the desired state read from STATE-FILE.
+
+STATE-FILE is a YAML mapping of queries selecting machines, see the `select`
+command, to the desired state of the machines:
+
+    compute-*:
+      power: on
+      bootdev: pxe
+    compute-*,tags=gpu:
+      bootdev: disk
+      persistent: true
+
+The desired `power` is `on` or `off`, the desired `bootdev` is `bios`, `disk`
+or `pxe` with optional `persistent` and `efiboot` flags. Later entries
+override earlier entries matching the same machine.
+
+The current power state and boot device of the machines are read first and
+the plan, i.e. the commands needed to converge the machines, is printed.
+Only the planned commands are then executed, boot devices before power
+changes. With `--dry-run`, the current state is not read, all commands are
+planned and printed as they would be executed.
+
+EXAMPLES
+
+    fce-ipmi -p 64 apply state.yaml
+"""
+
+SELECT_LONG_HELP = """Print machines selected by one or more queries.
+
+A query is a comma-separated list of terms, all of which must match:
+
+    PATTERN, name=PATTERN   Machine name matches the glob pattern. Numeric
+                            ranges are supported, e.g. `compute-[1-64]`.
+
+    KEY=VALUE               Attribute is equal to the value or, for lists
+                            such as `tags`, contains the value.
+
+    KEY!=VALUE, !TERM       The term does not match.
+
+Machines matching any of the queries are selected. If no QUERY is
+specified, all machines are selected.
+
+EXAMPLES
+
+Print compute nodes in availability zone `AZ1` without GPUs:
+
+    fce-ipmi select 'compute-*,zone=AZ1,!tags=gpu'
+
+Print the machines of the first four racks compressed into ranges:
+
+    fce-ipmi select --compress 'rack[01-04]-*'
+
+Print the plan of the query and the number of machines it examined:
+
+    fce-ipmi select --explain 'rack[01-04]-node[1-40]' --exclude tags=broken
+"""
+
+EXPLAIN_OPTION_HELP = "Print the plan of each query and its cost"
+
+COMPRESS_OPTION_HELP = "Print names compressed into ranges, e.g. node-[1-3,5]"
+
+DCMI_LONG_HELP = """Read the power consumption of one or more machines over
+DCMI.
+
+This command is a wrapper for `ipmitool` utility. It executes `ipmitool`
+with relevant parameters, such as `dcmi power reading`.
+"""
+
+DCMI_POWER_LONG_HELP = (
+    """Sample the power readings of one or more machines and print their
+aggregates.
+
+The instantaneous power reading of each machine is read concurrently, in
+--count rounds started every --interval seconds, or until interrupted with
+Ctrl-C if --count is 0. The readings are aggregated by the --group-by
+attribute, e.g. `zone`, or by each of the `tags`, and across all machines
+(the group `all`). Each round is printed as a JSON document per group on
+a single line, e.g.:
+
+{"time":1700000000.0,"round":1,"group":"zone=AZ1","machines":120,"failed":2,
+"sum":26400,"max":310,"p95":280}
+
+"sum" is the power in Watts drawn by the machines which answered, "max" and
+"p95" are the highest and the 95th percentile reading of a single machine.
+After more than one round, the totals of each group are printed with the
+mean ("sum_mean") and the peak ("sum_max") of the power drawn in a round and
+"max" and "p95" of all readings.
+
+If MACHINE-NAME is not specified, all machines are sampled.
+
+"""
+    + POWER_COMMANDS_OPTIONS
+)
+
+INTERVAL_OPTION_HELP = "Seconds between the starts of rounds of sampling"
+
+COUNT_OPTION_HELP = "Number of rounds of sampling, 0 to sample until interrupted"
+
+GROUP_BY_OPTION_HELP = "Machine attribute the readings are aggregated by"
+
+PING_LONG_HELP = (
+    """Check that BMCs of one or more machines are reachable.
+
+A single RMCP presence ping (a UDP packet to port 623) is sent to the BMC of
+each machine, all at once, and the BMCs which answer within a second are
+reported as reachable. Pings are sent again once to the BMCs which have not
+answered.
+
+If MACHINE-NAME is not specified, BMCs of all machines are pinged.
+
+To skip machines with unreachable BMCs when executing other commands, use
+the global `--ping` option, e.g. `fce-ipmi --ping power on compute-*`.
+
+"""
+    + POWER_COMMANDS_OPTIONS
+)
+
+LIMIT_OPTION_HELP = (
+    "Limit the number of concurrent commands in the GROUP of machines, e.g. "
+    "`10.1.0.0/24=16` or `zone=a=8` with --limit-by zone, to N (ipmitool-async "
+    "backend only). May be given multiple times."
+)
+
+WORKER_OPTION_HELP = (
+    "Distribute commands on machines whose --shard-by attribute equals VALUE "
+    "to the worker listening on HOST:PORT. VALUE `*` matches machines of all "
+    "other values. May be given multiple times."
+)
+
+WORKER_LONG_HELP = """Execute commands distributed by a coordinator.
+
+The worker executes commands on the machines of its machine config on behalf
+of coordinators, i.e. `fce-ipmi` run with one or more `--worker` options,
+and streams the results back. Run a worker on a management host of each site
+whose BMC network the coordinator cannot reach.
+
+The coordinator splits the selected machines by the `--shard-by` attribute,
+`site` by default, and sends each shard to the worker of that value. The
+coordinator and the workers must use the same `--worker-token`, which is
+required when the worker listens on a non-loopback address.
+
+EXAMPLES
+
+Run a worker of site `dc1` on its management host:
+
+    fce-ipmi --worker-token "$TOKEN" worker --listen 0.0.0.0:8623
+
+Power on compute nodes of sites `dc1` and `dc2` from the coordinator:
+
+    fce-ipmi --worker-token "$TOKEN" --worker dc1=mgmt-dc1:8623 \\
+        --worker dc2=mgmt-dc2:8623 power on compute-*
+"""
@@ -0,0 +1,174 @@
+"""This module implements the live progress display of running commands.
+
+The display is a status line at the bottom of the terminal, e.g.:
+
+    1200/3000 done, 10 failed, 64 in flight, 85.3/s, ETA 0:21, slowest:
+    compute-7 12s, compute-9 11s
+
+Counters are updated as the commands start and complete on the machines,
+which is cheap. The status line is rendered by a separate thread at most
+`REFRESH_RATE` times a second, so rendering never slows down the execution.
+Log messages are printed above the status line, see `logs.StatusLine`.
+"""
+
+import shutil
+import sys
+import threading
+import time
+
+import logs
+
+# Maximum number of status line refreshes per second
+REFRESH_RATE = 5
+
+# Number of the slowest in-flight machines shown
+SLOWEST_COUNT = 3
+
+
+def is_supported(no_color: bool) -> bool:
+    """Check if the progress can be displayed.
+
+    The progress is displayed only on a terminal with colors enabled.
+    Otherwise, the output is plain.
+    """
+    if no_color:
+        return False
+
+    try:
+        return sys.stdout.isatty() and sys.stderr.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def format_duration(seconds: float) -> str:
+    """Format the duration as `M:SS` or `H:MM:SS`."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+
+    return f"{minutes}:{seconds:02}"
+
+
+class Progress:
+    """Progress of the command executed on many machines."""
+
+    def __init__(self, total: int, status_line=None, clock=time.monotonic):
+        """Set up the progress of the command on `total` machines.
+
+        :param status_line: `logs.StatusLine` the progress is displayed on.
+        """
+        self.total = total
+        self.status_line = status_line
+        self.clock = clock
+        self.started = clock()
+        self.completed = 0
+        self.failed = 0
+
+        # Machines in flight and the time the command started on them, in the
+        # order of start, so that the slowest machines come first
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self, machine: str):
+        """Record that the command started on the machine."""
+        with self.lock:
+            self.in_flight[machine] = self.clock()
+
+    def finish(self, machine: str, success: bool):
+        """Record that the command completed on the machine."""
+        with self.lock:
+            self.in_flight.pop(machine, None)
+            self.completed += 1
+            if not success:
+                self.failed += 1
+
+    def render(self, width: int = 0) -> str:
+        """Describe the progress in a single line.
+
+        :param width: Maximum length of the line or 0 if not limited.
+        """
+        now = self.clock()
+
+        with self.lock:
+            completed, failed = self.completed, self.failed
+            in_flight = len(self.in_flight)
+            slowest = []
+            for machine, started in self.in_flight.items():
+                if len(slowest) == SLOWEST_COUNT:
+                    break
+                slowest.append(f"{machine} {int(now - started)}s")
+
+        elapsed = now - self.started
+        throughput = completed / elapsed if elapsed > 0 else 0.0
+
+        line = (
+            f"{completed}/{self.total} done, {failed} failed, "
+            f"{in_flight} in flight, {throughput:.1f}/s"
+        )
+
+        if throughput > 0 and completed < self.total:
+            line += f", ETA {format_duration((self.total - completed) / throughput)}"
+
+        if slowest:
+            line += ", slowest: " + ", ".join(slowest)
+
+        if width and len(line) > width:
+            line = line[: max(0, width - 3)] + "..."
+
+        return line
+
+    def _refresh(self):
+        """Render the status line until the progress is closed."""
+        while not self.stopped.wait(1 / REFRESH_RATE):
+            width = shutil.get_terminal_size().columns - 1
+            self.status_line.update(self.render(width))
+
+    def __enter__(self):
+        """Start displaying the progress."""
+        if self.status_line is not None:
+            self.thread = threading.Thread(target=self._refresh, daemon=True)
+            self.thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        """Stop displaying the progress and remove the status line."""
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+            self.status_line.clear()
+
+
+class NullProgress:
+    """Progress which is not displayed."""
+
+    def start(self, machine: str):
+        """Do nothing."""
+
+    def finish(self, machine: str, success: bool):
+        """Do nothing."""
+
+    def __enter__(self):
+        """Return the progress."""
+        return self
+
+    def __exit__(self, *args):
+        """Do nothing."""
+
+
+def create(total: int, no_color: bool):
+    """Create the progress display of the command on `total` machines.
+
+    :return Progress or NullProgress if the progress cannot be displayed.
+    """
+    status_line = logs.get_status_line() if is_supported(no_color) else None
+
+    if status_line is None:
+        return NullProgress()
+
+    return Progress(total, status_line)
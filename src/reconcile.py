@@ -0,0 +1,114 @@
+"""This module reads the desired state of machines from a state file.
+
+The state file is a YAML mapping of queries selecting machines, see the query
+syntax of the `--include` option, to the desired state of the machines:
+
+    compute-*:
+      power: on
+      bootdev: pxe
+    compute-*,tags=gpu:
+      bootdev: disk
+      persistent: true
+    storage-1.example.com:
+      power: off
+
+The desired `power` state is `on` or `off`. The desired `bootdev` is `bios`,
+`disk` or `pxe`, optionally with `persistent` and `efiboot` flags as for the
+`bootdev` command. Entries are applied in order, i.e. keys of an entry
+override keys of the earlier entries matching the same machine.
+"""
+
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import yaml
+
+POWER_STATES = ("on", "off")
+BOOT_DEVICES = ("bios", "disk", "pxe")
+BOOT_OPTIONS = ("persistent", "efiboot")
+KEYS = ("power", "bootdev") + BOOT_OPTIONS
+
+
+class StateError(Exception):
+    """Raised when the state file cannot be read or is invalid."""
+
+
+def _parse_power(query: str, value) -> str:
+    """Parse the desired power state.
+
+    YAML reads unquoted `on` and `off` as booleans, which are accepted too.
+    """
+    if isinstance(value, bool):
+        return POWER_STATES[0] if value else POWER_STATES[1]
+
+    if str(value).lower() in POWER_STATES:
+        return str(value).lower()
+
+    raise StateError(f"Invalid power state '{value}' of '{query}'")
+
+
+def parse_state(query: str, state) -> dict:
+    """Validate the desired state of the machines selected by the query.
+
+    :return Dictionary of the desired state.
+    :raise StateError: if the state is invalid.
+    """
+    if not isinstance(state, dict) or not state:
+        raise StateError(f"Desired state of '{query}' must be a mapping")
+
+    unknown = sorted(str(key) for key in state if key not in KEYS)
+    if unknown:
+        raise StateError(f"Unknown key(s) in the state of '{query}': {unknown}")
+
+    parsed = dict(state)
+
+    if "power" in parsed:
+        parsed["power"] = _parse_power(query, parsed["power"])
+
+    if "bootdev" in parsed and parsed["bootdev"] not in BOOT_DEVICES:
+        raise StateError(f"Invalid boot device '{parsed['bootdev']}' of '{query}'")
+
+    for option in BOOT_OPTIONS:
+        if option in parsed and not isinstance(parsed[option], bool):
+            raise StateError(f"'{option}' of '{query}' must be true or false")
+
+    return parsed
+
+
+def load(path: str) -> List[Tuple[str, dict]]:
+    """Read the state file.
+
+    :return List of (query, desired state) tuples in the order of the file.
+    :raise StateError: if the file cannot be read or is invalid.
+    """
+    try:
+        with open(path) as file:
+            data = yaml.safe_load(file)
+
+    except (OSError, yaml.YAMLError) as e:
+        raise StateError(f"Cannot read state file '{path}': {e}")
+
+    if not isinstance(data, dict) or not data:
+        raise StateError(
+            f"State file '{path}' must map machine queries to their desired state"
+        )
+
+    return [
+        (str(query), parse_state(str(query), state)) for query, state in data.items()
+    ]
+
+
+def merge(
+    entries: Iterable[Tuple[str, dict]], select: Callable[[str], Iterable[str]]
+) -> Dict[str, dict]:
+    """Merge the desired states of the entries by machine.
+
+    :param select: Callable returning the names of machines the query selects.
+    :return Dictionary of machine names and their desired state.
+    """
+    desired = {}
+
+    for query, state in entries:
+        for machine in select(query):
+            desired.setdefault(machine, {}).update(state)
+
+    return desired
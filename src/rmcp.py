@@ -0,0 +1,82 @@
+"""This module checks reachability of BMCs with RMCP presence pings.
+
+An ASF presence ping is a single UDP packet sent to the RMCP port of the BMC,
+which a reachable BMC answers with a presence pong. Pings of all BMCs are
+multiplexed over the shared UDP transport, see `udp`, so that checking
+thousands of BMCs takes about the timeout, instead of `ipmitool` waiting out
+its retries on each unreachable BMC.
+"""
+
+import struct
+import time
+from typing import Dict, Iterable
+
+import udp
+
+RMCP_PORT = 623
+
+# Time (in seconds) to wait for pongs after sending a batch of pings
+DEFAULT_TIMEOUT = 1.0
+
+# How many times pings are sent again to BMCs which have not answered
+RETRIES = 1
+
+# RMCP header: version 1.0, reserved, sequence number 255 (no RMCP ACK),
+# class of message ASF
+RMCP_HEADER = b"\x06\x00\xff\x06"
+
+# IANA enterprise number of ASF
+ASF_IANA = 4542
+
+ASF_PRESENCE_PING = 0x80
+ASF_PRESENCE_PONG = 0x40
+
+
+def build_ping(tag: int = 0) -> bytes:
+    """Build the presence ping packet with the message tag."""
+    return RMCP_HEADER + struct.pack(">IBBBB", ASF_IANA, ASF_PRESENCE_PING, tag, 0, 0)
+
+
+def is_pong(packet: bytes) -> bool:
+    """Check if the packet is a presence pong."""
+    if len(packet) < 12 or packet[:4] != RMCP_HEADER:
+        return False
+
+    iana, message_type = struct.unpack(">IB", packet[4:9])
+    return iana == ASF_IANA and message_type == ASF_PRESENCE_PONG
+
+
+def _session(packet: bytes):
+    """Return the message tag of the pong, which echoes the tag of the ping.
+
+    :return The message tag or None if the packet is not a pong.
+    """
+    return packet[9] if is_pong(packet) else None
+
+
+def ping(
+    addresses: Iterable[str],
+    timeout: float = DEFAULT_TIMEOUT,
+    retries: int = RETRIES,
+    port: int = RMCP_PORT,
+    clock=time.monotonic,
+) -> Dict[str, float]:
+    """Ping the BMCs.
+
+    :return Dictionary of addresses of BMCs which answered and the round-trip
+            times in seconds.
+    """
+    targets = udp.resolve(addresses, port)
+    requests = {
+        (ip, 0): (family, sockaddr, build_ping(0))
+        for ip, (family, sockaddr, _) in targets.items()
+    }
+
+    with udp.Transport(clock=clock) as transport:
+        replies = transport.exchange(requests, _session, timeout, retries)
+
+    return {
+        address: rtt
+        for (ip, _), (_, rtt) in replies.items()
+        for address in targets[ip][2]
+    }
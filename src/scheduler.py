@@ -0,0 +1,349 @@
+"""This module implements the scheduler of commands of concurrent callers.
+
+Long-running services, e.g. daemons or exporters, execute commands for many
+callers at the same time. The scheduler runs the commands on a shared pool of
+threads, so that the number of commands running at once never exceeds the
+budget, and decides which command runs next:
+
+- Requests of a higher priority class go first: interactive operator actions,
+  then mutating commands, then background polling.
+- Requests of the same class take turns a machine at a time, so that a request
+  for thousands of machines does not hold back a request for a few.
+- Commands which have not started before the deadline of their request fail
+  without running.
+- A background request supersedes the queued commands of older background
+  requests for the same command and machine, which fail without running.
+
+Callers asking the same question at the same time, e.g. the power status of
+overlapping sets of machines, share a single in-flight query of the BMC and
+its result, see `SingleFlight`.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterator, List, Tuple
+
+# Priority classes in the order of precedence
+INTERACTIVE = 0
+MUTATING = 1
+BACKGROUND = 2
+PRIORITIES = (INTERACTIVE, MUTATING, BACKGROUND)
+
+DEADLINE_EXCEEDED = "Deadline exceeded before the command started"
+SUPERSEDED = "Superseded by a newer request"
+
+
+class Task:
+    """Command of the request on a single machine."""
+
+    __slots__ = ("request", "machine", "key", "done")
+
+    def __init__(self, request, machine: str, key: tuple):
+        """Set up the task."""
+        self.request = request
+        self.machine = machine
+        self.key = key
+        # Whether the task has been started or will never be
+        self.done = False
+
+
+class Request:
+    """Command submitted by a caller for execution on many machines.
+
+    Iterating over the request yields (machine, success, output) tuples as
+    the command completes on the machines.
+    """
+
+    def __init__(self, scheduler, execute: Callable, priority: int, deadline=None):
+        """Set up the request.
+
+        :param deadline: Time, as returned by the scheduler's clock, after
+                         which the command is not started on any machine.
+        """
+        self.scheduler = scheduler
+        self.execute = execute
+        self.priority = priority
+        self.deadline = deadline
+        self.tasks = deque()
+        self.total = 0
+        self.results = queue.Queue()
+
+    def next_task(self):
+        """Remove the next pending task from the request.
+
+        :return Task or None if no task is pending.
+        """
+        while self.tasks:
+            task = self.tasks.popleft()
+            if not task.done:
+                task.done = True
+                return task
+
+        return None
+
+    def report(self, machine: str, success: bool, output: str):
+        """Report the result of the command on the machine."""
+        self.results.put((machine, success, output))
+
+    def _wait_timeout(self, expired: bool):
+        if self.deadline is None or expired:
+            return None
+
+        return max(0.0, self.deadline - self.scheduler.clock())
+
+    def __iter__(self) -> Iterator[Tuple[str, bool, str]]:
+        """Yield the results as the command completes on the machines.
+
+        Commands pending when the deadline passes are failed at once,
+        the results of commands already running are awaited.
+        """
+        expired = False
+
+        for _ in range(self.total):
+            while True:
+                try:
+                    yield self.results.get(timeout=self._wait_timeout(expired))
+                    break
+                except queue.Empty:
+                    self.scheduler.expire(self)
+                    expired = True
+
+    def cancel(self):
+        """Drop the commands which have not started yet."""
+        self.scheduler.cancel(self)
+
+
+class Scheduler:
+    """Scheduler running commands of concurrent callers on a pool of threads.
+
+    Threads are started on the first request and wait for further requests
+    for the lifetime of the process.
+    """
+
+    def __init__(self, workers: int, clock=time.monotonic):
+        """Set up the scheduler running at most `workers` commands at once."""
+        self.workers = workers
+        self.clock = clock
+        self.condition = threading.Condition()
+        # Requests with pending tasks, by priority class
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        # Pending tasks of background requests by (command, options, machine)
+        self.background = {}
+        self.threads = []
+
+    def submit(
+        self,
+        command: str,
+        machines: List[str],
+        execute: Callable,
+        priority: int = BACKGROUND,
+        deadline: float = None,
+        options: dict = None,
+    ) -> Request:
+        """Submit the command for execution on the machines.
+
+        :param command: Name of the command, background requests of the same
+                        command and options supersede each other.
+        :param execute: Callable executing the command on a machine, returning
+                        a tuple of command result code and command output.
+        :param deadline: Number of seconds after which the command is not
+                         started on any machine or None for no deadline.
+        :param options: Options of the command, e.g. `persistent`.
+        :return Request yielding the results.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority {priority}")
+
+        if deadline is not None:
+            deadline += self.clock()
+
+        request = Request(self, execute, priority, deadline)
+        options = tuple(sorted((options or {}).items()))
+
+        with self.condition:
+            for machine in machines:
+                task = Task(request, machine, (command, options, machine))
+                request.tasks.append(task)
+                if priority == BACKGROUND:
+                    self._supersede(task)
+
+            request.total = len(request.tasks)
+            if request.tasks:
+                self.queues[priority].append(request)
+
+            self._start_threads()
+            self.condition.notify_all()
+
+        return request
+
+    def _supersede(self, task: Task):
+        """Replace the pending background task of the same command and machine.
+
+        Tasks of the same command with other options are kept.
+        """
+        previous = self.background.get(task.key)
+
+        if previous is not None and not previous.done:
+            previous.done = True
+            previous.request.report(previous.machine, False, SUPERSEDED)
+
+        self.background[task.key] = task
+
+    def _start_threads(self):
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _next_task(self):
+        """Pick the next task, taking turns between requests of a class.
+
+        :return Task or None if no task is pending.
+        """
+        for priority in PRIORITIES:
+            requests = self.queues[priority]
+
+            while requests:
+                request = requests.popleft()
+                task = request.next_task()
+
+                if request.tasks:
+                    requests.append(request)
+
+                if task is not None:
+                    if self.background.get(task.key) is task:
+                        del self.background[task.key]
+                    return task
+
+        return None
+
+    def _work(self):
+        """Run the pending tasks."""
+        while True:
+            with self.condition:
+                task = self._next_task()
+                while task is None:
+                    self.condition.wait()
+                    task = self._next_task()
+
+            self._run(task)
+
+    def _run(self, task: Task):
+        """Run the task unless its deadline has passed and report the result."""
+        request = task.request
+
+        if request.deadline is not None and self.clock() > request.deadline:
+            request.report(task.machine, False, DEADLINE_EXCEEDED)
+            return
+
+        try:
+            success, output = request.execute(task.machine)
+        except Exception as e:
+            success, output = False, f"Failed to execute command: {e}"
+
+        request.report(task.machine, success, output)
+
+    def _drop_pending(self, request: Request) -> list:
+        """Mark the pending tasks of the request done.
+
+        :return List of the dropped tasks.
+        """
+        dropped = []
+
+        with self.condition:
+            for task in request.tasks:
+                if not task.done:
+                    task.done = True
+                    dropped.append(task)
+                    if self.background.get(task.key) is task:
+                        del self.background[task.key]
+
+        return dropped
+
+    def expire(self, request: Request):
+        """Fail the pending tasks of the request whose deadline has passed."""
+        for task in self._drop_pending(request):
+            request.report(task.machine, False, DEADLINE_EXCEEDED)
+
+    def cancel(self, request: Request):
+        """Drop the pending tasks of the request without reporting them."""
+        self._drop_pending(request)
+
+
+class _Call:
+    """Call in flight, whose result is shared by the callers."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalescing of concurrent calls of the same key into a single call.
+
+    Calls are coalesced within a scope, e.g. a BMC. Barriers, e.g. commands
+    changing the state of the machine, start a new generation of the scope
+    when they start and when they complete, so that calls made after a
+    barrier started never share the result of a call made before it.
+    """
+
+    def __init__(self):
+        """Set up the coalescing with no calls in flight."""
+        self.lock = threading.Lock()
+        # Calls in flight by (scope, generation, key)
+        self.calls = {}
+        self.generations = {}
+
+    def do(self, scope, key, function: Callable):
+        """Call the function unless a call of the key is in flight in the scope.
+
+        :return The result of the function or of the call in flight.
+        :raise Exception: raised by the function.
+        """
+        with self.lock:
+            flight = (scope, self.generations.get(scope, 0), key)
+            call = self.calls.get(flight)
+            leader = call is None
+            if leader:
+                call = self.calls[flight] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+
+        except BaseException as e:
+            call.error = e
+            raise
+
+        finally:
+            with self.lock:
+                del self.calls[flight]
+            call.done.set()
+
+    def _next_generation(self, scope):
+        with self.lock:
+            self.generations[scope] = self.generations.get(scope, 0) + 1
+
+    def barrier(self, scope, function: Callable):
+        """Call the function as a barrier of the scope.
+
+        :return The result of the function.
+        """
+        self._next_generation(scope)
+
+        try:
+            return function()
+
+        finally:
+            self._next_generation(scope)
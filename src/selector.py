@@ -0,0 +1,223 @@
+"""This module implements the query language selecting machines.
+
+A query is a comma-separated list of terms, all of which must match,
+e.g. `compute-*,zone=AZ1,!tags=gpu`:
+
+- `PATTERN` or `name=PATTERN` matches the machine name against a hostlist
+  expression, i.e. a glob pattern whose brackets may hold numeric ranges,
+  e.g. `compute-[1-64]` or `rack[01-20]-node[1-40,45]`.
+- `KEY=VALUE` matches machines whose attribute is equal to the value or,
+  for list attributes such as `tags`, contains the value.
+- `KEY!=VALUE` and `!TERM` negate the term.
+
+A query is compiled into a `Plan` once and compiled plans are cached by the
+query string. The plan evaluates the most selective terms first, using the
+inventory indexes, and filters the candidates with the remaining terms.
+"""
+
+import functools
+from typing import List, Set
+
+import hostlist
+
+import inventory
+
+# Maximum number of compiled plans kept in the cache
+PLAN_CACHE_SIZE = 1024
+
+
+class QueryError(Exception):
+    """Raised when the query cannot be parsed."""
+
+
+class Step:
+    """Step of the plan evaluating a single term of the query."""
+
+    # Kinds of steps in the order of evaluation
+    NAME_LOOKUP = 0
+    ATTRIBUTE_LOOKUP = 1
+    NAME_SCAN = 2
+    EXCLUDE_ATTRIBUTE = 3
+    NAME_FILTER = 4
+
+    def __init__(self, key: str, value: str, negated: bool):
+        """Set up the step evaluating the term."""
+        self.key = key
+        self.value = value
+        self.negated = negated
+        self.pattern = hostlist.NamePattern(value) if key == "name" else None
+
+        if self.pattern is None:
+            self.kind = self.EXCLUDE_ATTRIBUTE if negated else self.ATTRIBUTE_LOOKUP
+        elif negated:
+            self.kind = self.NAME_FILTER
+        else:
+            self.kind = self.NAME_LOOKUP if self.pattern.expandable else self.NAME_SCAN
+
+    def sort_key(self) -> tuple:
+        """Order steps so that the most selective ones are evaluated first."""
+        prefix_length = len(self.pattern.prefix) if self.pattern else 0
+        return (self.kind, -prefix_length)
+
+    def describe(self, first=True) -> str:
+        """Describe the step.
+
+        :param first: Whether the step is the first step of the plan.
+        """
+        operator = "!=" if self.negated else "="
+
+        if self.kind == self.ATTRIBUTE_LOOKUP:
+            return f"index lookup {self.key}{operator}{self.value}"
+
+        if self.kind == self.EXCLUDE_ATTRIBUTE:
+            return f"index exclude {self.key}{operator}{self.value}"
+
+        if self.kind == self.NAME_LOOKUP and first:
+            return f"name lookup {operator}{self.value}"
+
+        if self.kind == self.NAME_SCAN and first:
+            return f"name scan prefix '{self.pattern.prefix}' {operator}{self.value}"
+
+        return f"name filter {operator}{self.value}"
+
+    def execute(self, machines: inventory.Inventory, candidates) -> tuple:
+        """Evaluate the term.
+
+        :param candidates: Set of names matching previous steps or None if
+                           this is the first step.
+        :return Tuple of the set of matching names and the number of names
+                examined.
+        """
+        if self.pattern is None:
+            names = machines.names_with_attribute(self.key, self.value)
+            if candidates is None:
+                return set(names), len(names)
+            if self.negated:
+                return candidates - names, len(names)
+            return candidates & names, len(names)
+
+        if candidates is None and self.pattern.expandable:
+            return self._lookup(machines)
+
+        if candidates is None:
+            candidates = machines.names_with_prefix(self.pattern.prefix)
+
+        return (
+            {name for name in candidates if self.pattern.match(name) != self.negated},
+            len(candidates),
+        )
+
+    def _lookup(self, machines: inventory.Inventory) -> tuple:
+        """Look up the names the expandable pattern expands to.
+
+        If the pattern expands to more names than there are machines,
+        the machines are scanned instead.
+        """
+        size = self.pattern.size()
+
+        if size > len(machines):
+            candidates = machines.names_with_prefix(self.pattern.prefix)
+            names = {name for name in candidates if self.pattern.match(name)}
+            return names, len(candidates)
+
+        return {name for name in self.pattern.expand() if name in machines}, size
+
+
+class Plan:
+    """Compiled query."""
+
+    def __init__(self, query: str, steps: List[Step]):
+        """Set up the plan of the query."""
+        self.query = query
+        self.steps = sorted(steps, key=Step.sort_key)
+
+    def run(self, machines: inventory.Inventory) -> tuple:
+        """Select machines matching the query.
+
+        :return Tuple of the set of matching names and the list of
+                (step description, number of names examined) tuples.
+        """
+        candidates = None
+        costs = []
+
+        # A query without positive terms starts from all machines
+        if not self.steps or self.steps[0].negated:
+            candidates = set(machines.names_with_prefix(""))
+            costs.append(("full scan", len(candidates)))
+
+        for step in self.steps:
+            first = candidates is None
+            candidates, cost = step.execute(machines, candidates)
+            costs.append((step.describe(first), cost))
+
+        return candidates, costs
+
+    def execute(self, machines: inventory.Inventory) -> Set[str]:
+        """Return the set of names of machines matching the query."""
+        return self.run(machines)[0]
+
+
+def _split_terms(query: str) -> List[str]:
+    """Split the query at commas which are not enclosed in brackets."""
+    terms = []
+    depth = 0
+    start = 0
+
+    for index, char in enumerate(query):
+        if char == "[":
+            depth += 1
+        elif char == "]" and depth:
+            depth -= 1
+        elif char == "," and not depth:
+            terms.append(query[start:index])
+            start = index + 1
+
+    terms.append(query[start:])
+    return [term.strip() for term in terms]
+
+
+def parse_term(term: str) -> Step:
+    """Parse a single term of the query."""
+    negated = term.startswith("!")
+    if negated:
+        term = term[1:].strip()
+
+    key, operator, value = term.partition("=")
+
+    if not operator:
+        key, value = "name", term
+    elif key.endswith("!"):
+        key = key[:-1]
+        negated = not negated
+
+    key, value = key.strip(), value.strip()
+
+    if not key or not value:
+        raise QueryError(f"Invalid query term '{term}'")
+
+    try:
+        return Step(key, value, negated)
+    except hostlist.HostlistError as e:
+        raise QueryError(f"Invalid query term '{term}': {e}")
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_query(query: str) -> Plan:
+    """Compile the query into a plan.
+
+    :raise QueryError: if the query cannot be parsed.
+    """
+    terms = _split_terms(query)
+
+    if not all(terms):
+        raise QueryError(f"Invalid query '{query}'")
+
+    return Plan(query, [parse_term(term) for term in terms])
+
+
+def match_name(machines: inventory.Inventory, pattern: str) -> Set[str]:
+    """Return names of machines matching the name pattern.
+
+    :raise hostlist.HostlistError: if the pattern is invalid.
+    """
+    return Plan(pattern, [Step("name", pattern, False)]).execute(machines)
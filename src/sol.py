@@ -0,0 +1,522 @@
+"""This module multiplexes Serial-over-LAN consoles of multiple machines.
+
+Each SOL session is an `ipmitool sol activate` process. The output of all
+sessions is read from a single selector loop, prefixed with the machine name
+line by line and written to the output with non-blocking, buffered writes.
+The raw output of each session can also be written to a per-machine log file.
+
+`SolCapture` captures the output of the sessions headlessly to rotating,
+compressed files and stops each session when its output matches a pattern
+or the session times out.
+"""
+
+import gzip
+import os
+import re
+import resource
+import selectors
+import signal
+import stat
+import subprocess
+import time
+
+# Size of the buffer the output of a session is read into
+READ_SIZE = 64 * 1024
+
+# Stop reading from the sessions if more output than this is waiting to be
+# written, resume when half of it is written
+MAX_PENDING_OUTPUT = 1024 * 1024
+
+# Escape sequence closing the SOL session, see `-e &` in utils.Ipmitool
+ESCAPE_SEQUENCE = b"\r&."
+
+# Time (in seconds) the sessions are given to close before being killed
+SHUTDOWN_TIMEOUT = 2.0
+
+# Size of the tail of the output kept for matching the trigger pattern.
+# A match spanning more bytes than this may not be found.
+MATCH_WINDOW_SIZE = 4096
+
+# Defaults of the rotation of captured output files
+DEFAULT_ROTATE_SIZE = 16 * 1024 * 1024
+DEFAULT_ROTATE_COUNT = 5
+
+# Results of a capture
+CAPTURE_MATCHED = "matched"
+CAPTURE_TIMEOUT = "timeout"
+CAPTURE_CLOSED = "closed"
+CAPTURE_INTERRUPTED = "interrupted"
+
+
+class SolSession:
+    """A single SOL session."""
+
+    __slots__ = ("name", "process", "prefix", "log", "at_line_start")
+
+    def __init__(self, name: str, process: subprocess.Popen, log=None):
+        """Set up the session of the running process."""
+        self.name = name
+        self.process = process
+        self.prefix = f"{name}: ".encode("utf-8")
+        self.log = log
+        self.at_line_start = True
+
+
+class SolMultiplexer:
+    """Multiplexer of SOL sessions."""
+
+    # Maximum time (in seconds) between runs of periodic tasks
+    TICK_INTERVAL = 1.0
+
+    def __init__(self, output_fd: int, log_dir: str = None):
+        """Set up the multiplexer writing to the output file descriptor.
+
+        :param log_dir: Directory the raw output of each session is written
+        to, as `<machine name>.log`.
+        """
+        self.output_fd = output_fd
+        self.log_dir = log_dir
+        self.sessions = {}
+        self.returncodes = {}
+        self.selector = selectors.DefaultSelector()
+        self.buffer = bytearray(READ_SIZE)
+        self.view = memoryview(self.buffer)
+        self.pending = bytearray()
+        self.paused = False
+
+        # Session whose unterminated line was written last
+        self.partial_session = None
+
+        # Regular files cannot be polled, write to them directly
+        self.output_pollable = output_fd is not None and not stat.S_ISREG(
+            os.fstat(output_fd).st_mode
+        )
+        self.output_blocking = None
+
+        if self.output_pollable:
+            self.output_blocking = os.get_blocking(output_fd)
+            os.set_blocking(output_fd, False)
+
+    def _create_session(self, name: str, process: subprocess.Popen) -> SolSession:
+        """Create the session of the started process."""
+        log = None
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            log = open(os.path.join(self.log_dir, f"{name}.log"), "ab")
+
+        return SolSession(name, process, log)
+
+    def add(self, name: str, command: list, env: dict = None):
+        """Start the SOL session process and add it to the multiplexer.
+
+        :param env: Environment of the process, e.g. passing the BMC password.
+        """
+        # Keep stdin open, `ipmitool sol activate` exits on end of input
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            start_new_session=True,
+            env=env,
+        )
+        os.set_blocking(process.stdout.fileno(), False)
+
+        session = self._create_session(name, process)
+        self.sessions[process.stdout.fileno()] = session
+        self.selector.register(process.stdout, selectors.EVENT_READ, session)
+
+    def _write(self, data):
+        """Queue the data for writing to the output."""
+        self.pending += data
+
+    def _break_partial_line(self, session: SolSession):
+        """End the unterminated line of another session before writing."""
+        partial_session = self.partial_session
+
+        if partial_session is not None and partial_session is not session:
+            self._write(b"\n")
+            partial_session.at_line_start = True
+            self.partial_session = None
+
+    def _flush(self):
+        """Write as much pending output as possible without blocking."""
+        while self.pending:
+            try:
+                written = os.write(self.output_fd, self.pending)
+            except BlockingIOError:
+                break
+            del self.pending[:written]
+
+    def _pause_sessions(self, pause: bool):
+        """Stop or resume reading from the sessions."""
+        self.paused = pause
+        for session in self.sessions.values():
+            if pause:
+                self.selector.unregister(session.process.stdout)
+            else:
+                self.selector.register(
+                    session.process.stdout, selectors.EVENT_READ, session
+                )
+
+    def _update_output_registration(self):
+        """Poll the output for writability only if output is pending."""
+        registered = self.output_fd in self.selector.get_map()
+
+        if self.pending and not registered:
+            self.selector.register(self.output_fd, selectors.EVENT_WRITE, None)
+        elif not self.pending and registered:
+            self.selector.unregister(self.output_fd)
+
+        if not self.paused and len(self.pending) > MAX_PENDING_OUTPUT:
+            self._pause_sessions(True)
+        elif self.paused and len(self.pending) <= MAX_PENDING_OUTPUT // 2:
+            self._pause_sessions(False)
+
+    def _read(self, session: SolSession):
+        """Read the available output of the session."""
+        size = session.process.stdout.readinto(self.view)
+
+        # Nothing to read yet
+        if size is None:
+            return
+
+        if size == 0:
+            self._close_session(session)
+            return
+
+        self._on_output(session, self.view[:size])
+
+    def _on_output(self, session: SolSession, chunk: memoryview):
+        """Write the chunk of the session output to the log and the output."""
+        size = len(chunk)
+
+        if session.log:
+            session.log.write(chunk)
+
+        # Prefix each line with the machine name
+        self._break_partial_line(session)
+        start = 0
+        while start < size:
+            if session.at_line_start:
+                self._write(session.prefix)
+
+            end = self.buffer.find(b"\n", start, size)
+            if end == -1:
+                self._write(chunk[start:])
+                session.at_line_start = False
+                break
+
+            end += 1
+            self._write(chunk[start:end])
+            session.at_line_start = True
+            start = end
+
+        self.partial_session = None if session.at_line_start else session
+
+    def _close_session(self, session: SolSession):
+        """Remove the session whose output has ended."""
+        if not self.paused:
+            self.selector.unregister(session.process.stdout)
+        del self.sessions[session.process.stdout.fileno()]
+
+        self._break_partial_line(session)
+        if not session.at_line_start:
+            self._write(b"\n")
+            session.at_line_start = True
+            self.partial_session = None
+
+        returncode = session.process.wait()
+        self.returncodes[session.name] = returncode
+        self._on_close(session, returncode)
+
+        session.process.stdin.close()
+        session.process.stdout.close()
+        if session.log:
+            session.log.close()
+
+    def _on_close(self, session: SolSession, returncode: int):
+        """Report the closed session."""
+        self._write(
+            session.prefix + f"SOL session closed ({returncode})\n".encode("utf-8")
+        )
+
+    def _on_tick(self):
+        """Run periodic tasks of the loop."""
+
+    def run(self) -> dict:
+        """Multiplex the sessions until all of them end.
+
+        :return Dictionary of machine names and exit codes of the sessions.
+        """
+        try:
+            while self.sessions or self.pending:
+                if self.output_pollable:
+                    self._update_output_registration()
+                else:
+                    self._flush_blocking()
+                    if not self.sessions:
+                        break
+
+                for key, _ in self.selector.select(timeout=self.TICK_INTERVAL):
+                    if key.data is None:
+                        self._flush()
+                    else:
+                        self._read(key.data)
+
+                self._on_tick()
+
+        finally:
+            self.close()
+
+        return self.returncodes
+
+    def _flush_blocking(self):
+        """Write all pending output to the output which cannot be polled."""
+        if self.output_fd is None:
+            self.pending.clear()
+
+        while self.pending:
+            written = os.write(self.output_fd, self.pending)
+            del self.pending[:written]
+
+    def _stop_session(self, session: SolSession, deadline: float):
+        """Wait for the session to close until the deadline, then kill it."""
+        try:
+            session.process.wait(max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(session.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            session.process.wait()
+
+        self.returncodes[session.name] = session.process.returncode
+        if session.log:
+            session.log.close()
+
+    def close(self):
+        """Close all sessions and restore the output."""
+        sessions = list(self.sessions.values())
+
+        # Ask the sessions to close gracefully, so that SOL payload is
+        # deactivated on the BMCs
+        for session in sessions:
+            try:
+                session.process.stdin.write(ESCAPE_SEQUENCE)
+                session.process.stdin.flush()
+            except OSError:
+                pass
+
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for session in sessions:
+            self._stop_session(session, deadline)
+
+        self.sessions.clear()
+        self.selector.close()
+
+        if self.output_blocking is not None:
+            try:
+                os.set_blocking(self.output_fd, True)
+                self._flush_blocking()
+            finally:
+                os.set_blocking(self.output_fd, self.output_blocking)
+                self.output_blocking = None
+
+
+class RotatingCompressedLog:
+    """Gzip-compressed log file rotated by the size of the uncompressed data.
+
+    The current file is `<path>.gz`, older files are `<path>.1.gz`,
+    `<path>.2.gz` etc. At most `count` older files are kept. The file of
+    a previous capture is rotated when the log is opened.
+    """
+
+    def __init__(self, path: str, size=DEFAULT_ROTATE_SIZE, count=DEFAULT_ROTATE_COUNT):
+        """Open the log file, rotating the file of a previous capture."""
+        self.path = path
+        self.size = size
+        self.count = count
+        self.written = 0
+        self._shift_files()
+        self.file = gzip.open(self._file_path(0), "wb")
+
+    def _file_path(self, index: int) -> str:
+        if index == 0:
+            return f"{self.path}.gz"
+
+        return f"{self.path}.{index}.gz"
+
+    def _shift_files(self):
+        """Rename each existing file to the next older one."""
+        for index in range(self.count, 0, -1):
+            source = self._file_path(index - 1)
+            if os.path.exists(source):
+                os.replace(source, self._file_path(index))
+
+    def _rotate(self):
+        self.file.close()
+        self._shift_files()
+        self.file = gzip.open(self._file_path(0), "wb")
+        self.written = 0
+
+    def write(self, data):
+        """Write the data, rotating the file when it grows over the size."""
+        if self.written >= self.size:
+            self._rotate()
+
+        self.file.write(data)
+        self.written += len(data)
+
+    def close(self):
+        """Close the log file."""
+        self.file.close()
+
+
+class RingBuffer:
+    """Buffer keeping only the last `size` bytes written to it."""
+
+    def __init__(self, size: int = MATCH_WINDOW_SIZE):
+        """Create an empty buffer."""
+        self.size = size
+        self.data = bytearray()
+
+    def append(self, data):
+        """Append the data, dropping the oldest bytes over the size."""
+        self.data += data
+        if len(self.data) > self.size:
+            del self.data[: len(self.data) - self.size]
+
+
+class CaptureSession(SolSession):
+    """SOL session captured to a file."""
+
+    __slots__ = ("window", "deadline", "stop_deadline", "result", "detail")
+
+    def __init__(self, name, process, log, timeout: float):
+        """Set up the captured session."""
+        super().__init__(name, process, log)
+        self.window = RingBuffer()
+        self.deadline = time.monotonic() + timeout
+        self.stop_deadline = None
+        self.result = None
+        self.detail = None
+
+
+class SolCapture(SolMultiplexer):
+    """Headless capture of SOL sessions to rotating compressed files.
+
+    Each session is stopped when its output matches the trigger pattern or
+    when it times out. The pattern is matched incrementally on the tail of
+    the output, so the captured output is never kept in memory.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        until: str = None,
+        timeout: float = 600,
+        rotate_size: int = DEFAULT_ROTATE_SIZE,
+        rotate_count: int = DEFAULT_ROTATE_COUNT,
+    ):
+        """Set up the capture writing the output files to the directory."""
+        super().__init__(None)
+        self.output_dir = output_dir
+        self.until = re.compile(until.encode("utf-8")) if until else None
+        self.timeout = timeout
+        self.rotate_size = rotate_size
+        self.rotate_count = rotate_count
+        self.results = {}
+
+        os.makedirs(output_dir, exist_ok=True)
+        raise_open_files_limit()
+
+    def _create_session(self, name: str, process: subprocess.Popen) -> SolSession:
+        log = RotatingCompressedLog(
+            os.path.join(self.output_dir, f"{name}.log"),
+            self.rotate_size,
+            self.rotate_count,
+        )
+        return CaptureSession(name, process, log, self.timeout)
+
+    def _on_output(self, session: CaptureSession, chunk: memoryview):
+        session.log.write(chunk)
+
+        if self.until is None or session.result is not None:
+            return
+
+        session.window.append(chunk)
+        match = self.until.search(session.window.data)
+
+        if match:
+            self._stop(
+                session, CAPTURE_MATCHED, match.group(0).decode("utf-8", "replace")
+            )
+
+    def _stop(self, session: CaptureSession, result: str, detail: str = None):
+        """Ask the session to close, recording the result of the capture."""
+        session.result = result
+        session.detail = detail
+        session.stop_deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+
+        try:
+            session.process.stdin.write(ESCAPE_SEQUENCE)
+            session.process.stdin.flush()
+        except OSError:
+            pass
+
+    def _on_tick(self):
+        now = time.monotonic()
+
+        for session in list(self.sessions.values()):
+            if session.result is None and now >= session.deadline:
+                self._stop(session, CAPTURE_TIMEOUT, self.timeout)
+
+            elif session.stop_deadline is not None and now >= session.stop_deadline:
+                try:
+                    os.killpg(session.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _on_close(self, session: CaptureSession, returncode: int):
+        result = session.result if session.result else CAPTURE_CLOSED
+        detail = session.detail if session.result else returncode
+        self.results[session.name] = (result, detail)
+
+    def run(self) -> dict:
+        """Capture the sessions until all of them stop.
+
+        :return Dictionary of machine names and (result, detail) tuples.
+                The result is CAPTURE_MATCHED with the matched text,
+                CAPTURE_TIMEOUT, CAPTURE_INTERRUPTED or CAPTURE_CLOSED with
+                the exit code of the session.
+        """
+        super().run()
+        return self.results
+
+    def close(self):
+        """Close all sessions, recording the result of interrupted ones."""
+        for session in self.sessions.values():
+            if session.name not in self.results:
+                self.results[session.name] = (
+                    session.result if session.result else CAPTURE_INTERRUPTED,
+                    session.detail,
+                )
+
+        super().close()
+
+
+def raise_open_files_limit():
+    """Raise the soft limit of open files to the hard limit.
+
+    Each session uses a few file descriptors, which for hundreds of sessions
+    may exceed the default soft limit.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
@@ -0,0 +1,118 @@
+"""This module implements summaries of command results.
+
+Instead of a line per machine, the summary groups machines by the result of
+the command, e.g.:
+
+    compute-[1-2950].example.com (2950): Chassis Power is on
+    compute-[2951-2990].example.com (40): Chassis Power is off
+    compute-[2991-3000].example.com (10): Error: Unable to establish session
+
+Each distinct output is stored once. Failed commands are grouped by the
+error message, without the command line. Once the number of distinct outputs
+reaches the limit, further outputs are counted as "other outputs", so that
+results which differ on every machine do not grow the summary without bound.
+"""
+
+import time
+from typing import List, Tuple
+
+import hostlist
+
+# Maximum number of distinct outputs kept in the summary
+MAX_GROUPS = 64
+
+# Minimum time (in seconds) between progress lines of a running command
+PROGRESS_INTERVAL = 5.0
+
+# Output of the group of machines whose outputs did not fit in the summary
+OTHER_OUTPUTS = "(other outputs)"
+
+# Output of the group of machines the command printed nothing on
+NO_OUTPUT = "(no output)"
+
+# First line of the output of a failed command, naming the machine's BMC
+FAILED_COMMAND_PREFIX = "Failed to run command: "
+
+
+def group_output(output: str) -> str:
+    """Return the output which results are grouped by.
+
+    The first line of the output of a failed command holds the command line,
+    which is different for each machine. Such results are grouped by the
+    rest of the output, i.e. the error message.
+    """
+    output = (output or "").strip()
+
+    if output.startswith(FAILED_COMMAND_PREFIX):
+        _, _, message = output.partition("\n")
+        output = message.strip() or FAILED_COMMAND_PREFIX.rstrip(": ")
+
+    return output or NO_OUTPUT
+
+
+class ResultSummary:
+    """Summary of command results grouped by the output."""
+
+    def __init__(self, max_groups: int = MAX_GROUPS):
+        """Set up an empty summary."""
+        self.max_groups = max_groups
+        self.groups = {}
+        self.succeeded = 0
+        self.failed = 0
+        self.last_progress = time.monotonic()
+
+    def add(self, machine: str, success: bool, output: str):
+        """Add the result of the command on the machine."""
+        success = bool(success)
+        output = group_output(output)
+
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+        key = (success, output)
+        if key not in self.groups and len(self.groups) >= self.max_groups:
+            key = (success, OTHER_OUTPUTS)
+
+        self.groups.setdefault(key, []).append(machine)
+
+    @property
+    def total(self) -> int:
+        """Return the number of results in the summary."""
+        return self.succeeded + self.failed
+
+    def counts(self) -> str:
+        """Describe the number of results."""
+        return (
+            f"{self.total} machine(s): {self.succeeded} succeeded, "
+            f"{self.failed} failed"
+        )
+
+    def progress_due(self) -> bool:
+        """Check if the progress should be reported, at most once an interval."""
+        now = time.monotonic()
+
+        if now - self.last_progress < PROGRESS_INTERVAL:
+            return False
+
+        self.last_progress = now
+        return True
+
+    def lines(self) -> List[Tuple[bool, str]]:
+        """Describe the groups of machines, largest successful groups first.
+
+        :return List of (success, line) tuples.
+        """
+        groups = sorted(
+            self.groups.items(),
+            key=lambda item: (not item[0][0], -len(item[1]), item[0][1]),
+        )
+
+        return [
+            (
+                success,
+                f"{hostlist.format_names(machines)} ({len(machines)}): {output}",
+            )
+            for (success, output), machines in groups
+        ]
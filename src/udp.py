@@ -0,0 +1,205 @@
+"""This module implements the shared UDP transport of datagram protocols of BMCs.
+
+Protocols spoken with BMCs over UDP, e.g. RMCP presence pings, exchange
+a request and a reply datagram with each BMC. Instead of a socket and a wait
+per BMC, the transport multiplexes the exchanges with all BMCs over a single
+non-blocking socket per address family:
+
+- Requests are sent back to back in batches. Between the batches, the replies
+  which have already arrived are collected without waiting, so that the
+  socket's receive buffer does not overflow while thousands of requests are
+  sent.
+- Each wake-up of the socket drains all the replies queued on it, so the
+  number of wake-ups grows with the duration of the exchange rather than
+  with the number of BMCs. Python does not expose `recvmmsg`/`sendmmsg`, the
+  batches are the nearest portable equivalent.
+- Replies are demultiplexed by their source address and the session the
+  protocol reads from the reply, e.g. the message tag or the session ID.
+"""
+
+import select
+import socket
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+# Size (in bytes) of the send and receive buffers of the sockets, large
+# enough for a burst of replies of thousands of BMCs
+BUFFER_SIZE = 4 * 1024 * 1024
+
+# Number of requests sent between two collections of replies
+BATCH_SIZE = 256
+
+MAX_PACKET_SIZE = 512
+
+
+def resolve(addresses: Iterable[str], port: int) -> dict:
+    """Resolve the BMC addresses.
+
+    :return Dictionary of IP addresses and (family, socket address, list of
+            BMC addresses) tuples. Addresses which cannot be resolved are
+            left out.
+    """
+    targets = {}
+
+    for address in set(addresses):
+        try:
+            family, _, _, _, sockaddr = socket.getaddrinfo(
+                address, port, type=socket.SOCK_DGRAM
+            )[0]
+        except (socket.gaierror, UnicodeError):
+            continue
+
+        targets.setdefault(sockaddr[0], (family, sockaddr, []))[2].append(address)
+
+    return targets
+
+
+class Transport:
+    """UDP transport shared by the exchanges with many BMCs.
+
+    Sockets are opened on first use, one per address family, and closed when
+    the transport is closed. The transport counts the datagrams sent and
+    received and the times it waited for the sockets in `stats`.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = BUFFER_SIZE,
+        batch_size: int = BATCH_SIZE,
+        clock=time.monotonic,
+    ):
+        """Set up the transport with no sockets open."""
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.clock = clock
+        self.sockets = {}
+        self.stats = {"sent": 0, "received": 0, "polls": 0}
+
+    def __enter__(self):
+        """Return the transport."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the sockets."""
+        self.close()
+
+    def close(self):
+        """Close the sockets."""
+        for sock in self.sockets.values():
+            sock.close()
+
+        self.sockets = {}
+
+    def socket(self, family: int) -> socket.socket:
+        """Return the socket of the address family, opening it if needed."""
+        if family not in self.sockets:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+
+            for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, option, self.buffer_size)
+                except OSError:
+                    # The system keeps its default size
+                    pass
+
+            self.sockets[family] = sock
+
+        return self.sockets[family]
+
+    def send(self, family: int, sockaddr, packet: bytes, timeout: float) -> bool:
+        """Send the packet, waiting until the socket buffer has room if needed.
+
+        :return True if the packet was sent, False otherwise.
+        """
+        sock = self.socket(family)
+
+        while True:
+            try:
+                sock.sendto(packet, sockaddr)
+                self.stats["sent"] += 1
+                return True
+            except BlockingIOError:
+                self.stats["polls"] += 1
+                if not select.select([], [sock], [], timeout)[1]:
+                    return False
+            except OSError:
+                # E.g. no route to the host
+                return False
+
+    def receive(self, timeout: float) -> List[Tuple[tuple, bytes]]:
+        """Wait for datagrams and drain all the datagrams queued on the sockets.
+
+        :return List of (source socket address, packet) tuples, empty if
+                nothing arrived before the timeout.
+        """
+        datagrams = []
+        self.stats["polls"] += 1
+
+        for sock in select.select(list(self.sockets.values()), [], [], timeout)[0]:
+            while True:
+                try:
+                    packet, sockaddr = sock.recvfrom(MAX_PACKET_SIZE)
+                except OSError:
+                    # No more packets or an ICMP error of an earlier request
+                    # reported by some systems
+                    break
+
+                datagrams.append((sockaddr, packet))
+
+        self.stats["received"] += len(datagrams)
+        return datagrams
+
+    def _collect(self, session: Callable, sent: dict, replies: dict, timeout: float):
+        """Collect replies until all requests are answered or the timeout expires."""
+        deadline = self.clock() + timeout
+
+        while len(replies) < len(sent):
+            for sockaddr, packet in self.receive(max(0.0, deadline - self.clock())):
+                key = (sockaddr[0], session(packet))
+                if key in sent and key not in replies:
+                    replies[key] = (packet, self.clock() - sent[key])
+
+            if self.clock() >= deadline:
+                break
+
+    def exchange(
+        self,
+        requests: Dict[Tuple[str, Hashable], tuple],
+        session: Callable[[bytes], Hashable],
+        timeout: float,
+        retries: int = 0,
+    ) -> Dict[Tuple[str, Hashable], Tuple[bytes, float]]:
+        """Send the requests and collect the replies.
+
+        :param requests: Dictionary of (IP address, session) keys and (family,
+                         socket address, packet) tuples of the requests.
+        :param session: Callable returning the session of a reply or None if
+                        the packet is not a reply of the protocol.
+        :param timeout: Time (in seconds) to wait for replies after sending
+                        the requests.
+        :param retries: How many times requests are sent again if they have
+                        not been answered.
+        :return Dictionary of the keys of answered requests and (reply,
+                round-trip time in seconds) tuples.
+        """
+        sent = {}
+        replies = {}
+
+        for _ in range(1 + retries):
+            pending = [key for key in requests if key not in replies]
+            if not pending:
+                break
+
+            for start in range(0, len(pending), self.batch_size):
+                end = start + self.batch_size
+                for key in pending[start:end]:
+                    family, sockaddr, packet = requests[key]
+                    if self.send(family, sockaddr, packet, timeout):
+                        sent[key] = self.clock()
+
+                self._collect(session, sent, replies, 0.0)
+
+            self._collect(session, sent, replies, timeout)
+
+        return replies
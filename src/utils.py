@@ -1,16 +1,98 @@
 """Collection of wrappers for IPMI-related utilities."""
 
+import asyncio
+import os
+import re
+import signal
 import subprocess
+from typing import NamedTuple, Tuple
 
+# Default timeout (in seconds) of a single utility process
+DEFAULT_TIMEOUT = 60
 
-class Ipmitool:
-    """Wrapper for the `ipmitool`."""
+# Maximum size of the output captured from a single utility process.
+# The rest of the output is read and discarded.
+MAX_OUTPUT_SIZE = 64 * 1024
+
+# Size of a chunk of the output read at once
+READ_CHUNK_SIZE = 4096
+
+# Environment variable `ipmitool -E` reads the BMC password from, so that
+# the password does not appear in the command line, e.g. in `ps`
+PASSWORD_VARIABLE = "IPMI_PASSWORD"
+
+# Options of `ipmitool` whose values are redacted when the command is logged
+SENSITIVE_OPTIONS = ("-P", "-k", "-y")
+REDACTED = "****"
+
+# Boot parameter holding boot flags, i.e. the boot device and its options
+BOOT_FLAGS_PARAMETER = 5
+
+# Boot device selector values of the boot flags (IPMI v2.0, table 28-14)
+BOOT_DEVICES = {
+    0x0: "none",
+    0x1: "pxe",
+    0x2: "disk",
+    0x3: "safe",
+    0x4: "diag",
+    0x5: "cdrom",
+    0x6: "bios",
+    0x7: "floppy",
+    0x8: "cdrom",
+    0x9: "floppy",
+    0xB: "disk",
+    0xF: "floppy",
+}
+
+
+def parse_boot_flags(output: str) -> dict:
+    """Parse the output of 'ipmitool chassis bootparam get 5'.
+
+    :return Dictionary with 'valid', 'persistent', 'efiboot' and 'device' keys
+            or None if the output does not contain boot parameter data.
+    """
+    match = re.search(r"Boot parameter data:\s*([0-9a-fA-F]{4,})", output)
+    if match is None:
+        return None
+
+    data = bytes.fromhex(match.group(1)[: len(match.group(1)) // 2 * 2])
+
+    return {
+        "valid": bool(data[0] & 0x80),
+        "persistent": bool(data[0] & 0x40),
+        "efiboot": bool(data[0] & 0x20),
+        "device": BOOT_DEVICES.get((data[1] >> 2) & 0xF, "unknown"),
+    }
+
+
+def redact(command: list) -> str:
+    """Join the command line, redacting the values of sensitive options."""
+    words = []
+    sensitive = False
+
+    for word in command:
+        words.append(REDACTED if sensitive else word)
+        sensitive = word in SENSITIVE_OPTIONS
+
+    return " ".join(words)
+
+
+class Template(NamedTuple):
+    """Baseline command of `ipmitool` for a BMC and the BMC password.
+
+    The template is built once per machine and reused by all the commands
+    executed on it.
+    """
+
+    command: Tuple[str, ...]
+    password: str
 
-    def __init__(
-        self, bmc_user: str, bmc_password: str, bmc_address: str, dry_run=False
-    ):
-        """Build ipmitool baseline command."""
-        self.command = [
+    @classmethod
+    def build(
+        cls, bmc_user: str, bmc_password: str, bmc_address: str, dry_run=False
+    ) -> "Template":
+        """Build the template of the BMC."""
+        command = (
             "ipmitool",
             "-e",
             "&",
@@ -20,14 +102,33 @@ class Ipmitool:
             bmc_address,
             "-U",
             bmc_user,
-            "-P",
-            bmc_password,
-        ]
+            "-E",
+        )
 
         # Do not actually run the command if --dry-run is specified.
         # Instead print the command as it would be executed.
         if dry_run:
-            self.command.insert(0, "echo")
+            command = ("echo",) + command
+
+        return cls(command, bmc_password)
+
+
+class Ipmitool:
+    """Wrapper for the `ipmitool`.
+
+    :param timeout: Seconds after which a command is killed or None to wait
+                    for it indefinitely. The console is never timed out.
+    """
+
+    def __init__(self, template: Template, timeout=None):
+        """Start the command from the baseline command of the template."""
+        self.command = list(template.command)
+        self.password = template.password
+        self.timeout = timeout
+
+    def environment(self) -> dict:
+        """Return the environment of the command, passing the BMC password."""
+        return dict(os.environ, **{PASSWORD_VARIABLE: self.password})
 
     def _execute(self) -> (bool, str):
         """Execute the command.
@@ -40,19 +141,28 @@ class Ipmitool:
                 check=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
+                env=self.environment(),
+                timeout=self.timeout,
+            )
+
+        except subprocess.TimeoutExpired:
+            return False, (
+                "Failed to run command: '{}'\nTimed out after {} seconds".format(
+                    redact(self.command), self.timeout
+                )
             )
 
         except subprocess.SubprocessError as e:
             return False, (
                 "Failed to run command: '{}'\n{}".format(
-                    " ".join(self.command), e.stdout.decode("utf-8").strip()
+                    redact(self.command), e.stdout.decode("utf-8").strip()
                 )
             )
 
         # Utility (e.g. ipmitool) is not available in the system
         except FileNotFoundError as e:
             return False, (
-                "Failed to run command: '{}'\n{}".format(" ".join(self.command), e)
+                "Failed to run command: '{}'\n{}".format(redact(self.command), e)
             )
 
         return True, process.stdout.decode("utf-8").strip()
@@ -64,19 +174,19 @@ class Ipmitool:
         """
         try:
             # Do not capture stdout
-            subprocess.run(self.command, stderr=subprocess.PIPE)
+            subprocess.run(self.command, stderr=subprocess.PIPE, env=self.environment())
 
         except subprocess.SubprocessError as e:
             return False, (
                 "Failed to run command: '{}'\n{}".format(
-                    " ".join(self.command), e.stderr.decode("utf-8").strip()
+                    redact(self.command), e.stderr.decode("utf-8").strip()
                 )
             )
 
         # Utility (e.g. ipmitool) is not available in the system
         except FileNotFoundError as e:
             return False, (
-                "Failed to run command: '{}'\n{}".format(" ".join(self.command), e)
+                "Failed to run command: '{}'\n{}".format(redact(self.command), e)
             )
 
         # Return the cursor to the beginning of the line
@@ -104,22 +214,140 @@ class Ipmitool:
         self.command.extend(["chassis", "power", "cycle"])
         return self._execute()
 
-    def bootdev_bios(self) -> (bool, str):
-        """Execute 'ipmitool chassis bootdev bios'."""
-        self.command.extend(["chassis", "bootdev", "bios", "options=efiboot"])
+    def bootdev(self, device: str, persistent=False, efiboot=False) -> (bool, str):
+        """Execute 'ipmitool chassis bootdev DEVICE [options=...]'.
+
+        :param persistent: Apply the boot device to all future boots instead
+        of the next boot only.
+        :param efiboot: Request EFI boot instead of legacy (PC compatible) boot.
+        """
+        self.command.extend(["chassis", "bootdev", device])
+
+        options = []
+        if persistent:
+            options.append("persistent")
+        if efiboot:
+            options.append("efiboot")
+        if options:
+            self.command.append("options=" + ",".join(options))
+
         return self._execute()
 
-    def bootdev_disk(self) -> (bool, str):
+    def bootdev_bios(self, persistent=False, efiboot=True) -> (bool, str):
+        """Execute 'ipmitool chassis bootdev bios'."""
+        return self.bootdev("bios", persistent, efiboot)
+
+    def bootdev_disk(self, persistent=False, efiboot=False) -> (bool, str):
         """Execute 'ipmitool chassis bootdev disk'."""
-        self.command.extend(["chassis", "bootdev", "disk"])
-        return self._execute()
+        return self.bootdev("disk", persistent, efiboot)
 
-    def bootdev_pxe(self) -> (bool, str):
+    def bootdev_pxe(self, persistent=False, efiboot=False) -> (bool, str):
         """Execute 'ipmitool chassis bootdev pxe'."""
-        self.command.extend(["chassis", "bootdev", "pxe"])
+        return self.bootdev("pxe", persistent, efiboot)
+
+    def bootparam_get(self, parameter=BOOT_FLAGS_PARAMETER) -> (bool, str):
+        """Execute 'ipmitool chassis bootparam get PARAMETER'."""
+        self.command.extend(["chassis", "bootparam", "get", str(parameter)])
+        return self._execute()
+
+    def dcmi_power_reading(self) -> (bool, str):
+        """Execute 'ipmitool dcmi power reading'."""
+        self.command.extend(["dcmi", "power", "reading"])
         return self._execute()
 
     def console(self) -> (bool, str):
         """Execute 'ipmitool sol activate'."""
         self.command.extend(["sol", "activate"])
         return self._execute_without_checking_output()
+
+    def console_command(self) -> list:
+        """Return 'ipmitool sol activate' command without executing it."""
+        return self.command + ["sol", "activate"]
+
+
+class AsyncIpmitool(Ipmitool):
+    """Asyncio-based wrapper for the `ipmitool`.
+
+    The commands are coroutines, so that a single thread can supervise
+    many concurrently running `ipmitool` processes. Each process is started
+    in its own process group, which is killed as a whole when the process
+    does not finish within the timeout or the coroutine is cancelled.
+    """
+
+    def __init__(self, template: Template, timeout=DEFAULT_TIMEOUT):
+        """Start the command from the baseline command of the template."""
+        super().__init__(template, timeout)
+
+    @staticmethod
+    async def _read_output(stream) -> bytes:
+        """Read the output incrementally, keeping at most MAX_OUTPUT_SIZE bytes."""
+        output = bytearray()
+
+        while True:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            output += chunk[: MAX_OUTPUT_SIZE - len(output)]
+
+        return bytes(output)
+
+    @classmethod
+    async def _communicate(cls, process) -> bytes:
+        """Read the output of the process and wait for the process to exit."""
+        output = await cls._read_output(process.stdout)
+        await process.wait()
+        return output
+
+    @staticmethod
+    def _kill(process):
+        """Kill the process group of the process."""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def _execute(self) -> (bool, str):
+        """Execute the command.
+
+        :return Tuple of command result code and command output.
+        """
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+                env=self.environment(),
+            )
+
+        # Utility (e.g. ipmitool) is not available in the system
+        except FileNotFoundError as e:
+            return False, (
+                "Failed to run command: '{}'\n{}".format(redact(self.command), e)
+            )
+
+        try:
+            output = await asyncio.wait_for(self._communicate(process), self.timeout)
+
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.wait()
+            return False, (
+                "Failed to run command: '{}'\nTimed out after {} seconds".format(
+                    redact(self.command), self.timeout
+                )
+            )
+
+        except asyncio.CancelledError:
+            self._kill(process)
+            raise
+
+        output = output.decode("utf-8", errors="replace").strip()
+
+        if process.returncode != 0:
+            return False, (
+                "Failed to run command: '{}'\n{}".format(redact(self.command), output)
+            )
+
+        return True, output
@@ -0,0 +1,162 @@
+"""This module watches the power state of machines and reports its changes.
+
+The power state of each machine is polled continuously and kept in memory.
+Only changes of the state are reported, one JSON document per line, e.g.:
+
+    {"time":1700000000.0,"machine":"compute-1","state":"on","previous":null}
+    {"time":1700000420.5,"machine":"compute-1","state":"off","previous":"on"}
+    {"time":1700000480.7,"machine":"compute-1","state":"unknown","previous":"off",
+     "error":"Error: Unable to establish session"}
+
+The first state of a machine is reported with `previous` set to null. A machine
+whose BMC does not answer, e.g. while the BMC resets, is in the `unknown`
+state.
+
+Each machine is polled at its own interval. Right after a change the interval
+is the shortest, so that a machine cycling through states is followed closely,
+and it doubles with each poll which finds the state unchanged, up to the
+longest interval. Stable machines are thus polled rarely.
+"""
+
+import json
+import re
+import time
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+# Shortest and longest interval (in seconds) between polls of a machine
+MIN_INTERVAL = 2.0
+MAX_INTERVAL = 60.0
+
+# Factor the interval is multiplied by when the state has not changed
+BACKOFF = 2.0
+
+UNKNOWN = "unknown"
+
+# Maximum length of the output of a failed poll reported with the event
+MAX_ERROR_LENGTH = 200
+
+
+def parse_power_state(output: str) -> str:
+    """Parse the output of 'ipmitool chassis power status'.
+
+    :return The power state, e.g. `on` or `off`, or None if the output does
+            not contain the power state.
+    """
+    match = re.search(r"Chassis Power is (\w+)", output or "")
+    return match.group(1).lower() if match else None
+
+
+class MachineState:
+    """Power state of a machine and the schedule of its polls."""
+
+    __slots__ = ("state", "interval", "next_poll")
+
+    def __init__(self, next_poll: float, interval: float):
+        """Set up the machine of an unknown state."""
+        self.state = None
+        self.interval = interval
+        self.next_poll = next_poll
+
+
+class Watcher:
+    """Power states of the watched machines.
+
+    :param clock: Monotonic clock the polls are scheduled by.
+    :param wall_clock: Clock of the time of the reported changes.
+    """
+
+    def __init__(
+        self,
+        machines: Iterable[str],
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        clock=time.monotonic,
+        wall_clock=time.time,
+    ):
+        """Set up the machines, all of which are polled at once."""
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.clock = clock
+        self.wall_clock = wall_clock
+
+        now = clock()
+        self.machines = {
+            machine: MachineState(now, min_interval) for machine in machines
+        }
+
+    def due(self) -> List[str]:
+        """Return the machines whose poll is due."""
+        now = self.clock()
+        return [
+            machine
+            for machine, state in self.machines.items()
+            if state.next_poll <= now
+        ]
+
+    def next_poll(self) -> float:
+        """Return the time of the next poll of any machine."""
+        return min(state.next_poll for state in self.machines.values())
+
+    def update(self, machine: str, success: bool, output: str) -> dict:
+        """Record the result of the poll of the machine.
+
+        :return The event of the change of the state or None if the state has
+                not changed.
+        """
+        state = parse_power_state(output) if success else None
+        machine_state = self.machines[machine]
+        previous = machine_state.state
+        current = state or UNKNOWN
+
+        if current == previous:
+            machine_state.interval = min(
+                self.max_interval, machine_state.interval * BACKOFF
+            )
+            event = None
+        else:
+            machine_state.state = current
+            machine_state.interval = self.min_interval
+            event = {
+                "time": round(self.wall_clock(), 3),
+                "machine": machine,
+                "state": current,
+                "previous": previous,
+            }
+            if state is None:
+                event["error"] = (output or "")[:MAX_ERROR_LENGTH]
+
+        machine_state.next_poll = self.clock() + machine_state.interval
+        return event
+
+
+def watch(
+    watcher: Watcher,
+    poll: Callable[[List[str]], Iterator[Tuple[str, bool, str]]],
+    emit: Callable[[str], None],
+    duration: float = None,
+    sleep=time.sleep,
+):
+    """Poll the due machines and emit the changes of their state.
+
+    :param poll: Callable polling the power state of the machines, yielding
+                 (machine, success, output) tuples.
+    :param emit: Callable writing a line of the JSON document of a change.
+    :param duration: Number of seconds after which the watch stops or None to
+                     watch until interrupted.
+    """
+    deadline = None if duration is None else watcher.clock() + duration
+
+    while deadline is None or watcher.clock() < deadline:
+        due = watcher.due()
+
+        if due:
+            for machine, success, output in poll(due):
+                event = watcher.update(machine, success, output)
+                if event is not None:
+                    emit(json.dumps(event, separators=(",", ":")))
+
+        wake_up = watcher.next_poll()
+        if deadline is not None:
+            wake_up = min(wake_up, deadline)
+
+        sleep(max(0.0, wake_up - watcher.clock()))
@@ -0,0 +1,87 @@
+"""Benchmark of RMCP pings of simulated BMCs over the shared UDP transport.
+
+Compares the shared transport with a socket per BMC, waited on with the
+system's selector, and prints the elapsed time, the number of sockets and
+the number of waits of each. Run from the repository root:
+
+    PYTHONPATH=src python -m tests.benchmark_udp --bmcs 10000
+"""
+
+import argparse
+import selectors
+import socket
+import time
+
+import rmcp
+import udp
+from tests.simulator import Simulator
+
+
+def ping_shared(addresses, port, timeout):
+    """Ping the BMCs over the shared transport."""
+    requests = {
+        (address, 0): (socket.AF_INET, (address, port), rmcp.build_ping(0))
+        for address in addresses
+    }
+
+    with udp.Transport() as transport:
+        replies = transport.exchange(
+            requests, lambda packet: 0 if rmcp.is_pong(packet) else None, timeout
+        )
+        return len(replies), len(transport.sockets), transport.stats["polls"]
+
+
+def ping_socket_per_bmc(addresses, port, timeout):
+    """Ping the BMCs, each from its own socket."""
+    selector = selectors.DefaultSelector()
+    polls = 0
+    answered = 0
+
+    for address in addresses:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.sendto(rmcp.build_ping(0), (address, port))
+        selector.register(sock, selectors.EVENT_READ)
+
+    deadline = time.monotonic() + timeout
+    while answered < len(addresses) and time.monotonic() < deadline:
+        polls += 1
+        for key, _ in selector.select(deadline - time.monotonic()):
+            if rmcp.is_pong(key.fileobj.recv(512)):
+                answered += 1
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+    selector.close()
+
+    return answered, len(addresses), polls
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bmcs", type=int, default=5000)
+    parser.add_argument("--unreachable-every", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with Simulator(args.bmcs, args.unreachable_every) as simulator:
+        for name, ping in (
+            ("shared transport", ping_shared),
+            ("socket per BMC", ping_socket_per_bmc),
+        ):
+            started = time.monotonic()
+            answered, sockets, polls = ping(
+                simulator.addresses, simulator.port, args.timeout
+            )
+            elapsed = time.monotonic() - started
+            print(
+                f"{name}: {answered}/{args.bmcs} answered in {elapsed:.3f}s, "
+                f"{sockets} socket(s), {polls} wait(s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Simulator of BMCs answering RMCP presence pings.
+
+Each virtual BMC has its own loopback address, e.g. 127.1.0.1, and all of them
+are served by a single socket, which answers from the address the ping was
+sent to. Linux only, as it relies on IP_PKTINFO.
+"""
+
+import ipaddress
+import select
+import socket
+import struct
+import sys
+import threading
+
+import rmcp
+
+IP_PKTINFO = getattr(socket, "IP_PKTINFO", 8)
+
+SUPPORTED = sys.platform.startswith("linux")
+
+
+def build_pong(ping: bytes) -> bytes:
+    """Build the presence pong answering the ping."""
+    return (
+        rmcp.RMCP_HEADER
+        + struct.pack(">IBBBB", rmcp.ASF_IANA, rmcp.ASF_PRESENCE_PONG, ping[9], 0, 16)
+        + struct.pack(">IIBB6x", rmcp.ASF_IANA, 0, 0x81, 0)
+    )
+
+
+class Simulator:
+    """Virtual BMCs, every `unreachable_every`-th of which does not answer."""
+
+    def __init__(self, count: int, unreachable_every: int = 0, first="127.1.0.1"):
+        """Set up the addresses of the virtual BMCs."""
+        first = ipaddress.ip_address(first)
+        self.addresses = [str(first + i) for i in range(count)]
+        self.unreachable = (
+            set(self.addresses[unreachable_every - 1 :: unreachable_every])
+            if unreachable_every
+            else set()
+        )
+        self.pings = 0
+        self.sock = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        """Return the port the virtual BMCs listen on."""
+        return self.sock.getsockname()[1]
+
+    def __enter__(self):
+        """Start answering pings."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind(("0.0.0.0", 0))
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop answering pings."""
+        self.stopped.set()
+        self.thread.join()
+        self.sock.close()
+
+    def _serve(self):
+        while not self.stopped.is_set():
+            if not select.select([self.sock], [], [], 0.05)[0]:
+                continue
+
+            packet, ancillary, _, source = self.sock.recvmsg(512, socket.CMSG_SPACE(12))
+            self.pings += 1
+            # struct in_pktinfo: interface index, local address, destination
+            _, _, data = ancillary[0]
+            destination = data[8:12]
+
+            if (
+                packet[:4] != rmcp.RMCP_HEADER
+                or socket.inet_ntoa(destination) in self.unreachable
+            ):
+                continue
+
+            pktinfo = struct.pack("I4s4s", 0, destination, bytes(4))
+            self.sock.sendmsg(
+                [build_pong(packet)],
+                [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)],
+                0,
+                source,
+            )
@@ -1,6 +1,22 @@
+import asyncio
+import csv
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from unittest.mock import patch
+
 import pytest
 
-from app import Application
+from app import Application, ApplicationError, Command, NodeResult
+
+import inventory
+import journal
+
+import scheduler
+
+import selector
 
 
 def test_read_machines_config_file_exists():
@@ -45,3 +61,695 @@ def test_is_glob_pattern_returns_true(text):
 def test_is_glob_pattern_returns_false(text):
     application = Application(machine_config="tests/config/nodes.yaml")
     assert application._is_glob_pattern(text) is False
+
+
+def write_rack_files(directory, racks=2, machines_per_rack=2):
+    for rack in range(1, racks + 1):
+        lines = []
+        for node in range(1, machines_per_rack + 1):
+            lines.append(
+                f"- name: rack-{rack}-node-{node}\n"
+                "  bmc_user: root\n"
+                "  bmc_password: password\n"
+                f"  bmc_address: 10.0.{rack}.{node}\n"
+            )
+        (directory / f"rack-{rack}.yaml").write_text("".join(lines))
+
+
+def test_read_machines_config_directory(tmp_path):
+    write_rack_files(tmp_path)
+    application = Application(
+        machine_config=str(tmp_path), cache_dir=str(tmp_path / "cache")
+    )
+    machines = application._read_machines_config()
+    assert sorted(machines) == [
+        "rack-1-node-1",
+        "rack-1-node-2",
+        "rack-2-node-1",
+        "rack-2-node-2",
+    ]
+
+
+def test_read_machines_config_glob(tmp_path):
+    write_rack_files(tmp_path, racks=3)
+    application = Application(
+        machine_config=str(tmp_path / "rack-[12].yaml"),
+        cache_dir=str(tmp_path / "cache"),
+    )
+    machines = application._read_machines_config()
+    assert len(machines) == 4
+    assert "rack-3-node-1" not in machines
+
+
+def test_read_machines_config_glob_no_files(tmp_path):
+    application = Application(machine_config=str(tmp_path / "*.yaml"))
+    assert application._read_machines_config() is None
+
+
+def test_read_machines_config_directory_duplicates(tmp_path, caplog):
+    write_rack_files(tmp_path, racks=1)
+    (tmp_path / "rack-1-copy.yaml").write_text((tmp_path / "rack-1.yaml").read_text())
+    application = Application(
+        machine_config=str(tmp_path), cache_dir=str(tmp_path / "cache")
+    )
+    machines = application._read_machines_config()
+    assert len(machines) == 2
+    assert "defined multiple times" in caplog.text
+
+
+def test_read_machines_config_directory_invalid_file(tmp_path):
+    write_rack_files(tmp_path, racks=1)
+    (tmp_path / "rack-2.yaml").write_text("key: *undefined-alias")
+    application = Application(
+        machine_config=str(tmp_path), cache_dir=str(tmp_path / "cache")
+    )
+    assert application._read_machines_config() is None
+
+
+def test_read_machines_config_cache_reparses_only_modified_files(tmp_path):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    write_rack_files(config_dir, racks=5)
+    cache_dir = str(tmp_path / "cache")
+
+    application = Application(machine_config=str(config_dir), cache_dir=cache_dir)
+    application._read_machines_config()
+
+    # Modify a single rack file
+    (config_dir / "rack-3.yaml").write_text(
+        "- name: rack-3-node-9\n"
+        "  bmc_user: root\n"
+        "  bmc_password: password\n"
+        "  bmc_address: 10.0.3.9\n"
+    )
+
+    with patch("inventory.parse_file", wraps=inventory.parse_file) as parse_file:
+        machines = application._read_machines_config()
+
+    parse_file.assert_called_once_with(str(config_dir / "rack-3.yaml"))
+    assert "rack-3-node-9" in machines
+    assert "rack-3-node-1" not in machines
+
+
+def create_sqlite_export(path, csv_path="tests/config/nodes.csv"):
+    with open(csv_path, newline="") as file:
+        rows = list(csv.DictReader(file))
+
+    columns = list(rows[0])
+    connection = sqlite3.connect(str(path))
+    with connection:
+        connection.execute(f"CREATE TABLE machines ({', '.join(columns)})")
+        connection.executemany(
+            f"INSERT INTO machines VALUES ({', '.join('?' * len(columns))})",
+            [[row[column] for column in columns] for row in rows],
+        )
+    connection.close()
+
+
+@pytest.fixture
+def inventories(tmp_path):
+    sqlite_path = tmp_path / "nodes.sqlite"
+    create_sqlite_export(sqlite_path)
+    cache_dir = str(tmp_path / "cache")
+
+    return [
+        Application(machine_config=path, cache_dir=cache_dir)._read_machines_config()
+        for path in [
+            "tests/config/nodes-list.yaml",
+            "tests/config/nodes.csv",
+            str(sqlite_path),
+        ]
+    ]
+
+
+def test_read_machines_config_sources_have_same_machines(inventories):
+    yaml_inventory, csv_inventory, sqlite_inventory = inventories
+    assert len(yaml_inventory) == len(csv_inventory) == len(sqlite_inventory) == 10
+    for name in yaml_inventory:
+        assert yaml_inventory[name] == csv_inventory[name] == sqlite_inventory[name]
+
+
+@pytest.mark.parametrize(
+    "pattern, attributes",
+    [
+        ("*", None),
+        ("compute-*", None),
+        ("*storage*", None),
+        ("compute-[!12].*", None),
+        ("compute-?.example.com", {"zone": "AZ1"}),
+        ("*", {"tags": "gpu"}),
+        ("*", {"tags": "network", "zone": "AZ1"}),
+        ("*", {"zone": "AZ4"}),
+        ("control-*", {"tags": "gpu"}),
+        ("i-dont-exist", None),
+    ],
+)
+def test_inventory_match_identical_across_sources(inventories, pattern, attributes):
+    results = [inv.match(pattern, attributes) for inv in inventories]
+    assert results[0] == results[1] == results[2]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "compute-[2-5].*",
+        "*,zone=AZ1,!tags=gpu",
+        "tags=control-storage,zone!=AZ3",
+        "!compute-*",
+    ],
+)
+def test_selector_identical_across_sources(inventories, query):
+    plan = selector.compile_query(query)
+    results = [plan.execute(inv) for inv in inventories]
+    assert results[0] == results[1] == results[2]
+    assert results[0]
+
+
+@pytest.mark.parametrize("name", ["nodes?v=1#a.sqlite", "100%.sqlite"])
+def test_read_machines_config_sqlite_special_characters(tmp_path, name):
+    sqlite_path = tmp_path / name
+    create_sqlite_export(sqlite_path)
+
+    machines = Application(
+        machine_config=str(sqlite_path), cache_dir=str(tmp_path / "cache")
+    )._read_machines_config()
+
+    assert len(machines) == 10
+
+
+def test_sqlite_inventory_connection_per_thread(tmp_path):
+    machines = Application(
+        machine_config="tests/config/nodes.csv", cache_dir=str(tmp_path / "cache")
+    )._read_machines_config()
+    connections = []
+    results = []
+
+    def read():
+        connections.append(machines._connection)
+        results.append(machines["network-1.example.com"])
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, connections))) == 4
+    assert len(results) == 4
+
+
+def test_read_machines_config_csv_cache_reused(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    Application(
+        machine_config="tests/config/nodes.csv", cache_dir=cache_dir
+    )._read_machines_config()
+
+    with patch("inventory.build_sqlite_cache") as build_sqlite_cache:
+        machines = Application(
+            machine_config="tests/config/nodes.csv", cache_dir=cache_dir
+        )._read_machines_config()
+
+    build_sqlite_cache.assert_not_called()
+    assert "network-1.example.com" in machines
+
+
+def test_read_machines_config_csv_not_found(tmp_path):
+    application = Application(
+        machine_config=str(tmp_path / "nodes.csv"), cache_dir=str(tmp_path)
+    )
+    assert application._read_machines_config() is None
+
+
+@pytest.mark.parametrize(
+    "backend", [Application.BACKEND_IPMITOOL, Application.BACKEND_IPMITOOL_ASYNC]
+)
+def test_execute(backend):
+    application = Application(
+        dry_run=True,
+        machine_config="tests/config/nodes.yaml",
+        backend=backend,
+        parallel=4,
+    )
+    results = application.execute(Command.POWER_STATUS, "compute-*")
+
+    assert [result.machine for result in results] == [
+        f"compute-{i}.example.com" for i in range(1, 7)
+    ]
+    assert all(isinstance(result, NodeResult) for result in results)
+    assert all(result.success for result in results)
+    assert "power status" in results[0].output
+
+
+def test_iter_execute_multiple_selectors():
+    application = Application(dry_run=True, machine_config="tests/config/nodes.yaml")
+    results = list(
+        application.iter_execute(Command.POWER_ON, ["compute-1", "network-*"])
+    )
+
+    assert sorted(result.machine for result in results) == [
+        "compute-1.example.com",
+        "network-1.example.com",
+    ]
+
+
+def test_execute_async():
+    application = Application(
+        dry_run=True, machine_config="tests/config/nodes.yaml", parallel=2
+    )
+    results = asyncio.run(
+        application.execute_async(
+            Command.BOOTDEV_PXE, "control-*", {"persistent": True}
+        )
+    )
+
+    assert len(results) == 3
+    assert all(result.success for result in results)
+    assert "options=persistent" in results[0].output
+
+
+def test_execute_ping_skips_unreachable_machines():
+    application = Application(machine_config="tests/config/nodes.yaml", ping=True)
+    executed = []
+
+    def execute_wrapper(command, machine, options=None, on_start=None):
+        executed.append(machine)
+        return True, ""
+
+    with patch(
+        "rmcp.ping", return_value={"192.168.200.1": 0.001, "192.168.200.2": 0.001}
+    ), patch.object(application, "_execute_wrapper", side_effect=execute_wrapper):
+        results = application.execute(Command.POWER_ON, "compute-[1-3].example.com")
+
+    assert sorted(executed) == ["compute-1.example.com", "compute-2.example.com"]
+    assert results[2] == NodeResult(
+        "compute-3.example.com",
+        False,
+        "BMC unreachable: No response to RMCP ping from 192.168.200.3",
+    )
+
+
+def test_execute_ping_command():
+    application = Application(machine_config="tests/config/nodes.yaml")
+
+    with patch("rmcp.ping", return_value={"192.168.200.1": 0.001}):
+        results = application.execute(Command.PING, "compute-[1-2].example.com")
+
+    assert results == [
+        NodeResult(
+            "compute-1.example.com", True, "RMCP pong from 192.168.200.1 in 1.0 ms"
+        ),
+        NodeResult(
+            "compute-2.example.com",
+            False,
+            "No response to RMCP ping from 192.168.200.2",
+        ),
+    ]
+
+
+def test_execute_async_backend_group_limits():
+    application = Application(
+        dry_run=True,
+        machine_config="tests/config/nodes.yaml",
+        backend=Application.BACKEND_IPMITOOL_ASYNC,
+        parallel=8,
+        limits={"192.168.200.0/24": 2},
+    )
+    results = application.execute(Command.POWER_STATUS, "compute-*")
+
+    assert len(results) == 6
+    assert all(result.success for result in results)
+    assert application.controllers["192.168.200.0/24"].max_limit == 2
+
+
+@pytest.mark.parametrize(
+    "machine_config, selector",
+    [
+        ("tests/config/i-dont-exist.yaml", "*"),
+        ("tests/config/nodes.yaml", "i-dont-exist"),
+        ("tests/config/nodes.yaml", "compute"),
+    ],
+)
+def test_execute_error(machine_config, selector):
+    application = Application(dry_run=True, machine_config=machine_config)
+
+    with pytest.raises(ApplicationError):
+        application.execute(Command.POWER_STATUS, selector)
+
+
+@pytest.mark.parametrize(
+    "backend", [Application.BACKEND_IPMITOOL, Application.BACKEND_IPMITOOL_ASYNC]
+)
+def test_execute_credentials_file_not_found(tmp_path, backend):
+    machine_config = tmp_path / "nodes.yaml"
+    machine_config.write_text(
+        "node-1:\n"
+        "  bmc_user: root\n"
+        f"  bmc_password: include-rel://{tmp_path / 'i-dont-exist'}\n"
+        "  bmc_address: 192.168.200.1\n"
+    )
+    application = Application(
+        dry_run=True, machine_config=str(machine_config), backend=backend, parallel=2
+    )
+
+    with pytest.raises(ApplicationError, match="'bmc_password' value"):
+        application.execute(Command.POWER_STATUS, "node-1")
+
+
+def test_execute_console_not_supported():
+    application = Application(dry_run=True, machine_config="tests/config/nodes.yaml")
+
+    with pytest.raises(ApplicationError):
+        application.execute(Command.CONSOLE, "compute-1")
+
+
+def test_inventory_reloaded_only_when_config_changes(tmp_path):
+    config = tmp_path / "nodes.yaml"
+    shutil.copy("tests/config/nodes.yaml", config)
+    application = Application(dry_run=True, machine_config=str(config))
+
+    with patch.object(
+        application, "_read_machines_config", wraps=application._read_machines_config
+    ) as read:
+        application.select("*")
+        application.select("compute-*")
+        assert read.call_count == 1
+
+        with open(config, "a") as file:
+            file.write("\nnew-1.example.com:\n  bmc_address: 192.168.200.99\n")
+
+        assert application.select("new-1") == ["new-1.example.com"]
+        assert read.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "machines, include, exclude, expected",
+    [
+        ((), ["compute-[1-3]*"], [], ["compute-1", "compute-2", "compute-3"]),
+        (
+            ["network-1"],
+            ["compute-[1-2]*"],
+            [],
+            ["compute-1", "compute-2", "network-1"],
+        ),
+        (
+            (),
+            [],
+            ["*,tags=compute", "zone=AZ3"],
+            ["control-storage-1", "control-storage-2", "network-1"],
+        ),
+        (
+            ["compute-*"],
+            [],
+            ["zone=AZ1"],
+            ["compute-2", "compute-3", "compute-5", "compute-6"],
+        ),
+        ((), ["compute-*,zone=AZ1"], ["compute-1*"], ["compute-4"]),
+    ],
+)
+def test_get_matching_machines_include_exclude(machines, include, exclude, expected):
+    application = Application(machine_config="tests/config/nodes.yaml")
+    application._load_machines()
+
+    assert application._get_matching_machines(machines, include, exclude) == [
+        f"{name}.example.com" for name in expected
+    ]
+
+
+@pytest.mark.parametrize(
+    "include, exclude, expected",
+    [
+        (["node[0-9]*"], [], ["node1", "node12", "node2"]),
+        ([], ["node[0-9]*"], ["nodex"]),
+        ([], ["node[1-2]*"], ["nodex"]),
+        ([], ["node[1,2]"], ["node12", "nodex"]),
+    ],
+)
+def test_get_matching_machines_glob_classes(tmp_path, include, exclude, expected):
+    config = tmp_path / "nodes.yaml"
+    config.write_text(
+        "".join(
+            f"{name}:\n  bmc_address: 192.168.200.1\n"
+            for name in ("node1", "node2", "node12", "nodex")
+        )
+    )
+    application = Application(
+        machine_config=str(config), cache_dir=str(tmp_path / "cache")
+    )
+    application._load_machines()
+
+    assert application._get_matching_machines((), include, exclude) == expected
+
+
+def test_get_matching_machines_invalid_query(caplog):
+    application = Application(machine_config="tests/config/nodes.yaml")
+    application._load_machines()
+
+    assert application._get_matching_machines((), ["zone="], []) == []
+
+
+def test_execute_interactive_before_background():
+    application = Application(dry_run=True, machine_config="tests/config/nodes.yaml")
+    order = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def execute_wrapper(command, machine, options=None, on_start=None):
+        started.set()
+        release.wait()
+        order.append((command, machine))
+        return True, ""
+
+    with patch.object(application, "_execute_wrapper", side_effect=execute_wrapper):
+        polling = application.iter_execute(Command.POWER_STATUS, "compute-*")
+        polling_results = threading.Thread(target=list, args=(polling,))
+        polling_results.start()
+        # The only thread is busy with the first status query
+        started.wait()
+
+        interactive = application.iter_execute(
+            Command.POWER_OFF, "network-1", priority=scheduler.INTERACTIVE
+        )
+        interactive_results = threading.Thread(target=list, args=(interactive,))
+        interactive_results.start()
+        while not application.scheduler.queues[scheduler.INTERACTIVE]:
+            time.sleep(0.01)
+
+        release.set()
+        interactive_results.join()
+        polling_results.join()
+
+    assert order[:2] == [
+        (Command.POWER_STATUS, "compute-1.example.com"),
+        (Command.POWER_OFF, "network-1.example.com"),
+    ]
+    assert len(order) == 7
+
+
+def test_execute_deadline():
+    application = Application(dry_run=True, machine_config="tests/config/nodes.yaml")
+
+    results = application.execute(Command.POWER_ON, "compute-*", deadline=-1)
+
+    assert len(results) == 6
+    assert results[0] == NodeResult(
+        "compute-1.example.com", False, scheduler.DEADLINE_EXCEEDED
+    )
+
+
+def test_execute_shares_queries_of_concurrent_callers():
+    application = Application(
+        dry_run=True, machine_config="tests/config/nodes.yaml", parallel=4
+    )
+    queried = []
+    release = threading.Event()
+
+    def execute_wrapper(command, machine, options=None, on_start=None):
+        queried.append(machine)
+        release.wait()
+        return True, f"{machine}: Chassis Power is on"
+
+    with patch.object(application, "_execute_wrapper", side_effect=execute_wrapper):
+        callers = [
+            threading.Thread(
+                target=application.execute,
+                args=(Command.POWER_STATUS, selector),
+                kwargs={"priority": scheduler.INTERACTIVE},
+            )
+            for selector in ("compute-[1-2]*", "compute-[2-3]*")
+        ]
+        for caller in callers:
+            caller.start()
+        while len(queried) < 3:
+            time.sleep(0.01)
+        # Let the second query of compute-2 join the first one
+        time.sleep(0.1)
+        release.set()
+        for caller in callers:
+            caller.join()
+
+    assert sorted(queried) == [
+        "compute-1.example.com",
+        "compute-2.example.com",
+        "compute-3.example.com",
+    ]
+
+
+@pytest.mark.parametrize(
+    "limit_by, group", [("subnet", "192.168.200.0/24"), ("zone", "zone=AZ1")]
+)
+def test_run_async_timings(limit_by, group):
+    application = Application(
+        dry_run=True,
+        machine_config="tests/config/nodes.yaml",
+        backend=Application.BACKEND_IPMITOOL_ASYNC,
+        parallel=8,
+        adaptive=True,
+        limit_by=limit_by,
+        timings=True,
+    )
+
+    with patch.object(application.logger, "info") as info:
+        assert application.run(Command.POWER_STATUS, ["*"], None, None) == 0
+
+    timings = [
+        call.args[0] for call in info.call_args_list if "Timings" in call.args[0]
+    ]
+    assert any(line.startswith(f"Timings of {group}: limit ") for line in timings)
+    assert sum(int(re.search(r"(\d+) completed", line)[1]) for line in timings) == 10
+
+
+def test_execute_local_interrupted_cancels_queued_commands():
+    application = Application(machine_config="tests/config/nodes.yaml", parallel=2)
+    application._load_machines()
+    machines = sorted(application.machines)
+    started = []
+
+    def execute_wrapper(command, machine, options=None, on_start=None):
+        started.append(machine)
+        time.sleep(0.05)
+        return True, ""
+
+    with patch.object(application, "_execute_wrapper", side_effect=execute_wrapper):
+        results = application._execute_local(Command.POWER_CYCLE, machines)
+        next(results)
+        next(results)
+        results.close()
+
+    assert len(machines) == 10
+    assert len(started) <= 4
+
+
+def test_run_interrupted_journals_drained_commands(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    application = Application(
+        machine_config="tests/config/nodes.yaml",
+        journal_path=str(journal_path),
+        parallel=2,
+    )
+    application._load_machines()
+    machines = sorted(application.machines)
+    started = []
+
+    def execute_wrapper(command, machine, options=None, on_start=None):
+        started.append(machine)
+        time.sleep(0.05)
+        return True, ""
+
+    with patch.object(
+        application, "_execute_wrapper", side_effect=execute_wrapper
+    ), patch.object(application, "_report_result", side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            application._run_command(Command.POWER_CYCLE, machines)
+
+    assert len(started) < len(machines)
+    assert journal.read_succeeded(str(journal_path), "POWER_CYCLE") == set(started)
+
+
+def test_run_ping_skips_unreachable_machines():
+    application = Application(machine_config="tests/config/nodes.yaml", ping=True)
+    application._load_machines()
+    executed = []
+
+    def execute_local(command, machines, options=None, on_start=None, on_drained=None):
+        executed.extend(machines)
+        for machine in machines:
+            yield machine, True, ""
+
+    with patch("rmcp.ping", return_value={"192.168.200.1": 0.001}), patch.object(
+        application, "_execute_local", side_effect=execute_local
+    ):
+        results = dict(
+            (machine, (success, output))
+            for machine, success, output in application._execute_many(
+                Command.POWER_ON, ["compute-1.example.com", "compute-2.example.com"]
+            )
+        )
+
+    assert executed == ["compute-1.example.com"]
+    assert results["compute-2.example.com"] == (
+        False,
+        "BMC unreachable: No response to RMCP ping from 192.168.200.2",
+    )
+
+
+def test_run_async_group_limits():
+    application = Application(
+        dry_run=True,
+        machine_config="tests/config/nodes.yaml",
+        backend=Application.BACKEND_IPMITOOL_ASYNC,
+        parallel=8,
+        limits={"192.168.200.0/24": 2},
+    )
+
+    assert application.run(Command.POWER_STATUS, ["*"], None, None) == 0
+    assert application.controllers["192.168.200.0/24"].max_limit == 2
+    assert all(
+        controller.max_limit == 8
+        for group, controller in application.controllers.items()
+        if group != "192.168.200.0/24"
+    )
+
+
+def test_bootdev_verify_journals_set_before_verification(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    application = Application(
+        machine_config="tests/config/nodes.yaml", journal_path=str(journal_path)
+    )
+    application._load_machines()
+
+    with patch.object(
+        application,
+        "_execute_many",
+        return_value=iter([("compute-1.example.com", True, "Set Boot Device to pxe")]),
+    ), patch.object(application, "_verify_bootdev", side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            application._run_bootdev_verified(
+                Command.BOOTDEV_PXE, ["compute-1.example.com"]
+            )
+
+    assert journal.read_succeeded(str(journal_path), "BOOTDEV_PXE") == {
+        "compute-1.example.com"
+    }
+
+
+def test_ping_resolves_include_rel_addresses(tmp_path):
+    address_file = tmp_path / "address"
+    address_file.write_text("192.168.200.7\n")
+    config = tmp_path / "nodes.yaml"
+    config.write_text(
+        f"node-1:\n  bmc_address: include-rel://{address_file}\n"
+        "node-2:\n  bmc_address: 192.168.200.8\n"
+    )
+    application = Application(
+        machine_config=str(config), cache_dir=str(tmp_path / "cache")
+    )
+    application._load_machines()
+
+    with patch("rmcp.ping", return_value={"192.168.200.7": 0.001}) as ping:
+        results = list(application._ping_many(["node-1", "node-2"]))
+
+    assert sorted(ping.call_args.args[0]) == ["192.168.200.7", "192.168.200.8"]
+    assert results == [
+        ("node-1", True, "RMCP pong from 192.168.200.7 in 1.0 ms"),
+        ("node-2", False, "No response to RMCP ping from 192.168.200.8"),
+    ]
@@ -0,0 +1,306 @@
+import socket
+import threading
+
+import pytest
+
+from app import Application, Command
+
+import cluster
+
+
+@pytest.fixture
+def start_worker():
+    workers = []
+
+    def start(token="", machine_config="tests/config/nodes.yaml"):
+        application = Application(
+            machine_config=machine_config, dry_run=True, worker_token=token
+        )
+        server = application.create_worker("127.0.0.1", 0)
+        requests = []
+        execute = server.execute
+
+        def record(command, machines, options):
+            requests.append((command, sorted(machines), options))
+            return execute(command, machines, options)
+
+        server.execute = record
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        workers.append(server)
+
+        return server.server_address, requests
+
+    yield start
+
+    for server in workers:
+        server.shutdown()
+        server.server_close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize(
+    "address, expected",
+    [
+        ("mgmt-dc1:9000", ("mgmt-dc1", 9000)),
+        ("10.0.0.1", ("10.0.0.1", cluster.DEFAULT_PORT)),
+        ("[::1]:9000", ("::1", 9000)),
+        ("[fe80::1]", ("fe80::1", cluster.DEFAULT_PORT)),
+    ],
+)
+def test_parse_address(address, expected):
+    assert cluster.parse_address(address) == expected
+
+
+@pytest.mark.parametrize("address", ["mgmt:port", ":9000", "mgmt:70000", "[::1]:x"])
+def test_parse_address_invalid(address):
+    with pytest.raises(cluster.ClusterError):
+        cluster.parse_address(address)
+
+
+def test_parse_workers():
+    assert cluster.parse_workers(["dc1=mgmt-dc1:9000", "*=mgmt"]) == {
+        "dc1": ("mgmt-dc1", 9000),
+        "*": ("mgmt", cluster.DEFAULT_PORT),
+    }
+
+
+@pytest.mark.parametrize("worker", ["mgmt-dc1:9000", "=mgmt-dc1:9000"])
+def test_parse_workers_invalid(worker):
+    with pytest.raises(cluster.ClusterError):
+        cluster.parse_workers([worker])
+
+
+def test_execute_distributed(start_worker):
+    az1_address, az1_requests = start_worker()
+    other_address, other_requests = start_worker()
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml",
+        workers={"AZ1": az1_address, "*": other_address},
+        shard_by="zone",
+    )
+
+    results = coordinator.execute(Command.POWER_STATUS, "compute-*")
+
+    assert [result.machine for result in results] == [
+        f"compute-{i}.example.com" for i in range(1, 7)
+    ]
+    assert all(result.success for result in results)
+    # Workers are in dry run mode, BMC details come from their machine config
+    assert "-H 192.168.200.1" in results[0].output
+    assert az1_requests == [
+        ("POWER_STATUS", ["compute-1.example.com", "compute-4.example.com"], {})
+    ]
+    assert other_requests[0][1] == [
+        "compute-2.example.com",
+        "compute-3.example.com",
+        "compute-5.example.com",
+        "compute-6.example.com",
+    ]
+
+
+def test_execute_distributed_options(start_worker):
+    address, requests = start_worker()
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml", workers={"*": address}
+    )
+
+    results = coordinator.execute(
+        Command.BOOTDEV_PXE,
+        "compute-1*",
+        {"persistent": True, "efiboot": False},
+    )
+
+    assert results[0].success
+    assert "options=persistent" in results[0].output
+    assert requests[0][2] == {"persistent": True, "efiboot": False}
+
+
+def test_execute_distributed_no_worker():
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml",
+        workers={"AZ9": ("127.0.0.1", free_port())},
+        shard_by="zone",
+    )
+
+    result = coordinator.execute(Command.POWER_STATUS, "compute-1*")[0]
+
+    assert not result.success
+    assert result.output == "No worker serves machines with zone=AZ1"
+
+
+def test_execute_distributed_worker_unreachable():
+    port = free_port()
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml",
+        workers={"*": ("127.0.0.1", port)},
+    )
+
+    results = coordinator.execute(Command.POWER_STATUS, "compute-*")
+
+    assert len(results) == 6
+    assert not any(result.success for result in results)
+    assert results[0].output.startswith(f"Worker 127.0.0.1:{port} failed: ")
+
+
+def test_execute_distributed_invalid_token(start_worker):
+    address, requests = start_worker(token="secret")
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml",
+        workers={"*": address},
+        worker_token="wrong",
+    )
+
+    result = coordinator.execute(Command.POWER_STATUS, "compute-1*")[0]
+
+    assert not result.success
+    assert result.output.endswith("failed: Invalid token")
+    assert requests == []
+
+
+def test_execute_distributed_unknown_machine(start_worker, tmp_path):
+    machine_config = tmp_path / "nodes.yaml"
+    machine_config.write_text(
+        "compute-2.example.com:\n"
+        "  bmc_address: 192.168.200.2\n"
+        "  bmc_user: root\n"
+        "  bmc_password: secret\n"
+    )
+    address, _ = start_worker(machine_config=str(machine_config))
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml", workers={"*": address}
+    )
+
+    result = coordinator.execute(Command.POWER_STATUS, "compute-1*")[0]
+
+    assert not result.success
+    assert result.output == "Machine not found in worker's machine config"
+
+
+def test_execute_distributed_dry_run():
+    coordinator = Application(
+        machine_config="tests/config/nodes.yaml",
+        workers={"*": ("mgmt-dc1", 9000)},
+        dry_run=True,
+    )
+
+    result = coordinator.execute(Command.POWER_ON, "compute-1*")[0]
+
+    assert result.success
+    assert result.output == "Send POWER_ON to worker mgmt-dc1:9000"
+
+
+@pytest.mark.parametrize(
+    "request_, error",
+    [
+        ({"version": 2}, "Unsupported protocol version 2"),
+        ({"version": 1, "token": "x"}, "Invalid token"),
+        ({"version": 1, "command": "CONSOLE"}, "Unsupported command CONSOLE"),
+        ({"version": 1, "command": "POWER_ON", "machines": "a"}, "Invalid machines"),
+        (
+            {
+                "version": 1,
+                "command": "BOOTDEV_PXE",
+                "machines": ["a"],
+                "options": {"bmc_address": "10.0.0.1"},
+            },
+            "Invalid options",
+        ),
+        ({"version": 1, "command": "POWER_ON", "machines": ["a"]}, ""),
+    ],
+)
+def test_worker_check_request(request_, error):
+    server = Application().create_worker("127.0.0.1", 0)
+
+    with server:
+        assert server.check_request(request_) == error
+
+
+def test_run_worker_requires_token_on_network_address():
+    application = Application(machine_config="tests/config/nodes.yaml")
+
+    assert application.run_worker("0.0.0.0", free_port()) == 1
+
+
+def test_run_worker_refuses_to_forward():
+    application = Application(
+        machine_config="tests/config/nodes.yaml", workers={"*": ("mgmt", 9000)}
+    )
+
+    assert application.run_worker("127.0.0.1", free_port()) == 1
+
+
+@pytest.fixture
+def fake_worker():
+    servers = []
+
+    def start(replies, stall=False):
+        server = socket.create_server(("127.0.0.1", 0))
+        servers.append(server)
+
+        def serve():
+            connection, _ = server.accept()
+            with connection:
+                connection.makefile("rb").readline()
+                for reply in replies:
+                    connection.sendall(reply.encode() + b"\n")
+                if stall:
+                    connection.recv(1)
+
+        threading.Thread(target=serve, daemon=True).start()
+        return server.getsockname()
+
+    yield start
+
+    for server in servers:
+        server.close()
+
+
+def test_execute_distributed_missing_results(fake_worker):
+    address = fake_worker(
+        [
+            '{"m":"compute-1.example.com","ok":1,"out":"Chassis Power is on"}',
+            '{"m":"compute-1.example.com","ok":1,"out":"Chassis Power is on"}',
+            '{"m":"other.example.com","ok":1}',
+            '{"done":1}',
+        ]
+    )
+    coordinator = cluster.Coordinator({"*": address}, "zone")
+    machines = ["compute-1.example.com", "compute-2.example.com"]
+    inventory = {machine: {} for machine in machines}
+
+    results = sorted(coordinator.execute("POWER_STATUS", machines, inventory))
+
+    host, port = address
+    assert results == [
+        ("compute-1.example.com", True, "Chassis Power is on"),
+        ("compute-2.example.com", False, f"Worker {host}:{port} sent no result"),
+    ]
+
+
+def test_execute_distributed_stalled_worker(fake_worker):
+    address = fake_worker(
+        ['{"m":"compute-1.example.com","ok":1,"out":"Chassis Power is on"}'],
+        stall=True,
+    )
+    coordinator = cluster.Coordinator({"*": address}, "zone")
+    coordinator.read_timeout = 0.2
+    machines = ["compute-1.example.com", "compute-2.example.com"]
+    inventory = {machine: {} for machine in machines}
+
+    results = sorted(coordinator.execute("POWER_STATUS", machines, inventory))
+
+    assert results[0] == ("compute-1.example.com", True, "Chassis Power is on")
+    assert results[1][0] == "compute-2.example.com"
+    assert not results[1][1]
+    assert "timed out" in results[1][2]
+
+
+def test_coordinator_read_timeout():
+    coordinator = cluster.Coordinator({}, "zone", command_timeout=60)
+
+    assert coordinator.read_timeout == 60 + cluster.READ_TIMEOUT_MARGIN
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+import concurrency
+
+
+@pytest.mark.parametrize(
+    "address, expected",
+    [
+        ("192.168.200.17", "192.168.200.0/24"),
+        ("fd00::1:2", "fd00::/64"),
+        ("bmc-1.example.com", "bmc-1.example.com"),
+    ],
+)
+def test_subnet(address, expected):
+    assert concurrency.subnet(address) == expected
+
+
+def test_limit_increases_while_latency_is_flat():
+    controller = concurrency.Controller(16)
+    assert controller.current == concurrency.INITIAL_LIMIT
+
+    for _ in range(4 + 5 + 6):
+        controller.record(0.3, True)
+
+    assert controller.current == 7
+
+
+def test_limit_capped_by_maximum():
+    controller = concurrency.Controller(6)
+
+    for _ in range(100):
+        controller.record(0.3, True)
+
+    assert controller.current == 6
+
+
+@pytest.mark.parametrize("latency, success", [(0.3, False), (1.0, True)])
+def test_limit_backs_off_once_per_window(latency, success):
+    controller = concurrency.Controller(64, initial_limit=16)
+    controller.record(0.3, True)
+
+    # A burst of failures or latency spikes of commands started under the
+    # previous limit cuts the limit once
+    for _ in range(16):
+        controller.record(latency, success)
+    assert controller.current == 8
+
+    for _ in range(8):
+        controller.record(latency, success)
+    assert controller.current == 4
+
+
+def test_limit_never_below_minimum():
+    controller = concurrency.Controller(64)
+
+    for _ in range(100):
+        controller.record(60.0, False)
+
+    assert controller.current == concurrency.MIN_LIMIT
+
+
+def test_fixed_limit_collects_timings():
+    controller = concurrency.Controller(32, adaptive=False)
+
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        controller.record(latency, True)
+    controller.record(60.0, False)
+
+    assert controller.current == 32
+    assert controller.describe() == (
+        "limit 32, 5 completed, 1 failed, "
+        "latency min 0.10s, median 0.30s, p95 60.00s, max 60.00s"
+    )
+
+
+def test_gate_limits_commands_in_flight():
+    controller = concurrency.Controller(64, initial_limit=2)
+    in_flight = []
+    peak = []
+
+    async def command(gate):
+        async with gate.slot() as slot:
+            slot.begin()
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            slot.success = True
+
+    async def run():
+        gate = concurrency.Gate(controller)
+        await asyncio.gather(*[command(gate) for _ in range(6)])
+
+    asyncio.run(run())
+
+    assert max(peak) <= 3
+    assert len(controller.latencies) == 6
+
+
+def test_parse_limits():
+    assert concurrency.parse_limits(["10.1.0.0/24=16", "zone=a=4"]) == {
+        "10.1.0.0/24": 16,
+        "zone=a": 4,
+    }
+
+
+@pytest.mark.parametrize("limit", ["10.1.0.0/24", "=4", "zone=a=0", "zone=a=x"])
+def test_parse_invalid_limits(limit):
+    with pytest.raises(ValueError, match=f"Invalid limit '{limit}'"):
+        concurrency.parse_limits([limit])
@@ -0,0 +1,79 @@
+import os
+import re
+from unittest.mock import patch
+
+import pytest
+
+import config
+
+CONFIG = """
+machine-config-path: ~/nodes.yaml
+parallel: 64
+limits:
+  10.1.0.0/24: 16
+profiles:
+  dc1:
+    parallel: 256
+    workers:
+      dc1: mgmt-dc1:8623
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config"
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def test_load(config_path, tmp_path):
+    assert config.load(config_path, cache_dir=str(tmp_path / "cache")) == {
+        "machine_config": os.path.expanduser("~/nodes.yaml"),
+        "parallel": 64,
+        "limits": ["10.1.0.0/24=16"],
+    }
+
+
+def test_load_profile(config_path, tmp_path):
+    defaults = config.load(config_path, "dc1", cache_dir=str(tmp_path / "cache"))
+
+    assert defaults["parallel"] == 256
+    assert defaults["workers"] == ["dc1=mgmt-dc1:8623"]
+    assert defaults["limits"] == ["10.1.0.0/24=16"]
+
+
+def test_load_cached(config_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    expected = config.load(config_path, cache_dir=cache_dir)
+
+    with patch("config.parse") as parse:
+        assert config.load(config_path, cache_dir=cache_dir) == expected
+
+    parse.assert_not_called()
+
+
+def test_load_missing(tmp_path):
+    path = str(tmp_path / "config")
+
+    assert config.load(path, cache_dir=str(tmp_path / "cache")) == {}
+
+    with pytest.raises(config.ConfigError, match="Cannot read config file"):
+        config.load(path, required=True, cache_dir=str(tmp_path / "cache"))
+
+
+@pytest.mark.parametrize(
+    "content, profile, error",
+    [
+        ("parallel: 4\nretries: 2\n", None, "Unknown key(s) in"),
+        ("- parallel\n", None, "must be a mapping"),
+        ("profiles: [dc1]\n", None, "'profiles' of"),
+        ("profiles:\n  dc1: 4\n", None, "profile 'dc1' of"),
+        ("parallel: 4\n", "dc2", "Profile 'dc2' not found"),
+    ],
+)
+def test_load_invalid(tmp_path, content, profile, error):
+    path = tmp_path / "config"
+    path.write_text(content)
+
+    with pytest.raises(config.ConfigError, match=re.escape(error)):
+        config.load(str(path), profile, cache_dir=str(tmp_path / "cache"))
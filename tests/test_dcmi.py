@@ -0,0 +1,166 @@
+import json
+
+import pytest
+
+import concurrency
+import dcmi
+
+READING = """
+    Instantaneous power reading:                   {} Watts
+    Minimum during sampling period:                 40 Watts
+    Maximum during sampling period:                508 Watts
+    Average power reading over sample period:      210 Watts
+    Power reading state is:                   activated
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def reading(watts):
+    return True, READING.format(watts)
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        (READING.format(220), 220),
+        ("Error: Unable to establish session", None),
+        (None, None),
+    ],
+)
+def test_parse_power_reading(output, expected):
+    assert dcmi.parse_power_reading(output) == expected
+
+
+@pytest.mark.parametrize(
+    "machine, key, expected",
+    [
+        ({"zone": "AZ1"}, "zone", ["zone=AZ1"]),
+        ({"tags": ["gpu", "compute"]}, "tags", ["tags=gpu", "tags=compute"]),
+        ({}, "zone", []),
+    ],
+)
+def test_get_groups(machine, key, expected):
+    assert dcmi.get_groups(machine, key) == expected
+
+
+def test_aggregate_percentile_matches_sorted_readings():
+    readings = [300, 120, 120, 250, 310, 90, 120, 400, 250, 180] * 7
+    aggregate = dcmi.Aggregate()
+    for watts in readings:
+        aggregate.add(watts)
+
+    for fraction in (0, 0.5, 0.95, 1):
+        assert aggregate.percentile(fraction) == concurrency.percentile(
+            sorted(readings), fraction
+        )
+    assert aggregate.total == sum(readings)
+    assert aggregate.max == 400
+    # Only the counts of distinct readings are kept
+    assert len(aggregate.counts) == 7
+
+
+def test_sampler_round():
+    sampler = dcmi.Sampler(
+        {"a": ["zone=AZ1"], "b": ["zone=AZ1"], "c": ["zone=AZ2"]},
+        wall_clock=lambda: 1700000000.0,
+    )
+
+    sampler.start_round()
+    sampler.add("a", *reading(200))
+    sampler.add("b", *reading(300))
+    sampler.add("c", False, "Error: Unable to establish session")
+
+    assert sampler.end_round() == [
+        {
+            "time": 1700000000.0,
+            "round": 1,
+            "group": "all",
+            "machines": 2,
+            "failed": 1,
+            "sum": 500,
+            "max": 300,
+            "p95": 300,
+        },
+        {
+            "time": 1700000000.0,
+            "round": 1,
+            "group": "zone=AZ1",
+            "machines": 2,
+            "failed": 0,
+            "sum": 500,
+            "max": 300,
+            "p95": 300,
+        },
+        {
+            "time": 1700000000.0,
+            "round": 1,
+            "group": "zone=AZ2",
+            "machines": 0,
+            "failed": 1,
+            "sum": 0,
+            "max": None,
+            "p95": None,
+        },
+    ]
+
+
+def test_sample_rounds_and_totals():
+    clock = Clock()
+    sampler = dcmi.Sampler({"a": [], "b": []}, wall_clock=clock)
+    watts = iter([100, 200, 150, 350, 120, 180])
+    polls = []
+    lines = []
+
+    def poll():
+        polls.append(clock.now)
+        for machine in ("a", "b"):
+            clock.now += 1
+            yield (machine, *reading(next(watts)))
+
+    dcmi.sample(
+        sampler, poll, lines.append, count=3, interval=10, clock=clock, sleep=clock.sleep
+    )
+
+    records = [json.loads(line) for line in lines]
+    assert polls == [0, 10, 20]
+    assert [record["sum"] for record in records[:3]] == [300, 500, 300]
+    assert records[3] == {
+        "group": "all",
+        "rounds": 3,
+        "readings": 6,
+        "failed": 0,
+        "sum_mean": 366.7,
+        "sum_max": 500,
+        "max": 350,
+        "p95": 350,
+    }
+
+
+def test_sample_interrupted_drops_incomplete_round():
+    sampler = dcmi.Sampler({"a": []})
+    rounds = iter([[reading(100)], [reading(200)], KeyboardInterrupt])
+    lines = []
+
+    def poll():
+        results = next(rounds)
+        if results is KeyboardInterrupt:
+            raise KeyboardInterrupt
+        for result in results:
+            yield ("a", *result)
+
+    dcmi.sample(sampler, poll, lines.append, count=None, interval=0)
+
+    records = [json.loads(line) for line in lines]
+    assert [record.get("round") for record in records] == [1, 2, None]
+    assert records[-1]["rounds"] == 2
+    assert records[-1]["sum_mean"] == 150
@@ -0,0 +1,138 @@
+import fnmatch
+
+import pytest
+
+import hostlist
+
+
+@pytest.mark.parametrize(
+    "pattern, name, expected",
+    [
+        ("node-[1-64]", "node-64", True),
+        ("node-[1-64]", "node-65", False),
+        ("node-[1-64]", "node-07", False),
+        ("node-[01-64]", "node-07", True),
+        ("node-[01-64]", "node-7", False),
+        ("node-[1-3,10-12]", "node-11", True),
+        ("node-[1-3,10-12]", "node-5", False),
+        ("node-[12]", "node-1", True),
+        ("node-[12]", "node-12", False),
+        ("node-[!1]", "node-2", True),
+        ("node-?.example.*", "node-2.example.com", True),
+        ("node-[", "node-[", True),
+        ("node-[1-64]*", "node-64.example.com", True),
+    ],
+)
+def test_name_pattern(pattern, name, expected):
+    assert hostlist.NamePattern(pattern).match(name) is expected
+
+
+@pytest.mark.parametrize(
+    "pattern, name",
+    [
+        ("node[0-9]*", "node12"),
+        ("node[0-9]*", "node1"),
+        ("node[0-9]*", "nodex"),
+        ("rack[12]-*", "rack1-node1"),
+        ("rack[12]-*", "rack2-node1"),
+        ("rack[12]-*", "rack12-node1"),
+        ("rack[12]-*", "rack3-node1"),
+    ],
+)
+def test_name_pattern_glob_digit_class(pattern, name):
+    assert hostlist.NamePattern(pattern).match(name) is fnmatch.fnmatchcase(
+        name, pattern
+    )
+
+
+@pytest.mark.parametrize("pattern", ["node[1-35]", "node[1-35]*"])
+@pytest.mark.parametrize(
+    "name, expected",
+    [("node4", True), ("node35", True), ("node5", True), ("node36", False)],
+)
+def test_name_pattern_multi_digit_bound_is_range(pattern, name, expected):
+    assert hostlist.NamePattern(pattern).match(name) is expected
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [("node-[1-64]", True), ("node-[1-64]*", True), ("node[0-9]*", False)],
+)
+def test_has_ranges(pattern, expected):
+    assert hostlist.has_ranges(pattern) is expected
+
+
+def test_has_ranges_invalid():
+    with pytest.raises(hostlist.HostlistError):
+        hostlist.has_ranges("node-[10-1]")
+
+
+def test_name_pattern_prefix():
+    assert hostlist.NamePattern("rack[01-20]-node[1-40]").prefix == "rack"
+
+
+def test_parse_ranges_invalid():
+    with pytest.raises(hostlist.HostlistError):
+        hostlist.NamePattern("node-[10-1]")
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("node-[1-3]", ["node-1", "node-2", "node-3"]),
+        ("node-[08-10,12]", ["node-08", "node-09", "node-10", "node-12"]),
+        ("r[1-2]n[1-2]", ["r1n1", "r1n2", "r2n1", "r2n2"]),
+        ("node-1", ["node-1"]),
+    ],
+)
+def test_name_pattern_expand(pattern, expected):
+    pattern = hostlist.NamePattern(pattern)
+
+    assert pattern.expandable
+    assert pattern.size() == len(expected)
+    assert list(pattern.expand()) == expected
+
+
+@pytest.mark.parametrize("pattern", ["node-*", "node-[1-3]?", "node-[ab]"])
+def test_name_pattern_not_expandable(pattern):
+    with pytest.raises(hostlist.HostlistError):
+        list(hostlist.NamePattern(pattern).expand())
+
+
+@pytest.mark.parametrize(
+    "names, expected",
+    [
+        ([], []),
+        (["node-1"], ["node-1"]),
+        (
+            [f"compute-{i}" for i in [*range(1, 38), *range(40, 501)]],
+            ["compute-[1-37,40-500]"],
+        ),
+        (
+            ["compute-1.dc", "compute-2.dc", "compute-4.dc", "network-1.dc"],
+            ["compute-[1-2,4].dc", "network-1.dc"],
+        ),
+        ([f"rack{i:02}" for i in range(1, 21)] + ["rack5"], ["rack5", "rack[01-20]"]),
+        (
+            ["rack01-node1", "rack01-node2", "rack02-node1"],
+            ["rack01-node[1-2]", "rack02-node1"],
+        ),
+        (["gateway", "node-2", "node-1", "node-1"], ["gateway", "node-[1-2]"]),
+    ],
+)
+def test_compress(names, expected):
+    assert hostlist.compress(names) == expected
+
+
+def test_compress_round_trip():
+    names = {f"rack{r:02}-node{n}" for r in range(1, 4) for n in range(1, 41, 3)}
+    expanded = set()
+
+    for expression in hostlist.compress(names):
+        expanded.update(hostlist.NamePattern(expression).expand())
+
+    assert expanded == names
+
+
+def test_format_names():
+    assert hostlist.format_names(["b", "a-2", "a-1"]) == "a-[1-2],b"
@@ -0,0 +1,138 @@
+import copy
+import datetime
+import pickle
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+
+import yaml
+
+import inventory
+from inventory import MachineRecord
+
+MACHINE = {
+    "bmc_user": "root",
+    "bmc_password": "p4ssw0rd!",
+    "power_type": "ipmi",
+    "bmc_address": "192.168.200.1",
+    "bmc_power_boot_type": "efi",
+    "zone": "AZ1",
+    "tags": ["gpu", "compute"],
+}
+
+
+def make_machine(index: int) -> dict:
+    # Build strings at runtime, as the YAML parser does, so that equal values
+    # are separate objects unless interned
+    return {
+        "bmc_user": "".join(["ro", "ot"]),
+        "bmc_password": "".join(["p4ss", "w0rd!"]),
+        "power_type": "".join(["ip", "mi"]),
+        "bmc_address": f"10.{index // 65536}.{index // 256 % 256}.{index % 256}",
+        "bmc_power_boot_type": "".join(["ef", "i"]),
+        "zone": f"AZ{index % 3}",
+        "tags": ["".join(["gp", "u"]), "".join(["comp", "ute"]), f"rack-{index // 40}"],
+    }
+
+
+def measure(factory, count: int) -> int:
+    tracemalloc.start()
+    try:
+        objects = [factory(make_machine(index)) for index in range(count)]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(objects) == count
+    return size
+
+
+def test_machine_record_mapping():
+    record = MachineRecord(MACHINE)
+
+    assert record == MACHINE
+    assert dict(record) == MACHINE
+    assert record["bmc_address"] == "192.168.200.1"
+    assert record["power_type"] == "ipmi"
+    assert "console" not in record
+    with pytest.raises(KeyError):
+        record["console"]
+
+
+def test_machine_record_missing_fields():
+    record = MachineRecord({"bmc_address": "192.168.200.1"})
+
+    assert dict(record) == {"bmc_address": "192.168.200.1"}
+    assert "zone" not in record
+    assert len(record) == 1
+
+
+def test_machine_record_has_no_dict():
+    record = MachineRecord(MACHINE)
+
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.zone = "AZ2"
+
+
+def test_machine_record_interns_strings():
+    first = MachineRecord(make_machine(1))
+    second = MachineRecord(make_machine(2))
+
+    assert first.bmc_user is second.bmc_user
+    assert first.tags[0] is second.tags[0]
+
+
+def test_machine_record_pickle_and_copy():
+    machine = dict(MACHINE, installed=datetime.date(2024, 1, 31))
+    record = MachineRecord(machine)
+
+    assert pickle.loads(pickle.dumps(record)) == machine
+    assert copy.deepcopy(record) == machine
+
+
+def test_machine_record_inventory_match():
+    machines = inventory.DictInventory(
+        {f"node-{i}": MachineRecord(make_machine(i)) for i in range(6)}
+    )
+
+    assert machines.match("node-*", {"zone": "AZ1"}) == ["node-1", "node-4"]
+    assert machines.match("*", {"tags": "gpu", "power_type": "ipmi"}) == sorted(
+        machines
+    )
+
+
+def test_machine_record_memory_benchmark():
+    count = 5000
+    dict_size = measure(dict, count)
+    record_size = measure(MachineRecord, count)
+
+    assert record_size / dict_size < 0.6
+
+
+def test_load_files_in_spawned_processes(tmp_path):
+    paths = []
+    for index in range(inventory.MIN_FILES_FOR_PROCESS_POOL):
+        path = tmp_path / f"rack-{index}.yaml"
+        path.write_text(yaml.dump({f"node-{index}": MACHINE}))
+        paths.append(str(path))
+    (tmp_path / "broken.yaml").write_text("node: [")
+    paths.append(str(tmp_path / "broken.yaml"))
+
+    with patch(
+        "inventory.ProcessPoolExecutor", wraps=inventory.ProcessPoolExecutor
+    ) as executor:
+        results = list(inventory.load_files(paths))
+
+    assert executor.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+    assert [path for path, _, _ in results] == paths
+    assert [machines[0][0] for _, machines, _ in results[:-1]] == [
+        f"node-{index}" for index in range(inventory.MIN_FILES_FOR_PROCESS_POOL)
+    ]
+    assert all(
+        isinstance(machine, MachineRecord)
+        for _, machines, _ in results[:-1]
+        for _, machine in machines
+    )
+    assert isinstance(results[-1][2], yaml.YAMLError)
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import journal
+
+
+def test_journal_records_results(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    with journal.Journal(path, "POWER_CYCLE") as results_journal:
+        results_journal.record("compute-1", True, "Chassis Power Control: Cycle")
+        results_journal.record("compute-2", False, "Error: Unable to establish")
+
+    with open(path) as file:
+        records = [json.loads(line) for line in file]
+
+    assert records[0]["command"] == "POWER_CYCLE"
+    assert records[1:] == [
+        {"m": "compute-1", "ok": 1},
+        {"m": "compute-2", "ok": 0, "out": "Error: Unable to establish"},
+    ]
+
+
+def test_journal_fsyncs_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, "FSYNC_BATCH_SIZE", 3)
+    monkeypatch.setattr(journal, "FSYNC_INTERVAL", 3600)
+    results_journal = journal.Journal(str(tmp_path / "journal.jsonl"), "POWER_ON")
+
+    for index in range(7):
+        results_journal.record(f"compute-{index}", True)
+
+    assert results_journal.pending == 1
+    results_journal.close()
+    assert results_journal.pending == 0
+
+
+def test_read_succeeded_last_outcome_wins(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    with journal.Journal(path, "POWER_ON") as results_journal:
+        results_journal.record("compute-1", True)
+        results_journal.record("compute-2", False, "error")
+        results_journal.record("compute-3", True)
+
+    # Resumed run
+    with journal.Journal(path, "POWER_ON") as results_journal:
+        results_journal.record("compute-2", True)
+        results_journal.record("compute-3", False, "error")
+
+    assert journal.read_succeeded(path, "POWER_ON") == {"compute-1", "compute-2"}
+
+
+def test_read_succeeded_ignores_truncated_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(
+        '{"command":"POWER_ON","options":{},"time":0}\n'
+        '{"m":"compute-1","ok":1}\n'
+        '{"m":"compute-2","o'
+    )
+    assert journal.read_succeeded(str(path), "POWER_ON") == {"compute-1"}
+
+
+def test_read_succeeded_ignores_malformed_records(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(
+        '{"command":"POWER_ON","options":{},"time":0}\n'
+        '{"m":"compute-1","ok":1}\n'
+        '{"ok":1}\n'
+        '["compute-2"]\n'
+        "3\n"
+        '{"m":["compute-3"],"ok":1}\n'
+    )
+    assert journal.read_succeeded(str(path), "POWER_ON") == {"compute-1"}
+
+
+@pytest.mark.parametrize(
+    "command, options",
+    [("POWER_OFF", None), ("BOOTDEV_PXE", {"persistent": False})],
+)
+def test_read_succeeded_different_command(tmp_path, command, options):
+    path = str(tmp_path / "journal.jsonl")
+    journal.Journal(path, "BOOTDEV_PXE", {"persistent": True}).close()
+
+    with pytest.raises(journal.JournalError):
+        journal.read_succeeded(path, command, options)
+
+
+def test_read_succeeded_journal_not_found(tmp_path):
+    with pytest.raises(journal.JournalError):
+        journal.read_succeeded(str(tmp_path / "journal.jsonl"), "POWER_ON")
@@ -0,0 +1,87 @@
+import gzip
+import logging
+import logging.handlers
+
+import logs
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_configure_is_idempotent():
+    for _ in range(3):
+        logger = logs.configure("test-logs", no_color=True)
+
+    assert len(logger.handlers) == 1
+    assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+    logs.shutdown()
+
+
+def test_configure_debug_level():
+    assert logs.configure("test-logs", debug=True).level == logging.DEBUG
+    assert logs.configure("test-logs").level == logging.INFO
+    logs.shutdown()
+
+
+def test_log_file_is_compressed(tmp_path):
+    log_file = str(tmp_path / "run.log.gz")
+
+    # Two runs are appended to the same file
+    for run in range(2):
+        logger = logs.configure("test-logs", no_color=True, log_file=log_file)
+        logger.info(f"run {run}: Chassis Power is on")
+        logger.debug("not logged")
+        logs.flush()
+    logs.shutdown()
+
+    with gzip.open(log_file, "rt") as file:
+        lines = file.read().splitlines()
+
+    assert len(lines) == 2
+    assert lines[0].endswith("INFO: run 0: Chassis Power is on")
+    assert lines[1].endswith("INFO: run 1: Chassis Power is on")
+
+
+def test_flush_writes_queued_records(capsys):
+    logger = logs.configure("test-logs", no_color=True)
+    logger.warning("queued")
+    logs.flush()
+
+    assert capsys.readouterr().err == "WARNING: queued\n"
+    logs.shutdown()
+
+
+def test_log_file_is_flushed_on_interval(tmp_path):
+    clock = FakeClock()
+    handler = logs.GzipFileHandler(str(tmp_path / "run.log.gz"), clock=clock)
+    handler.setFormatter(logging.Formatter(fmt="%(message)s"))
+    flushes = []
+    handler.stream.flush = lambda: flushes.append(clock.now)
+
+    for index in range(10):
+        handler.handle(logging.makeLogRecord({"msg": f"record {index}"}))
+    clock.now = logs.FLUSH_INTERVAL
+    handler.handle(logging.makeLogRecord({"msg": "record 10"}))
+
+    assert flushes == [logs.FLUSH_INTERVAL]
+    handler.close()
+
+
+def test_configure_again_replaces_log_file(tmp_path):
+    first, second = str(tmp_path / "first.log.gz"), str(tmp_path / "second.log.gz")
+
+    logger = logs.configure("test-logs", no_color=True, log_file=first)
+    logger.info("first")
+    logger = logs.configure("test-logs", no_color=True, log_file=second)
+    logger.info("second")
+    logs.shutdown()
+
+    with gzip.open(first, "rt") as file:
+        assert file.read().endswith("INFO: first\n")
+    with gzip.open(second, "rt") as file:
+        assert file.read().endswith("INFO: second\n")
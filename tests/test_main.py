@@ -1,9 +1,11 @@
+import json
 from unittest.mock import patch, mock_open
 
 import pytest
 
 import messages
 import main
+import utils
 
 
 @pytest.mark.parametrize("option", ["-V", "--version"])
@@ -116,7 +118,9 @@ def test_power_bmc_password_from_file(cli_runner):
 
     mo.side_effect = [mo1.return_value, mo2.return_value]
 
-    with patch("builtins.open", mo):
+    build = patch("utils.Template.build", wraps=utils.Template.build)
+
+    with patch("builtins.open", mo), build as build:
         result = cli_runner.invoke(
             main.cli,
             [
@@ -132,9 +136,10 @@ def test_power_bmc_password_from_file(cli_runner):
             result.output == "INFO: test-machine-1: ipmitool -e & -I lanplus "
             "-H 10.10.10.10 "
             "-U user "
-            "-P password-from-file "
+            "-E "
             "chassis power status\n"
         )
+        assert build.call_args[0][1] == "password-from-file"
 
 
 def test_power_bmc_password_from_file_error(cli_runner):
@@ -195,8 +200,7 @@ def test_power_status_implicit(cli_runner, fake_process):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -227,8 +231,7 @@ def test_power_no_machines(cli_runner, fake_process):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -263,8 +266,7 @@ def test_power_single_machine(cli_runner, fake_process):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -300,8 +302,7 @@ def test_power_commands_single_machine(cli_runner, fake_process, command):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             command,
@@ -337,8 +338,7 @@ def test_bootdev_commands_single_machine(cli_runner, fake_process, command):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "bootdev",
             command,
@@ -374,8 +374,7 @@ def test_bootdev_bios_single_machine(cli_runner, fake_process, command):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "bootdev",
             command,
@@ -410,8 +409,7 @@ def test_console_single_machine(cli_runner, fake_process):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "sol",
             "activate",
         ] in fake_process.calls, str(fake_process.calls)
@@ -451,8 +449,7 @@ test-machine-2:
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -467,8 +464,7 @@ test-machine-2:
             "10.10.10.20",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -512,8 +508,7 @@ test-machine-3:
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -528,8 +523,7 @@ test-machine-3:
             "10.10.10.20",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -574,8 +568,7 @@ test-machine-3:
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -590,8 +583,7 @@ test-machine-3:
             "10.10.10.20",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -626,8 +618,7 @@ def test_power_single_machine_short_name(cli_runner, fake_process):
             "10.10.10.10",
             "-U",
             "user",
-            "-P",
-            "password",
+            "-E",
             "chassis",
             "power",
             "status",
@@ -845,7 +836,7 @@ def test_power_status_dry_run(cli_runner):
     assert (
         result.output
         == "INFO: compute-1.example.com: ipmitool -e & -I lanplus -H 192.168.200.1 "
-        "-U root -P p4ssw0rd! chassis power status\n"
+        "-U root -E chassis power status\n"
     )
 
 
@@ -855,3 +846,829 @@ def test_init():
         with patch.object(main, "__name__", "__main__"):
             main.init()
             assert main.cli.called
+
+
+def test_power_status_parallel(cli_runner, fake_process):
+    machines_config_yaml = """test-machine-1:
+  bmc_user: user
+  bmc_password: password
+  bmc_address: 10.10.10.10
+test-machine-2:
+  bmc_user: user
+  bmc_password: password
+  bmc_address: 10.10.10.20
+    """
+    fake_process.register_subprocess(
+        ["ipmitool", fake_process.any()], stdout="Chassis Power is on"
+    )
+    fake_process.register_subprocess(
+        ["ipmitool", fake_process.any()], stdout="Chassis Power is on"
+    )
+
+    with patch("builtins.open", mock_open(read_data=machines_config_yaml)):
+        result = cli_runner.invoke(
+            main.cli,
+            ["--no-color", "--parallel", "2", "power", "status", "test-machine-*"],
+        )
+        assert result.exit_code == 0
+        assert sorted(result.output.splitlines()) == [
+            "INFO: test-machine-1: Chassis Power is on",
+            "INFO: test-machine-2: Chassis Power is on",
+        ]
+
+
+@pytest.mark.parametrize("parallel", ["1", "4"])
+def test_power_status_async_backend_dry_run(cli_runner, parallel):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "--backend",
+            "ipmitool-async",
+            "--parallel",
+            parallel,
+            "-f",
+            "tests/config/nodes.yaml",
+            "power",
+            "status",
+            "compute-*",
+        ],
+    )
+    assert result.exit_code == 0
+    assert sorted(result.output.splitlines()) == [
+        f"INFO: compute-{i}.example.com: ipmitool -e & -I lanplus "
+        f"-H 192.168.200.{i} -U root -E chassis power status"
+        for i in range(1, 7)
+    ]
+
+
+IPMITOOL_BASE_COMMAND = [
+    "ipmitool",
+    "-e",
+    "&",
+    "-I",
+    "lanplus",
+    "-H",
+    "10.10.10.10",
+    "-U",
+    "user",
+    "-E",
+]
+
+BOOTPARAM_OUTPUT = "Boot parameter version: 1\nBoot parameter data: {}\n"
+
+
+def test_bootdev_pxe_verify_retries_ignored_setting(cli_runner, fake_process):
+    machines_config_yaml = """test-machine-1:
+  bmc_user: user
+  bmc_password: password
+  bmc_address: 10.10.10.10
+    """
+    set_command = IPMITOOL_BASE_COMMAND + [
+        "chassis",
+        "bootdev",
+        "pxe",
+        "options=persistent",
+    ]
+    get_command = IPMITOOL_BASE_COMMAND + ["chassis", "bootparam", "get", "5"]
+
+    fake_process.register_subprocess(set_command, stdout="Set Boot Device to pxe")
+    fake_process.register_subprocess(
+        get_command, stdout=BOOTPARAM_OUTPUT.format("0008000000")
+    )
+    fake_process.register_subprocess(set_command, stdout="Set Boot Device to pxe")
+    fake_process.register_subprocess(
+        get_command, stdout=BOOTPARAM_OUTPUT.format("c004000000")
+    )
+
+    with patch("builtins.open", mock_open(read_data=machines_config_yaml)):
+        result = cli_runner.invoke(
+            main.cli,
+            [
+                "--no-color",
+                "bootdev",
+                "pxe",
+                "--persistent",
+                "--verify",
+                "test-machine-1",
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        assert fake_process.call_count(set_command) == 2
+        assert "Retrying 1 machine(s)" in result.output
+        assert (
+            "test-machine-1: Set Boot Device to pxe\n"
+            "Boot device set to pxe (verified)" in result.output
+        )
+
+
+def test_bootdev_pxe_verify_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "bootdev",
+            "pxe",
+            "--verify",
+            "compute-1",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output == (
+        "INFO: compute-1.example.com: ipmitool -e & -I lanplus "
+        "-H 192.168.200.1 -U root -E chassis bootdev pxe\n"
+        "ipmitool -e & -I lanplus -H 192.168.200.1 -U root -E "
+        "chassis bootparam get 5\n"
+    )
+
+
+def test_bootdev_bios_verify_fails(cli_runner, fake_process):
+    machines_config_yaml = """test-machine-1:
+  bmc_user: user
+  bmc_password: password
+  bmc_address: 10.10.10.10
+    """
+    set_command = IPMITOOL_BASE_COMMAND + [
+        "chassis",
+        "bootdev",
+        "bios",
+        "options=efiboot",
+    ]
+    get_command = IPMITOOL_BASE_COMMAND + ["chassis", "bootparam", "get", "5"]
+
+    fake_process.register_subprocess(set_command, occurrences=3)
+    fake_process.register_subprocess(
+        get_command, stdout=BOOTPARAM_OUTPUT.format("8018000000"), occurrences=3
+    )
+
+    with patch("builtins.open", mock_open(read_data=machines_config_yaml)):
+        result = cli_runner.invoke(
+            main.cli,
+            ["--no-color", "bootdev", "bios", "--verify", "test-machine-1"],
+        )
+        assert result.exit_code == 1
+        assert fake_process.call_count(set_command) == 3
+        assert (
+            "test-machine-1: Boot device not set: expected EFI boot, found legacy boot"
+            in result.output
+        )
+
+
+def test_power_status_resume(cli_runner, tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    journal_path.write_text(
+        '{"command":"POWER_STATUS","options":{},"time":0}\n'
+        '{"m":"compute-1.example.com","ok":1}\n'
+        '{"m":"compute-2.example.com","ok":0,"out":"error"}\n'
+    )
+
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "--resume",
+            str(journal_path),
+            "power",
+            "status",
+            "compute-[123]*",
+        ],
+    )
+    assert result.exit_code == 0
+    assert "Skipping 1 machine(s)" in result.output
+    assert "compute-1.example.com:" not in result.output
+    assert "compute-2.example.com:" in result.output
+    assert "compute-3.example.com:" in result.output
+
+    # Results of the resumed run are appended to the journal
+    assert journal_path.read_text().count('"ok":1') == 3
+
+
+def test_power_status_resume_different_command(cli_runner, tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    journal_path.write_text('{"command":"POWER_CYCLE","options":{},"time":0}\n')
+
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "-f",
+            "tests/config/nodes.yaml",
+            "--resume",
+            str(journal_path),
+            "power",
+            "status",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "cannot resume command POWER_STATUS" in result.output
+
+
+def test_power_status_journal_cannot_be_opened(cli_runner, tmp_path):
+    journal_path = tmp_path / "missing" / "journal.jsonl"
+
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "-f",
+            "tests/config/nodes.yaml",
+            "--journal",
+            str(journal_path),
+            "power",
+            "status",
+        ],
+    )
+    assert result.exit_code == 1
+    assert f"Cannot open journal '{journal_path}'" in result.output
+
+
+def test_console_capture_dry_run(cli_runner, tmp_path):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "console",
+            "capture",
+            "--until",
+            "sol activate",
+            "--output-dir",
+            str(tmp_path),
+            "compute-[12]*",
+            "network-*",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "compute-1.example.com: Pattern found: 'sol activate'" in result.output
+    assert "network-1.example.com: Pattern found: 'sol activate'" in result.output
+    assert len(list(tmp_path.glob("*.log.gz"))) == 3
+
+
+def test_console_capture_invalid_regex(cli_runner):
+    result = cli_runner.invoke(
+        main.cli, ["console", "capture", "--until", "login:(", "compute-*"]
+    )
+    assert result.exit_code == 2
+    assert "Invalid value for '--until'" in result.output
+
+
+@pytest.mark.parametrize("option", ["-h", "--help"])
+def test_console_help(cli_runner, option):
+    result = cli_runner.invoke(main.cli, ["console", option])
+    assert result.exit_code == 0
+    # Strip all whitespace before comparing strings because click rewraps test
+    assert "".join(messages.CONSOLE_LONG_HELP.split()) in "".join(result.output.split())
+
+
+def test_power_status_include_exclude_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "power",
+            "status",
+            "--include",
+            "compute-[1-4]*",
+            "--exclude",
+            "zone=AZ1",
+        ],
+    )
+    assert result.exit_code == 0
+    assert [line.split(":")[1] for line in result.output.splitlines()] == [
+        " compute-2.example.com",
+        " compute-3.example.com",
+    ]
+
+
+def test_select(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "select",
+            "*,zone=AZ1,!tags=gpu",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output == (
+        "INFO: control-storage-1.example.com\nINFO: network-1.example.com\n"
+    )
+
+
+def test_select_explain(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "select",
+            "--explain",
+            "compute-[1-4]*",
+            "--exclude",
+            "zone=AZ1",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output == (
+        "INFO: Include 'compute-[1-4]*':\n"
+        "INFO:   name scan prefix 'compute-' =compute-[1-4]*: 6 names examined\n"
+        "INFO:   matched 4 machines\n"
+        "INFO: Exclude 'zone=AZ1':\n"
+        "INFO:   index lookup zone=AZ1: 4 names examined\n"
+        "INFO:   matched 4 machines\n"
+        "INFO: compute-2.example.com\n"
+        "INFO: compute-3.example.com\n"
+        "INFO: Selected 2 of 10 machines, cost: 10 names examined\n"
+    )
+
+
+def test_select_invalid_query(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        ["--no-color", "-f", "tests/config/nodes.yaml", "select", "zone="],
+    )
+    assert result.exit_code == 1
+    assert "ERROR: Invalid query term 'zone='" in result.output
+
+
+@pytest.mark.parametrize("option", ["-h", "--help"])
+def test_select_help(cli_runner, option):
+    result = cli_runner.invoke(main.cli, ["select", option])
+    assert result.exit_code == 0
+    assert "".join(messages.SELECT_LONG_HELP.split()) in "".join(
+        result.output.split()
+    )
+
+
+def test_power_status_hostlist_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "power",
+            "status",
+            "compute-[2-3,5].example.com",
+            "control-storage-[1-2]*",
+        ],
+    )
+    assert result.exit_code == 0
+    assert [line.split(":")[1] for line in result.output.splitlines()] == [
+        " compute-2.example.com",
+        " compute-3.example.com",
+        " compute-5.example.com",
+        " control-storage-1.example.com",
+        " control-storage-2.example.com",
+    ]
+
+
+def test_power_status_invalid_hostlist(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        ["--no-color", "-f", "tests/config/nodes.yaml", "power", "status", "compute-[3-1]"],
+    )
+    assert result.exit_code == 1
+    assert "ERROR: Invalid machine name pattern 'compute-[3-1]'" in result.output
+
+
+def test_select_compress(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        ["--no-color", "-f", "tests/config/nodes.yaml", "select", "-c", "!zone=AZ2"],
+    )
+    assert result.exit_code == 0
+    assert result.output == (
+        "INFO: compute-[1,3-4,6].example.com\n"
+        "INFO: control-storage-[1,3].example.com\n"
+        "INFO: network-1.example.com\n"
+    )
+
+
+def test_power_status_summary(cli_runner, fake_process):
+    machines_config_yaml = "".join(
+        f"test-machine-{i}:\n"
+        "  bmc_user: user\n"
+        "  bmc_password: password\n"
+        f"  bmc_address: 10.10.10.{i}\n"
+        for i in range(1, 6)
+    )
+    for i in range(1, 6):
+        command = ["ipmitool", fake_process.any()]
+        if i == 4:
+            fake_process.register_subprocess(
+                command, stderr="Error: Unable to establish session", returncode=1
+            )
+        else:
+            output = "Chassis Power is off" if i == 2 else "Chassis Power is on"
+            fake_process.register_subprocess(command, stdout=output)
+
+    with patch("builtins.open", mock_open(read_data=machines_config_yaml)):
+        result = cli_runner.invoke(
+            main.cli, ["--no-color", "--summary", "power", "status", "test-machine-*"]
+        )
+        assert result.exit_code == 1
+        assert result.output.splitlines() == [
+            "INFO: test-machine-[1,3,5] (3): Chassis Power is on",
+            "INFO: test-machine-2 (1): Chassis Power is off",
+            "ERROR: test-machine-4 (1): Error: Unable to establish session",
+            "INFO: 5 machine(s): 4 succeeded, 1 failed",
+        ]
+
+
+def test_power_status_workers_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "--shard-by",
+            "zone",
+            "--worker",
+            "AZ1=mgmt-az1:9000",
+            "--worker",
+            "*=mgmt",
+            "power",
+            "status",
+            "compute-[1-2]*",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "INFO: compute-1.example.com: Send POWER_STATUS to worker mgmt-az1:9000",
+        "INFO: compute-2.example.com: Send POWER_STATUS to worker mgmt:8623",
+    ]
+
+
+def test_invalid_worker(cli_runner):
+    result = cli_runner.invoke(main.cli, ["--worker", "mgmt:9000", "power", "status"])
+    assert result.exit_code == 2
+    assert "Invalid worker 'mgmt:9000', expected VALUE=HOST:PORT" in result.output
+
+
+@pytest.mark.parametrize("option", ["-h", "--help"])
+def test_worker_help(cli_runner, option):
+    result = cli_runner.invoke(main.cli, ["worker", option])
+    assert result.exit_code == 0
+    assert "".join(messages.WORKER_LONG_HELP.split()) in "".join(
+        result.output.split()
+    )
+
+
+def test_ping_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        ["-s", "--no-color", "-f", "tests/config/nodes.yaml", "ping", "compute-1"],
+    )
+    assert result.exit_code == 0
+    assert result.output == "INFO: compute-1.example.com: RMCP ping 192.168.200.1\n"
+
+
+def test_ping_unreachable(cli_runner):
+    with patch("rmcp.ping", return_value={"192.168.200.1": 0.0004}):
+        result = cli_runner.invoke(
+            main.cli,
+            ["--no-color", "-f", "tests/config/nodes.yaml", "ping", "compute-[1-2]*"],
+        )
+    assert result.exit_code == 1
+    assert result.output.splitlines() == [
+        "INFO: compute-1.example.com: RMCP pong from 192.168.200.1 in 0.4 ms",
+        "ERROR: compute-2.example.com: No response to RMCP ping from 192.168.200.2",
+    ]
+
+
+def test_power_watch_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "power",
+            "watch",
+            "compute-1",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output == (
+        "INFO: compute-1.example.com: ipmitool -e & -I lanplus "
+        "-H 192.168.200.1 -U root -E chassis power status\n"
+    )
+
+
+def test_power_watch(cli_runner):
+    outputs = iter(["Chassis Power is on", "Chassis Power is off"])
+
+    def execute_many(command, machines, options=None, on_start=None):
+        for machine in machines:
+            yield machine, True, next(outputs)
+
+    with patch("app.Application._execute_many", side_effect=execute_many):
+        result = cli_runner.invoke(
+            main.cli,
+            [
+                "--no-color",
+                "-f",
+                "tests/config/nodes.yaml",
+                "power",
+                "watch",
+                "--min-interval",
+                "0.1",
+                "--duration",
+                "0.15",
+                "compute-1",
+            ],
+        )
+    assert result.exit_code == 0
+    events = [json.loads(line) for line in result.output.splitlines()]
+    assert [(event["state"], event["previous"]) for event in events] == [
+        ("on", None),
+        ("off", "on"),
+    ]
+    assert events[0]["machine"] == "compute-1.example.com"
+
+
+STATE_YAML = """compute-[1-3]*:
+  power: on
+  bootdev: pxe
+compute-3*:
+  power: off
+"""
+
+
+def test_apply(cli_runner, tmp_path):
+    state_file = tmp_path / "state.yaml"
+    state_file.write_text(STATE_YAML)
+    current = {
+        ("POWER_STATUS", "compute-1.example.com"): "Chassis Power is off",
+        ("POWER_STATUS", "compute-2.example.com"): "Chassis Power is on",
+        ("POWER_STATUS", "compute-3.example.com"): "Chassis Power is off",
+        # Boot device PXE for the next boot only
+        ("BOOTPARAM_GET", "compute-1.example.com"): "Boot parameter data: 8004000000",
+        ("BOOTPARAM_GET", "compute-2.example.com"): "Boot parameter data: 8008000000",
+        ("BOOTPARAM_GET", "compute-3.example.com"): "Boot parameter data: 8004000000",
+    }
+    executed = []
+
+    def execute_many(command, machines, options=None, on_start=None):
+        for machine in machines:
+            if (command.name, machine) in current:
+                yield machine, True, current[(command.name, machine)]
+            else:
+                executed.append((command.name, machine))
+                yield machine, True, "Done"
+
+    with patch("app.Application._execute_many", side_effect=execute_many):
+        result = cli_runner.invoke(
+            main.cli,
+            ["--no-color", "-f", "tests/config/nodes.yaml", "apply", str(state_file)],
+        )
+
+    assert result.exit_code == 0
+    assert executed == [
+        ("BOOTDEV_PXE", "compute-2.example.com"),
+        ("POWER_ON", "compute-1.example.com"),
+    ]
+    assert result.output.splitlines()[:3] == [
+        "INFO: Plan: 2 change(s) on 2 machine(s), 1 of 3 machine(s) in desired state",
+        "INFO: compute-2.example.com: bootdev pxe (expected pxe, found disk)",
+        "INFO: compute-1.example.com: power off -> on",
+    ]
+
+
+def test_apply_unreadable_state(cli_runner, tmp_path):
+    state_file = tmp_path / "state.yaml"
+    state_file.write_text(STATE_YAML)
+
+    def execute_many(command, machines, options=None, on_start=None):
+        for machine in machines:
+            yield machine, command.name != "POWER_STATUS", "Error: Unable to connect"
+
+    with patch("app.Application._execute_many", side_effect=execute_many):
+        result = cli_runner.invoke(
+            main.cli,
+            ["--no-color", "-f", "tests/config/nodes.yaml", "apply", str(state_file)],
+        )
+
+    assert result.exit_code == 1
+    assert (
+        "ERROR: compute-1.example.com: Cannot read current state: "
+        "Error: Unable to connect"
+    ) in result.output.splitlines()
+
+
+def test_apply_dry_run(cli_runner, tmp_path):
+    state_file = tmp_path / "state.yaml"
+    state_file.write_text("compute-1*:\n  power: on\n")
+
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "apply",
+            str(state_file),
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "INFO: Plan: 1 change(s) on 1 machine(s), 0 of 1 machine(s) in desired state",
+        "INFO: compute-1.example.com: power unknown -> on",
+        "INFO: compute-1.example.com: ipmitool -e & -I lanplus "
+        "-H 192.168.200.1 -U root -E chassis power on",
+    ]
+
+
+@pytest.mark.parametrize(
+    "state, error",
+    [
+        ("compute-1*:\n  power: reset\n", "Invalid power state 'reset'"),
+        ("missing-*:\n  power: on\n", "No machines matching name"),
+    ],
+)
+def test_apply_invalid_state(cli_runner, tmp_path, state, error):
+    state_file = tmp_path / "state.yaml"
+    state_file.write_text(state)
+
+    result = cli_runner.invoke(
+        main.cli,
+        ["--no-color", "-f", "tests/config/nodes.yaml", "apply", str(state_file)],
+    )
+
+    assert result.exit_code == 1
+    assert error in result.output
+
+
+WORKERS_CONFIG = """
+machine-config: tests/config/nodes.yaml
+no-color: true
+shard-by: zone
+workers:
+  AZ1: mgmt-az1:9000
+  "*": mgmt
+profiles:
+  central:
+    workers:
+      "*": mgmt-central:9000
+"""
+
+
+@pytest.mark.parametrize(
+    "args, env, workers",
+    [
+        ([], {}, ["mgmt-az1:9000", "mgmt:8623"]),
+        (["--profile", "central"], {}, ["mgmt-central:9000", "mgmt-central:9000"]),
+        ([], {"FCE_IPMI_WORKER": "*=mgmt-env:9001"}, ["mgmt-env:9001"] * 2),
+        (
+            ["--worker", "*=mgmt-cli:9002"],
+            {"FCE_IPMI_WORKER": "*=mgmt-env:9001"},
+            ["mgmt-cli:9002"] * 2,
+        ),
+    ],
+)
+def test_config_precedence(cli_runner, tmp_path, args, env, workers):
+    path = tmp_path / "config"
+    path.write_text(WORKERS_CONFIG)
+
+    result = cli_runner.invoke(
+        main.cli,
+        ["--config", str(path), "-s"] + args + ["power", "status", "compute-[1-2]*"],
+        env=env,
+    )
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        f"INFO: compute-1.example.com: Send POWER_STATUS to worker {workers[0]}",
+        f"INFO: compute-2.example.com: Send POWER_STATUS to worker {workers[1]}",
+    ]
+
+
+@pytest.mark.parametrize(
+    "args, error",
+    [
+        (["--config", "tests/config/missing"], "Cannot read config file"),
+        (
+            ["--config", "tests/config/nodes.yaml"],
+            "Unknown key(s) in 'tests/config/nodes.yaml'",
+        ),
+    ],
+)
+def test_invalid_config(cli_runner, args, error):
+    result = cli_runner.invoke(main.cli, args + ["power", "status"])
+    assert result.exit_code == 2
+    assert error in result.output
+
+
+def test_invalid_limit(cli_runner):
+    result = cli_runner.invoke(main.cli, ["--limit", "10.1.0.0/24", "power", "status"])
+    assert result.exit_code == 2
+    assert "Invalid limit '10.1.0.0/24', expected GROUP=N" in result.output
+
+
+@pytest.mark.parametrize("option", ["-h", "--help"])
+def test_dcmi_power_help(cli_runner, option):
+    result = cli_runner.invoke(main.cli, ["dcmi", "power", option])
+    assert result.exit_code == 0
+    assert "".join(messages.DCMI_POWER_LONG_HELP.split()) in "".join(
+        result.output.split()
+    )
+
+
+def test_dcmi_power_dry_run(cli_runner):
+    result = cli_runner.invoke(
+        main.cli,
+        [
+            "-s",
+            "--no-color",
+            "-f",
+            "tests/config/nodes.yaml",
+            "dcmi",
+            "power",
+            "compute-1",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output == (
+        "INFO: compute-1.example.com: ipmitool -e & -I lanplus "
+        "-H 192.168.200.1 -U root -E dcmi power reading\n"
+    )
+
+
+def test_dcmi_power(cli_runner):
+    def execute_many(command, machines, options=None, on_start=None):
+        for machine in machines:
+            yield machine, True, "Instantaneous power reading:   250 Watts"
+
+    with patch("app.Application._execute_many", side_effect=execute_many):
+        result = cli_runner.invoke(
+            main.cli,
+            [
+                "--no-color",
+                "-f",
+                "tests/config/nodes.yaml",
+                "dcmi",
+                "power",
+                "--count",
+                "2",
+                "--interval",
+                "0",
+                "--group-by",
+                "tags",
+                "compute-[1-2]*",
+            ],
+        )
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [(record.get("round"), record["group"]) for record in records[:5]] == [
+        (1, "all"),
+        (1, "tags=compute"),
+        (1, "tags=compute-1"),
+        (1, "tags=compute-2"),
+        (1, "tags=gpu"),
+    ]
+    assert records[0]["sum"] == 500
+    assert len(records) == 15
+    assert records[10] == {
+        "group": "all",
+        "rounds": 2,
+        "readings": 4,
+        "failed": 0,
+        "sum_mean": 500,
+        "sum_max": 500,
+        "max": 250,
+        "p95": 250,
+    }
+
+
+@pytest.mark.parametrize(
+    "args, options",
+    [
+        (["--adaptive"], "--adaptive"),
+        (["--timings", "--limit", "10.1.0.0/24=4"], "--timings, --limit"),
+    ],
+)
+def test_async_options_require_async_backend(cli_runner, args, options):
+    result = cli_runner.invoke(main.cli, args + ["power", "status"])
+    assert result.exit_code == 2
+    assert f"{options} require(s) --backend ipmitool-async" in result.output
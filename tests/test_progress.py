@@ -0,0 +1,91 @@
+import io
+import time
+from unittest.mock import patch
+
+import pytest
+
+import logs
+import progress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_progress_render():
+    clock = FakeClock()
+    command_progress = progress.Progress(100, clock=clock)
+
+    for i in range(1, 6):
+        command_progress.start(f"node-{i}")
+    clock.now += 4
+    command_progress.start("node-6")
+    clock.now += 1
+    command_progress.finish("node-2", True)
+    command_progress.finish("node-4", False)
+
+    assert command_progress.render() == (
+        "2/100 done, 1 failed, 4 in flight, 0.4/s, ETA 4:05, "
+        "slowest: node-1 5s, node-3 5s, node-5 5s"
+    )
+
+
+def test_progress_render_truncated():
+    command_progress = progress.Progress(10, clock=FakeClock())
+
+    assert command_progress.render(width=20) == "0/10 done, 0 fail..."
+
+
+@pytest.mark.parametrize(
+    "seconds, expected", [(0, "0:00"), (65.5, "1:05"), (3725, "1:02:05")]
+)
+def test_format_duration(seconds, expected):
+    assert progress.format_duration(seconds) == expected
+
+
+def test_progress_display_refreshes_status_line():
+    stream = io.StringIO()
+    status_line = logs.StatusLine(stream)
+
+    with patch("progress.REFRESH_RATE", 100):
+        with progress.Progress(2, status_line) as command_progress:
+            command_progress.start("node-1")
+            time.sleep(0.1)
+
+    assert "0/2 done, 0 failed, 1 in flight" in stream.getvalue()
+    # The status line is removed when the progress is closed
+    assert stream.getvalue().endswith(logs.StatusLine.ERASE)
+    assert status_line.text == ""
+
+
+def test_status_line_write_above():
+    stream = io.StringIO()
+    status_line = logs.StatusLine(stream)
+    status_line.update("1/2 done")
+    status_line.write_above(lambda: stream.write("message\n"))
+
+    assert stream.getvalue() == ("\r\x1b[K1/2 done" "\r\x1b[Kmessage\n" "1/2 done")
+
+
+@pytest.mark.parametrize("no_color, isatty", [(True, True), (False, False)])
+def test_create_null_progress(no_color, isatty):
+    with patch("sys.stdout.isatty", return_value=isatty), patch(
+        "sys.stderr.isatty", return_value=isatty
+    ):
+        assert isinstance(progress.create(10, no_color), progress.NullProgress)
+
+
+def test_create_progress_on_terminal():
+    logs.configure("test_progress")
+
+    with patch("sys.stdout.isatty", return_value=True), patch(
+        "sys.stderr.isatty", return_value=True
+    ):
+        command_progress = progress.create(10, no_color=False)
+
+    assert isinstance(command_progress, progress.Progress)
+    assert command_progress.status_line is logs.get_status_line()
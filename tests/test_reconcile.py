@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+import reconcile
+
+
+def test_load(tmp_path):
+    path = tmp_path / "state.yaml"
+    path.write_text(
+        "compute-*:\n"
+        "  power: on\n"
+        "  bootdev: pxe\n"
+        "compute-1*:\n"
+        "  power: 'off'\n"
+        "  persistent: true\n"
+    )
+
+    assert reconcile.load(str(path)) == [
+        ("compute-*", {"power": "on", "bootdev": "pxe"}),
+        ("compute-1*", {"power": "off", "persistent": True}),
+    ]
+
+
+@pytest.mark.parametrize(
+    "content, error",
+    [
+        ("", "must map machine queries"),
+        ("- compute-1\n", "must map machine queries"),
+        ("compute-*: on\n", "must be a mapping"),
+        ("compute-*:\n  power: reset\n", "Invalid power state 'reset'"),
+        ("compute-*:\n  bootdev: cdrom\n", "Invalid boot device 'cdrom'"),
+        ("compute-*:\n  bootdev: pxe\n  efiboot: yes please\n", "'efiboot'"),
+        ("compute-*:\n  boot: pxe\n", "Unknown key(s)"),
+        ("compute-*: [\n", "Cannot read state file"),
+    ],
+)
+def test_load_invalid(tmp_path, content, error):
+    path = tmp_path / "state.yaml"
+    path.write_text(content)
+
+    with pytest.raises(reconcile.StateError, match=re.escape(error)):
+        reconcile.load(str(path))
+
+
+def test_load_missing_file(tmp_path):
+    with pytest.raises(reconcile.StateError):
+        reconcile.load(str(tmp_path / "state.yaml"))
+
+
+def test_merge_later_entries_override_earlier():
+    entries = [
+        ("compute-*", {"power": "on", "bootdev": "pxe"}),
+        ("compute-1", {"power": "off"}),
+    ]
+    selected = {"compute-*": ["compute-1", "compute-2"], "compute-1": ["compute-1"]}
+
+    assert reconcile.merge(entries, selected.get) == {
+        "compute-1": {"power": "off", "bootdev": "pxe"},
+        "compute-2": {"power": "on", "bootdev": "pxe"},
+    }
@@ -0,0 +1,75 @@
+import socket
+import threading
+
+import pytest
+
+import rmcp
+
+PONG = (
+    rmcp.RMCP_HEADER
+    + bytes.fromhex("000011be 40 00 00 10 000011be 00000000 81 00 000000000000")
+)
+
+
+@pytest.fixture
+def responder():
+    """BMC answering presence pings on a local port."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    pings = []
+    stopped = threading.Event()
+
+    def respond():
+        while not stopped.is_set():
+            try:
+                packet, address = sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            pings.append(packet)
+            sock.sendto(PONG, address)
+
+    thread = threading.Thread(target=respond, daemon=True)
+    thread.start()
+
+    yield sock.getsockname()[1], pings
+
+    stopped.set()
+    thread.join()
+    sock.close()
+
+
+def test_build_ping():
+    assert rmcp.build_ping(3) == bytes.fromhex("0600ff06 000011be 80 03 00 00")
+
+
+@pytest.mark.parametrize(
+    "packet, expected",
+    [
+        (PONG, True),
+        (rmcp.build_ping(), False),
+        (PONG[:8], False),
+        (b"\x06\x00\xff\x07" + PONG[4:], False),
+    ],
+)
+def test_is_pong(packet, expected):
+    assert rmcp.is_pong(packet) is expected
+
+
+def test_ping(responder):
+    port, pings = responder
+
+    rtts = rmcp.ping(
+        ["127.0.0.1", "127.0.0.2", "bmc.invalid"],
+        timeout=0.2,
+        port=port,
+    )
+
+    # 127.0.0.2 does not answer and is pinged again once
+    assert list(rtts) == ["127.0.0.1"]
+    assert all(rtt >= 0 for rtt in rtts.values())
+    assert pings == [rmcp.build_ping(0)]
+
+
+def test_ping_nothing():
+    assert rmcp.ping([]) == {}
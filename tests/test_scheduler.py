@@ -0,0 +1,263 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+
+
+class Recorder:
+    """Command recording the order machines are executed in."""
+
+    def __init__(self):
+        self.order = []
+        self.lock = threading.Lock()
+
+    def __call__(self, machine):
+        with self.lock:
+            self.order.append(machine)
+        return True, f"{machine}: ok"
+
+
+class Thread(threading.Thread):
+    """Thread returning the result of the function or raising its error."""
+
+    def __init__(self, function, *args):
+        super().__init__(daemon=True)
+        self.function = function
+        self.args = args
+        self.result = self.error = None
+        self.start()
+
+    def run(self):
+        try:
+            self.result = self.function(*self.args)
+        except Exception as e:
+            self.error = e
+
+    def join(self):
+        super().join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def blocked_scheduler():
+    """Scheduler with a single thread blocked until released."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def block(machine):
+        started.set()
+        release.wait()
+        return True, ""
+
+    instance = scheduler.Scheduler(1)
+    blocker = instance.submit("BLOCK", ["blocker"], block, scheduler.INTERACTIVE)
+    started.wait()
+
+    yield instance, release
+
+    release.set()
+    list(blocker)
+
+
+def test_request_yields_results():
+    instance = scheduler.Scheduler(4)
+    request = instance.submit("POWER_STATUS", ["a", "b", "c"], Recorder())
+
+    assert sorted(request) == [
+        ("a", True, "a: ok"),
+        ("b", True, "b: ok"),
+        ("c", True, "c: ok"),
+    ]
+
+
+def test_priority_classes(blocked_scheduler):
+    instance, release = blocked_scheduler
+    recorder = Recorder()
+
+    requests = [
+        instance.submit("POWER_STATUS", ["poll"], recorder, scheduler.BACKGROUND),
+        instance.submit("POWER_CYCLE", ["cycle"], recorder, scheduler.MUTATING),
+        instance.submit("POWER_OFF", ["off"], recorder, scheduler.INTERACTIVE),
+    ]
+    release.set()
+    for request in requests:
+        list(request)
+
+    assert recorder.order == ["off", "cycle", "poll"]
+
+
+def test_requests_of_same_class_take_turns(blocked_scheduler):
+    instance, release = blocked_scheduler
+    recorder = Recorder()
+
+    requests = [
+        instance.submit("POWER_ON", ["a1", "a2", "a3"], recorder, scheduler.MUTATING),
+        instance.submit("POWER_OFF", ["b1", "b2"], recorder, scheduler.MUTATING),
+    ]
+    release.set()
+    for request in requests:
+        list(request)
+
+    assert recorder.order == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_background_request_supersedes_pending_commands(blocked_scheduler):
+    instance, release = blocked_scheduler
+    recorder = Recorder()
+
+    old = instance.submit("POWER_STATUS", ["a", "b"], recorder)
+    other = instance.submit("BOOTPARAM_GET", ["a"], recorder)
+    new = instance.submit("POWER_STATUS", ["b", "c"], recorder)
+    release.set()
+
+    assert sorted(old) == [("a", True, "a: ok"), ("b", False, scheduler.SUPERSEDED)]
+    assert list(other) == [("a", True, "a: ok")]
+    assert sorted(new) == [("b", True, "b: ok"), ("c", True, "c: ok")]
+    assert sorted(recorder.order) == ["a", "a", "b", "c"]
+
+
+def test_background_request_with_other_options_is_not_superseded(
+    blocked_scheduler,
+):
+    instance, release = blocked_scheduler
+    recorder = Recorder()
+
+    old = instance.submit("BOOTPARAM_GET", ["a"], recorder, options={"param": 5})
+    new = instance.submit("BOOTPARAM_GET", ["a"], recorder, options={"param": 4})
+    release.set()
+
+    assert list(old) == list(new) == [("a", True, "a: ok")]
+
+
+def test_mutating_request_is_not_superseded(blocked_scheduler):
+    instance, release = blocked_scheduler
+    recorder = Recorder()
+
+    old = instance.submit("POWER_ON", ["a"], recorder, scheduler.MUTATING)
+    new = instance.submit("POWER_ON", ["a"], recorder, scheduler.MUTATING)
+    release.set()
+
+    assert list(old) == list(new) == [("a", True, "a: ok")]
+
+
+def test_deadline_fails_pending_commands(blocked_scheduler):
+    instance, _ = blocked_scheduler
+    recorder = Recorder()
+
+    request = instance.submit("POWER_OFF", ["a", "b"], recorder, deadline=0.05)
+
+    assert sorted(request) == [
+        ("a", False, scheduler.DEADLINE_EXCEEDED),
+        ("b", False, scheduler.DEADLINE_EXCEEDED),
+    ]
+    assert recorder.order == []
+
+
+def test_deadline_passed_on_submit():
+    recorder = Recorder()
+
+    request = scheduler.Scheduler(1).submit("POWER_OFF", ["a"], recorder, deadline=-1)
+
+    assert list(request) == [("a", False, scheduler.DEADLINE_EXCEEDED)]
+    assert recorder.order == []
+
+
+def test_cancel_drops_pending_commands(blocked_scheduler):
+    instance, release = blocked_scheduler
+    recorder = Recorder()
+
+    cancelled = instance.submit("POWER_ON", ["a", "b"], recorder, scheduler.MUTATING)
+    cancelled.cancel()
+    request = instance.submit("POWER_ON", ["c"], recorder, scheduler.MUTATING)
+    release.set()
+
+    assert list(request) == [("c", True, "c: ok")]
+    assert recorder.order == ["c"]
+
+
+def test_command_error_is_reported():
+    def fail(machine):
+        raise RuntimeError("boom")
+
+    request = scheduler.Scheduler(1).submit("POWER_ON", ["a"], fail)
+
+    assert list(request) == [("a", False, "Failed to execute command: boom")]
+
+
+def test_invalid_priority():
+    with pytest.raises(ValueError):
+        scheduler.Scheduler(1).submit("POWER_ON", ["a"], Recorder(), priority=5)
+
+
+def wait_for_calls(single_flight, count):
+    while len(single_flight.calls) < count:
+        time.sleep(0.01)
+
+
+def test_single_flight_shares_call_in_flight():
+    single_flight = scheduler.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def query():
+        calls.append(1)
+        release.wait()
+        return True, "Chassis Power is on"
+
+    leader = Thread(single_flight.do, "10.0.0.1", "POWER_STATUS", query)
+    wait_for_calls(single_flight, 1)
+    follower = Thread(single_flight.do, "10.0.0.1", "POWER_STATUS", query)
+    other_bmc = Thread(single_flight.do, "10.0.0.2", "POWER_STATUS", query)
+    wait_for_calls(single_flight, 2)
+    release.set()
+
+    assert leader.join() == follower.join() == (True, "Chassis Power is on")
+    assert other_bmc.join() == (True, "Chassis Power is on")
+    assert len(calls) == 2
+    assert single_flight.calls == {}
+
+
+def test_single_flight_shares_error():
+    single_flight = scheduler.SingleFlight()
+    release = threading.Event()
+
+    def query():
+        release.wait()
+        raise RuntimeError("boom")
+
+    leader = Thread(single_flight.do, "10.0.0.1", "POWER_STATUS", query)
+    wait_for_calls(single_flight, 1)
+    follower = Thread(single_flight.do, "10.0.0.1", "POWER_STATUS", query)
+    time.sleep(0.05)
+    release.set()
+
+    for thread in (leader, follower):
+        with pytest.raises(RuntimeError):
+            thread.join()
+
+
+def test_single_flight_barrier():
+    single_flight = scheduler.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def query():
+        calls.append("status")
+        release.wait()
+        return True, "Chassis Power is on"
+
+    before = Thread(single_flight.do, "10.0.0.1", "POWER_STATUS", query)
+    wait_for_calls(single_flight, 1)
+
+    single_flight.barrier("10.0.0.1", lambda: calls.append("off"))
+    after = Thread(single_flight.do, "10.0.0.1", "POWER_STATUS", query)
+    wait_for_calls(single_flight, 2)
+    release.set()
+    before.join()
+    after.join()
+
+    assert calls == ["status", "off", "status"]
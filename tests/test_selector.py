@@ -0,0 +1,110 @@
+import pytest
+
+import inventory
+import selector
+
+
+@pytest.fixture
+def machines():
+    return inventory.DictInventory(
+        {
+            f"rack{rack:02}-node{node}": {
+                "zone": f"AZ{rack % 2}",
+                "tags": ["gpu"] if node % 4 == 0 else ["cpu"],
+            }
+            for rack in range(1, 5)
+            for node in range(1, 41)
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("rack01-node[1-3]", ["rack01-node1", "rack01-node2", "rack01-node3"]),
+        ("name=rack0[12]-node1", ["rack01-node1", "rack02-node1"]),
+        (
+            "rack[01-02]-node[1-9],tags=gpu",
+            ["rack01-node4", "rack01-node8", "rack02-node4", "rack02-node8"],
+        ),
+        ("rack*-node1,zone!=AZ1", ["rack02-node1", "rack04-node1"]),
+        ("!rack*-node[1-39],zone=AZ0", ["rack02-node40", "rack04-node40"]),
+        (
+            "zone=AZ1,!tags=cpu,!rack01-*",
+            [f"rack03-node{i}" for i in range(4, 41, 4)],
+        ),
+        ("tags=fpga", []),
+    ],
+)
+def test_plan_execute(machines, query, expected):
+    assert sorted(selector.compile_query(query).execute(machines)) == sorted(expected)
+
+
+def test_plan_identical_across_inventories(machines):
+    query = "rack*-node[1-20],zone=AZ1,!tags=gpu"
+
+    class PlainInventory(inventory.Inventory):
+        def __getitem__(self, name):
+            return machines[name]
+
+        def __iter__(self):
+            return iter(machines)
+
+        def __len__(self):
+            return len(machines)
+
+    assert selector.compile_query(query).execute(
+        PlainInventory()
+    ) == selector.compile_query(query).execute(machines)
+
+
+def test_plan_evaluates_indexed_terms_first(machines):
+    plan = selector.compile_query("!rack01-*,rack0[1-3]-*,zone=AZ1")
+    names, costs = plan.run(machines)
+
+    assert [description for description, _ in costs] == [
+        "index lookup zone=AZ1",
+        "name filter =rack0[1-3]-*",
+        "name filter !=rack01-*",
+    ]
+    # Only machines in the zone are examined by the name filters
+    assert costs[1][1] == 80
+    assert len(names) == 40
+
+
+def test_plan_without_positive_terms_scans_all_machines(machines):
+    names, costs = selector.compile_query("!tags=gpu").run(machines)
+
+    assert costs[0] == ("full scan", 160)
+    assert len(names) == 120
+
+
+def test_plan_looks_up_expanded_names(machines):
+    names, costs = selector.compile_query("rack0[1-2]-node[1-5],tags=gpu").run(machines)
+
+    assert costs == [
+        ("name lookup =rack0[1-2]-node[1-5]", 10),
+        ("index lookup tags=gpu", 40),
+    ]
+    assert names == {"rack01-node4", "rack02-node4"}
+
+
+def test_plan_scans_names_of_large_expansions(machines):
+    names, costs = selector.compile_query("rack[1-1000]-node1").run(machines)
+
+    assert costs == [("name lookup =rack[1-1000]-node1", 160)]
+    assert names == set()
+
+
+def test_compile_query_cached():
+    assert selector.compile_query("rack*,zone=AZ1") is selector.compile_query(
+        "rack*,zone=AZ1"
+    )
+
+
+@pytest.mark.parametrize(
+    "query", ["", "zone=", "=AZ1", "rack*,,zone=AZ1", "!", "node-[10-1]"]
+)
+def test_compile_query_invalid(query):
+    with pytest.raises(selector.QueryError):
+        selector.compile_query(query)
@@ -0,0 +1,154 @@
+import gzip
+import os
+
+import sol
+
+
+def read_all(fd):
+    os.set_blocking(fd, False)
+    chunks = []
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            break
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks).decode("utf-8")
+
+
+def test_multiplexer_prefixes_lines(tmp_path):
+    output = tmp_path / "output.txt"
+    with open(output, "wb") as file:
+        multiplexer = sol.SolMultiplexer(file.fileno())
+        multiplexer.add("node-1", ["sh", "-c", "printf 'a\\nb\\npartial'"])
+        multiplexer.add("node-2", ["sh", "-c", "printf 'c\\n'; exit 3"])
+        returncodes = multiplexer.run()
+
+    assert returncodes == {"node-1": 0, "node-2": 3}
+
+    lines = output.read_text().splitlines()
+    assert [line for line in lines if line.startswith("node-1")] == [
+        "node-1: a",
+        "node-1: b",
+        "node-1: partial",
+        "node-1: SOL session closed (0)",
+    ]
+    assert [line for line in lines if line.startswith("node-2")] == [
+        "node-2: c",
+        "node-2: SOL session closed (3)",
+    ]
+
+
+def test_multiplexer_breaks_partial_lines(tmp_path):
+    output = tmp_path / "output.txt"
+    with open(output, "wb") as file:
+        multiplexer = sol.SolMultiplexer(file.fileno())
+        multiplexer.add(
+            "node-1", ["sh", "-c", "printf 'lo'; sleep 0.5; printf 'gin\\n'"]
+        )
+        multiplexer.add("node-2", ["sh", "-c", "sleep 0.2; printf 'boot\\n'"])
+        multiplexer.run()
+
+    assert output.read_text().splitlines() == [
+        "node-1: lo",
+        "node-2: boot",
+        "node-2: SOL session closed (0)",
+        "node-1: gin",
+        "node-1: SOL session closed (0)",
+    ]
+
+
+def test_multiplexer_pipe_output_and_logs(tmp_path):
+    read_fd, write_fd = os.pipe()
+    log_dir = tmp_path / "logs"
+
+    multiplexer = sol.SolMultiplexer(write_fd, str(log_dir))
+    multiplexer.add("node-1", ["sh", "-c", "printf 'boot\\nlogin: '"])
+    multiplexer.run()
+    os.close(write_fd)
+
+    assert read_all(read_fd) == (
+        "node-1: boot\nnode-1: login: \nnode-1: SOL session closed (0)\n"
+    )
+    assert (log_dir / "node-1.log").read_bytes() == b"boot\nlogin: "
+
+
+def test_multiplexer_close_kills_sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(sol, "SHUTDOWN_TIMEOUT", 0.1)
+
+    with open(tmp_path / "output.txt", "wb") as file:
+        multiplexer = sol.SolMultiplexer(file.fileno())
+        multiplexer.add("node-1", ["sh", "-c", "trap '' INT; sleep 30"])
+        multiplexer.close()
+
+    assert multiplexer.returncodes["node-1"] != 0
+    assert multiplexer.sessions == {}
+
+
+def test_capture_stops_on_pattern(tmp_path):
+    capture = sol.SolCapture(str(tmp_path), until=r"login:", timeout=10)
+    # The pattern is split between two writes; the session would run for
+    # 30 seconds if the match did not stop it
+    capture.add(
+        "node-1",
+        ["sh", "-c", "printf 'booting\\nlog'; sleep 0.2; printf 'in: '; sleep 30"],
+    )
+    results = capture.run()
+
+    assert results == {"node-1": (sol.CAPTURE_MATCHED, "login:")}
+    with gzip.open(tmp_path / "node-1.log.gz") as file:
+        assert file.read() == b"booting\nlogin: "
+
+
+def test_capture_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(sol.SolMultiplexer, "TICK_INTERVAL", 0.05)
+    monkeypatch.setattr(sol, "SHUTDOWN_TIMEOUT", 0.1)
+    capture = sol.SolCapture(str(tmp_path), until=r"login:", timeout=0.2)
+    capture.add("node-1", ["sh", "-c", "trap '' INT; printf 'booting'; sleep 30"])
+
+    assert capture.run() == {"node-1": (sol.CAPTURE_TIMEOUT, 0.2)}
+
+
+def test_capture_session_closed(tmp_path):
+    capture = sol.SolCapture(str(tmp_path), until=r"login:")
+    capture.add("node-1", ["sh", "-c", "printf 'Error'; exit 1"])
+
+    assert capture.run() == {"node-1": (sol.CAPTURE_CLOSED, 1)}
+
+
+def test_rotating_compressed_log(tmp_path):
+    log = sol.RotatingCompressedLog(str(tmp_path / "node-1.log"), size=4, count=2)
+    for data in [b"aaaa", b"bbbb", b"cccc", b"dd"]:
+        log.write(data)
+    log.close()
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "node-1.log.1.gz",
+        "node-1.log.2.gz",
+        "node-1.log.gz",
+    ]
+    with gzip.open(tmp_path / "node-1.log.gz") as file:
+        assert file.read() == b"dd"
+    with gzip.open(tmp_path / "node-1.log.2.gz") as file:
+        assert file.read() == b"bbbb"
+
+
+def test_rotating_compressed_log_keeps_previous_capture(tmp_path):
+    for data in [b"first", b"second"]:
+        log = sol.RotatingCompressedLog(str(tmp_path / "node-1.log"), count=2)
+        log.write(data)
+        log.close()
+
+    with gzip.open(tmp_path / "node-1.log.gz") as file:
+        assert file.read() == b"second"
+    with gzip.open(tmp_path / "node-1.log.1.gz") as file:
+        assert file.read() == b"first"
+
+
+def test_ring_buffer_keeps_tail():
+    ring_buffer = sol.RingBuffer(size=5)
+    ring_buffer.append(b"abc")
+    ring_buffer.append(b"defg")
+    assert ring_buffer.data == b"cdefg"
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+import summary
+
+
+def test_summary_groups_results():
+    results_summary = summary.ResultSummary()
+    for i in range(1, 101):
+        if i % 10 == 0:
+            results_summary.add(f"node-{i}", False, "Error: timeout\n")
+        else:
+            results_summary.add(f"node-{i}", True, "Chassis Power is on\n")
+    results_summary.add("node-101", True, "")
+
+    assert results_summary.lines() == [
+        (
+            True,
+            "node-[1-9,11-19,21-29,31-39,41-49,51-59,61-69,71-79,81-89,91-99] (90): "
+            "Chassis Power is on",
+        ),
+        (True, "node-101 (1): (no output)"),
+        (False, "node-[10,20,30,40,50,60,70,80,90,100] (10): Error: timeout"),
+    ]
+    assert results_summary.counts() == "101 machine(s): 91 succeeded, 10 failed"
+
+
+def test_summary_limits_distinct_outputs():
+    results_summary = summary.ResultSummary(max_groups=2)
+    for i in range(1, 6):
+        results_summary.add(f"node-{i}", True, f"Output {i}")
+
+    assert len(results_summary.groups) == 3
+    assert results_summary.lines()[0] == (True, "node-[3-5] (3): (other outputs)")
+    assert results_summary.total == 5
+
+
+def test_summary_progress_due():
+    with patch("time.monotonic", return_value=100.0):
+        results_summary = summary.ResultSummary()
+
+    with patch("time.monotonic", return_value=101.0):
+        assert results_summary.progress_due() is False
+
+    with patch("time.monotonic", return_value=100.0 + summary.PROGRESS_INTERVAL):
+        assert results_summary.progress_due() is True
+        assert results_summary.progress_due() is False
+
+
+def test_summary_groups_failed_commands_by_error():
+    results_summary = summary.ResultSummary()
+    for i in range(1, 4):
+        results_summary.add(
+            f"node-{i}",
+            False,
+            f"Failed to run command: 'ipmitool -H 10.0.0.{i} chassis power status'\n"
+            "Error: Unable to establish session",
+        )
+    results_summary.add("node-4", False, "Failed to run command: 'ipmitool'\n")
+
+    assert results_summary.lines() == [
+        (False, "node-[1-3] (3): Error: Unable to establish session"),
+        (False, "node-4 (1): Failed to run command"),
+    ]
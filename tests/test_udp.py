@@ -0,0 +1,80 @@
+import socket
+
+import pytest
+
+import rmcp
+import udp
+from tests.simulator import SUPPORTED, Simulator, build_pong
+
+requires_simulator = pytest.mark.skipif(
+    not SUPPORTED, reason="The BMC simulator requires Linux"
+)
+
+
+def session(packet):
+    return packet[9] if rmcp.is_pong(packet) else None
+
+
+def test_resolve():
+    targets = udp.resolve(["127.0.0.1", "bmc.invalid"], 623)
+
+    assert targets == {"127.0.0.1": (socket.AF_INET, ("127.0.0.1", 623), ["127.0.0.1"])}
+
+
+def test_build_pong():
+    assert rmcp.is_pong(build_pong(rmcp.build_ping(7)))
+    assert build_pong(rmcp.build_ping(7))[9] == 7
+
+
+@requires_simulator
+def test_exchange_demultiplexes_replies():
+    with Simulator(1000, unreachable_every=10) as simulator:
+        requests = {
+            (address, 5): (
+                socket.AF_INET,
+                (address, simulator.port),
+                rmcp.build_ping(5),
+            )
+            for address in simulator.addresses
+        }
+        with udp.Transport(batch_size=100) as transport:
+            replies = transport.exchange(requests, session, timeout=0.2, retries=1)
+            sockets = len(transport.sockets)
+            stats = transport.stats
+
+    assert sockets == 1
+    assert sorted(replies) == sorted(
+        (address, 5)
+        for address in simulator.addresses
+        if address not in simulator.unreachable
+    )
+    assert all(rtt >= 0 for _, rtt in replies.values())
+    # Only the 100 unreachable BMCs are pinged again
+    assert stats["sent"] == 1100
+    assert stats["received"] == 900
+
+
+@requires_simulator
+def test_exchange_ignores_replies_of_other_sessions():
+    with Simulator(2) as simulator:
+        requests = {
+            (address, 1): (
+                socket.AF_INET,
+                (address, simulator.port),
+                rmcp.build_ping(2),
+            )
+            for address in simulator.addresses
+        }
+        with udp.Transport() as transport:
+            replies = transport.exchange(requests, session, timeout=0.1)
+
+    assert replies == {}
+
+
+@requires_simulator
+def test_ping_simulated_bmcs():
+    with Simulator(2000, unreachable_every=100) as simulator:
+        rtts = rmcp.ping(simulator.addresses, timeout=0.2, port=simulator.port)
+
+    assert len(rtts) == 1980
+    assert not simulator.unreachable & set(rtts)
@@ -0,0 +1,198 @@
+import asyncio
+
+import pytest
+
+import utils
+
+TEMPLATE = utils.Template.build("user", "password", "10.10.10.10")
+
+DRY_RUN_TEMPLATE = utils.Template.build("user", "password", "10.10.10.10", True)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_ipmitool_dry_run():
+    utility = utils.AsyncIpmitool(DRY_RUN_TEMPLATE)
+    assert run(utility.power_status()) == (
+        True,
+        "ipmitool -e & -I lanplus -H 10.10.10.10 -U user -E " "chassis power status",
+    )
+
+
+def test_dcmi_power_reading_dry_run():
+    utility = utils.Ipmitool(DRY_RUN_TEMPLATE)
+    assert utility.dcmi_power_reading() == (
+        True,
+        "ipmitool -e & -I lanplus -H 10.10.10.10 -U user -E dcmi power reading",
+    )
+
+
+def test_async_ipmitool_timeout_kills_process():
+    utility = utils.AsyncIpmitool(TEMPLATE, timeout=0.2)
+    utility.command = ["sh", "-c", "sleep 30"]
+    success, output = run(utility._execute())
+    assert success is False
+    assert "Timed out after 0.2 seconds" in output
+
+
+def test_async_ipmitool_timeout_after_output_closed():
+    utility = utils.AsyncIpmitool(TEMPLATE, timeout=0.2)
+    utility.command = ["sh", "-c", "exec >&- 2>&-; sleep 30"]
+    success, output = run(utility._execute())
+    assert success is False
+    assert "Timed out after 0.2 seconds" in output
+
+
+def test_ipmitool_timeout():
+    utility = utils.Ipmitool(TEMPLATE, timeout=0.2)
+    utility.command = ["sh", "-c", "sleep 30"]
+    success, output = utility._execute()
+    assert success is False
+    assert "Timed out after 0.2 seconds" in output
+
+
+def test_async_ipmitool_failed_command():
+    utility = utils.AsyncIpmitool(TEMPLATE)
+    utility.command = ["sh", "-c", "echo Error: Unable to establish session; exit 1"]
+    success, output = run(utility._execute())
+    assert success is False
+    assert output.endswith("Error: Unable to establish session")
+
+
+def test_async_ipmitool_not_found():
+    utility = utils.AsyncIpmitool(TEMPLATE)
+    utility.command = ["i-dont-exist"]
+    success, output = run(utility._execute())
+    assert success is False
+    assert "Failed to run command: 'i-dont-exist'" in output
+
+
+def test_async_ipmitool_output_is_bounded(monkeypatch):
+    monkeypatch.setattr(utils, "MAX_OUTPUT_SIZE", 10)
+    utility = utils.AsyncIpmitool(TEMPLATE)
+    utility.command = ["sh", "-c", "yes | head -c 100000"]
+    assert run(utility._execute()) == (True, "y\ny\ny\ny\ny")
+
+
+def test_template_keeps_password_out_of_command():
+    assert TEMPLATE.command == (
+        "ipmitool",
+        "-e",
+        "&",
+        "-I",
+        "lanplus",
+        "-H",
+        "10.10.10.10",
+        "-U",
+        "user",
+        "-E",
+    )
+    assert TEMPLATE.password == "password"
+
+
+def test_ipmitool_passes_password_in_environment():
+    utility = utils.Ipmitool(TEMPLATE)
+    utility.command = ["sh", "-c", f"echo ${utils.PASSWORD_VARIABLE}"]
+    assert utility._execute() == (True, "password")
+
+
+def test_async_ipmitool_passes_password_in_environment():
+    utility = utils.AsyncIpmitool(TEMPLATE)
+    utility.command = ["sh", "-c", f"echo ${utils.PASSWORD_VARIABLE}"]
+    assert run(utility._execute()) == (True, "password")
+
+
+def test_ipmitool_commands_do_not_change_template():
+    utils.Ipmitool(DRY_RUN_TEMPLATE).power_on()
+    assert (
+        utils.Ipmitool(DRY_RUN_TEMPLATE)
+        .power_status()[1]
+        .endswith("-E chassis power status")
+    )
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        (
+            ["ipmitool", "-U", "user", "-P", "secret", "power"],
+            "ipmitool -U user -P **** power",
+        ),
+        (["ipmitool", "-k", "key", "-y", "hexkey"], "ipmitool -k **** -y ****"),
+        (["ipmitool", "-E", "chassis"], "ipmitool -E chassis"),
+    ],
+)
+def test_redact(command, expected):
+    assert utils.redact(command) == expected
+
+
+def test_failed_command_is_redacted():
+    utility = utils.Ipmitool(TEMPLATE)
+    utility.command = ["i-dont-exist", "-P", "secret"]
+    success, output = utility._execute()
+    assert success is False
+    assert "'i-dont-exist -P ****'" in output
+    assert "secret" not in output
+
+
+BOOTPARAM_OUTPUT = """Boot parameter version: 1
+Boot parameter 5 is valid/unlocked
+Boot parameter data: {}
+ Boot Flags :
+"""
+
+
+@pytest.mark.parametrize(
+    "data, flags",
+    [
+        (
+            "8004000000",
+            {"valid": True, "persistent": False, "efiboot": False, "device": "pxe"},
+        ),
+        (
+            "e008000000",
+            {"valid": True, "persistent": True, "efiboot": True, "device": "disk"},
+        ),
+        (
+            "a018000000",
+            {"valid": True, "persistent": False, "efiboot": True, "device": "bios"},
+        ),
+        (
+            "0000000000",
+            {"valid": False, "persistent": False, "efiboot": False, "device": "none"},
+        ),
+    ],
+)
+def test_parse_boot_flags(data, flags):
+    assert utils.parse_boot_flags(BOOTPARAM_OUTPUT.format(data)) == flags
+
+
+def test_parse_boot_flags_invalid_output():
+    assert utils.parse_boot_flags("Error: Unable to establish session") is None
+
+
+@pytest.mark.parametrize(
+    "method, kwargs, arguments",
+    [
+        ("bootdev_pxe", {}, ["pxe"]),
+        ("bootdev_pxe", {"persistent": True}, ["pxe", "options=persistent"]),
+        (
+            "bootdev_disk",
+            {"persistent": True, "efiboot": True},
+            ["disk", "options=persistent,efiboot"],
+        ),
+        ("bootdev_bios", {}, ["bios", "options=efiboot"]),
+        ("bootdev_bios", {"efiboot": False}, ["bios"]),
+    ],
+)
+def test_ipmitool_bootdev_options(method, kwargs, arguments):
+    utility = utils.Ipmitool(DRY_RUN_TEMPLATE)
+    success, output = getattr(utility, method)(**kwargs)
+    assert success is True
+    assert output.endswith(" ".join(["chassis", "bootdev"] + arguments))
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+import watch
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def status(state):
+    return True, f"Chassis Power is {state}"
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        ("Chassis Power is on", "on"),
+        ("Chassis Power is Off", "off"),
+        ("Error: Unable to establish session", None),
+        (None, None),
+    ],
+)
+def test_parse_power_state(output, expected):
+    assert watch.parse_power_state(output) == expected
+
+
+def test_update_reports_changes_only():
+    clock = Clock()
+    watcher = watch.Watcher(["a"], clock=clock, wall_clock=lambda: 1700000000.0)
+
+    assert watcher.update("a", *status("on")) == {
+        "time": 1700000000.0,
+        "machine": "a",
+        "state": "on",
+        "previous": None,
+    }
+    assert watcher.update("a", *status("on")) is None
+    assert watcher.update("a", False, "Error: Unable to establish session") == {
+        "time": 1700000000.0,
+        "machine": "a",
+        "state": "unknown",
+        "previous": "on",
+        "error": "Error: Unable to establish session",
+    }
+    assert watcher.update("a", False, "Error: Unable to establish session") is None
+
+
+def test_interval_backs_off_while_stable():
+    clock = Clock()
+    watcher = watch.Watcher(["a"], min_interval=2, max_interval=10, clock=clock)
+    intervals = []
+
+    for state in ["on", "on", "on", "on", "on", "off", "off"]:
+        watcher.update("a", *status(state))
+        intervals.append(watcher.machines["a"].interval)
+
+    assert intervals == [2, 4, 8, 10, 10, 2, 4]
+    assert watcher.next_poll() == 4
+
+
+def test_watch_polls_due_machines():
+    clock = Clock()
+    watcher = watch.Watcher(
+        ["a", "b"], min_interval=1, max_interval=4, clock=clock, wall_clock=clock
+    )
+    states = {"a": iter(["on"] * 20), "b": iter(["on", "on", "off"] + ["off"] * 20)}
+    polls = []
+    lines = []
+
+    def poll(machines):
+        polls.append((clock.now, sorted(machines)))
+        for machine in machines:
+            yield (machine, *status(next(states[machine])))
+
+    watch.watch(watcher, poll, lines.append, duration=10, sleep=clock.sleep)
+
+    assert polls == [
+        (0, ["a", "b"]),
+        (1, ["a", "b"]),
+        (3, ["a", "b"]),
+        (4, ["b"]),
+        (6, ["b"]),
+        (7, ["a"]),
+    ]
+    assert [json.loads(line) for line in lines] == [
+        {"time": 0, "machine": "a", "state": "on", "previous": None},
+        {"time": 0, "machine": "b", "state": "on", "previous": None},
+        {"time": 3, "machine": "b", "state": "off", "previous": "on"},
+    ]